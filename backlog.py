@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import aiohttp
+import click
+
+from gladia import close_http_session, handle_transcription
+from transcript_store import BATCH, TRANSCRIPT_STORE, close_transcript_store, store_transcription
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Recordings picked up by extension, with the content type they are uploaded as
+CONTENT_TYPES = {
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mkv": "video/x-matroska",
+}
+
+# Files transcribed at once, and new transcriptions started per minute at most
+BACKLOG_CONCURRENCY = int(os.getenv("BACKLOG_CONCURRENCY", 4))
+BACKLOG_RATE_PER_MINUTE = float(os.getenv("BACKLOG_RATE_PER_MINUTE", 30))
+# A file rejected for rate limiting (HTTP 429) is retried this many times, after Retry-After
+# or an exponential backoff from RATE_LIMIT_BACKOFF_SECONDS, with every worker holding off meanwhile
+BACKLOG_MAX_RETRIES = int(os.getenv("BACKLOG_MAX_RETRIES", 5))
+RATE_LIMIT_BACKOFF_SECONDS = 30
+
+CHECKPOINT_NAME = "backlog_checkpoint.jsonl"
+PROGRESS_INTERVAL_SECONDS = 60
+
+
+def saved_transcript(file_output_dir):
+    # The finished transcription saved by an earlier run, or None
+    try:
+        with open(os.path.join(file_output_dir, "transcript.json")) as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return result if result.get("status") == "done" else None
+
+
+def find_recordings(recordings_dir):
+    # Media files under the directory, as paths relative to it, in a stable order
+    found = []
+    for root, _, files in os.walk(recordings_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in CONTENT_TYPES:
+                found.append(os.path.relpath(os.path.join(root, name), recordings_dir))
+    return sorted(found)
+
+
+class Checkpoint:
+    # Append-only record of finished files, so a rerun skips them.
+    # A file counts as done for the size and modification time it had when it was transcribed,
+    # so a recording that has been replaced since is transcribed again; failures are retried.
+    # A file transcribed but not written to the transcript store is "unstored": a rerun only
+    # stores its saved transcript.
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.unstored = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash mid-write
+                        continue
+                    if record["status"] == "done":
+                        self.done[record["file"]] = (record["size"], record["mtime"])
+                        self.unstored.pop(record["file"], None)
+                    elif record["status"] == "unstored":
+                        self.unstored[record["file"]] = (record["size"], record["mtime"])
+        self._file = open(path, "a")
+
+    @staticmethod
+    def fingerprint(file_path):
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+
+    def is_done(self, name, file_path):
+        return self.done.get(name) == self.fingerprint(file_path)
+
+    def is_unstored(self, name, file_path):
+        return self.unstored.get(name) == self.fingerprint(file_path)
+
+    def record(self, name, file_path, status, seconds, error=None):
+        size, mtime = self.fingerprint(file_path)
+        if status == "done":
+            self.done[name] = (size, mtime)
+            self.unstored.pop(name, None)
+        elif status == "unstored":
+            self.unstored[name] = (size, mtime)
+        self._file.write(json.dumps({
+            "file": name, "size": size, "mtime": mtime, "status": status,
+            "seconds": round(seconds, 1), "error": error, "at": time.time()
+        }) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class RateLimiter:
+    # Spaces out acquisitions to at most `per_minute`, and holds everyone off after a 429
+    def __init__(self, per_minute):
+        self.interval = 60 / per_minute if per_minute else 0.0
+        self.next_at = 0.0
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        at = max(now, self.next_at, self.paused_until)
+        self.next_at = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def wait_pause(self):
+        # Wait out a pause without taking a slot
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def retry_after_seconds(error, attempt):
+    # Delay asked for by a 429 response, or an exponential backoff
+    retry_after = error.headers.get("Retry-After") if error.headers else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt
+
+
+class BacklogStats:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.file_seconds = []
+        self.started_at = time.monotonic()
+
+    @property
+    def files_per_hour(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.done * 3600 / elapsed if elapsed else 0.0
+
+    def report(self):
+        elapsed = time.monotonic() - self.started_at
+        remaining = self.total - self.done - self.failed
+        eta = f", about {remaining / self.files_per_hour:.1f}h left" if self.files_per_hour and remaining else ""
+        return (
+            f"{self.done}/{self.total} done, {self.failed} failed in {elapsed / 60:.1f} min: "
+            f"{self.files_per_hour:.1f} files/h, {self.bytes_done / 1e6 * 3600 / max(elapsed, 1e-9):.0f} MB/h{eta}"
+        )
+
+
+async def transcribe_backlog(gladia_api_key, recordings_dir, output_dir, concurrency, rate_per_minute):
+    # Transcribe every recording under recordings_dir not already done, `concurrency` at a time
+    names = find_recordings(recordings_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_NAME))
+    pending = [name for name in names if not checkpoint.is_done(name, os.path.join(recordings_dir, name))]
+    logger.info(f"{len(names)} recordings in {recordings_dir}, {len(names) - len(pending)} already done, {len(pending)} to go")
+
+    stats = BacklogStats(len(pending))
+    limiter = RateLimiter(rate_per_minute)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def transcribe_one(name):
+        file_path = os.path.join(recordings_dir, name)
+        content_type = CONTENT_TYPES[os.path.splitext(name)[1].lower()]
+        # Each recording's transcript.json goes to its own directory, mirroring the recordings tree
+        file_output_dir = os.path.join(output_dir, os.path.splitext(name)[0])
+        if checkpoint.is_unstored(name, file_path):
+            # Transcribed by an earlier run, which failed to store it: only store it this time
+            result = await asyncio.to_thread(saved_transcript, file_output_dir)
+            if result is not None:
+                await finish(name, file_path, file_output_dir, result, 0.0)
+                return
+        async with slots:
+            started_at = time.monotonic()
+            # Steps done so far: a retry after a 429 resumes at the step that got it
+            job = {}
+            for attempt in range(BACKLOG_MAX_RETRIES + 1):
+                if "result_url" in job:
+                    # Only waiting on a job already started, which is not a new transcription
+                    await limiter.wait_pause()
+                else:
+                    await limiter.acquire()
+                try:
+                    result = await handle_transcription(gladia_api_key, file_path, content_type, file_output_dir, job)
+                    break
+                except aiohttp.ClientResponseError as e:
+                    if e.status != 429 or attempt == BACKLOG_MAX_RETRIES:
+                        result = e
+                        break
+                    delay = retry_after_seconds(e, attempt)
+                    logger.warning(f"Rate limited on {name}, holding off for {delay:.0f}s")
+                    limiter.pause(delay)
+                except Exception as e:
+                    result = e
+                    break
+            seconds = time.monotonic() - started_at
+
+        if isinstance(result, dict) and result.get("status") == "done":
+            await finish(name, file_path, file_output_dir, result, seconds)
+        else:
+            stats.failed += 1
+            error = str(result) if isinstance(result, Exception) else f"status {(result or {}).get('status')}"
+            checkpoint.record(name, file_path, "failed", seconds, error)
+            logger.error(f"Transcription of {name} failed: {error}")
+
+    async def finish(name, file_path, file_output_dir, result, seconds):
+        # Make a transcribed file searchable with the bots' transcripts, when the transcript store
+        # is enabled, and only then count it as done
+        if TRANSCRIPT_STORE:
+            stored = await asyncio.to_thread(
+                store_transcription, result["result"], BATCH, output_dir=file_output_dir,
+                started_at=os.path.getmtime(file_path), key=f"file:{os.path.realpath(file_path)}"
+            )
+            if stored is None:
+                stats.failed += 1
+                checkpoint.record(name, file_path, "unstored", seconds, "transcript store write failed")
+                logger.error(f"Transcribed {name} but could not store it, a rerun will store it")
+                return
+        stats.done += 1
+        if seconds:
+            stats.bytes_done += os.path.getsize(file_path)
+            stats.file_seconds.append(seconds)
+        checkpoint.record(name, file_path, "done", seconds)
+        logger.info(f"Transcribed {name} in {seconds:.0f}s" if seconds else f"Stored the saved transcript of {name}")
+
+    async def log_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+            logger.info(f"Backlog progress: {stats.report()}")
+
+    progress = asyncio.create_task(log_progress())
+    try:
+        await asyncio.gather(*(transcribe_one(name) for name in pending))
+    finally:
+        progress.cancel()
+        checkpoint.close()
+        await close_http_session()
+        close_transcript_store()
+    return stats
+
+
+@click.command()
+@click.option("--recordings", "recordings_dir", default="recordings", help="Directory scanned for recordings")
+@click.option("--output", "output_dir", default=os.path.join("transcriptions", "backlog"),
+              help="Where transcripts and the checkpoint go")
+@click.option("--concurrency", default=BACKLOG_CONCURRENCY, help="Files transcribed at once")
+@click.option("--rate-per-minute", default=BACKLOG_RATE_PER_MINUTE, help="New transcriptions started per minute at most (0 = no limit)")
+@click.option("--verbose", is_flag=True, help="Log each transcription's progress and transcript")
+def main(recordings_dir, output_dir, concurrency, rate_per_minute, verbose):
+    # Transcribe a backlog of existing recordings, e.g. after a Gladia outage or a bot crash.
+    # Progress is checkpointed, so rerunning the same command only picks up what is left.
+    gladia_api_key = os.getenv("GLADIA_API_KEY", "")
+    if not gladia_api_key:
+        logger.error("No Gladia API key specified")
+        raise SystemExit(1)
+    if not verbose:
+        logging.getLogger("gladia").setLevel(logging.WARNING)
+
+    stats = asyncio.run(transcribe_backlog(gladia_api_key, recordings_dir, output_dir, concurrency, rate_per_minute))
+    click.echo(f"Backlog: {stats.report()}")
+    if stats.file_seconds:
+        ordered = sorted(stats.file_seconds)
+        click.echo(
+            f"Per file: p50 {ordered[len(ordered) // 2]:.0f}s, p95 {ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)]:.0f}s"
+        )
+    if stats.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from streaming import AudioStreamer, TRANSPORTS  # noqa: E402
+
+
+class CountingWebSocket:
+    # Stand-in websocket that only counts what would go over the wire
+    def __init__(self):
+        self.frames = 0
+        self.wire_bytes = 0
+
+    async def send(self, message):
+        self.frames += 1
+        self.wire_bytes += len(message.encode("utf-8") if isinstance(message, str) else message)
+
+
+async def run_transport(transport, minutes, sample_rate, chunk_duration_ms):
+    # Push the given amount of audio through the streamer's send path, without pacing
+    websocket = CountingWebSocket()
+    streamer = AudioStreamer(websocket, sample_rate, chunk_duration_ms, transport=transport)
+    chunk = os.urandom(streamer.chunk_size)
+    chunks = int(minutes * 60 / streamer.chunk_duration)
+
+    cpu_start = time.process_time()
+    for _ in range(chunks):
+        await streamer.send_chunk(chunk)
+    cpu_seconds = time.process_time() - cpu_start
+    return cpu_seconds, websocket
+
+
+@click.command()
+@click.option("--minutes", default=60.0, help="Minutes of audio to push through each transport")
+@click.option("--sample-rate", default=16000, help="Sample rate of the synthetic PCM")
+@click.option("--chunk-ms", default=100, help="Chunk duration in milliseconds")
+def main(minutes, sample_rate, chunk_ms):
+    # Compare CPU per audio-minute and upstream bytes of the binary and JSON transports
+    click.echo(f"{minutes:g} audio minutes, {sample_rate} Hz, {chunk_ms} ms chunks")
+    click.echo(f"{'transport':<10} {'cpu ms/min':>12} {'wire MB/min':>12} {'frames':>10}")
+    for transport in TRANSPORTS:
+        cpu_seconds, websocket = asyncio.run(run_transport(transport, minutes, sample_rate, chunk_ms))
+        click.echo(
+            f"{transport:<10} {cpu_seconds * 1000 / minutes:>12.2f} "
+            f"{websocket.wire_bytes / minutes / 1e6:>12.3f} {websocket.frames:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import importlib.util
+import os
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_bot(script_name):
+    # Import one of the bot scripts (gmeet-live.py, gmeet-prerecorded.py) as a module
+    module_name = script_name.replace("-", "_").removesuffix(".py")
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,224 @@
+import asyncio
+import http.server
+import os
+import sys
+import threading
+import time
+
+import click
+import undetected_chromedriver as uc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from browser import BrowserWorker, chrome_arguments, window_size  # noqa: E402
+from proc_stats import descendants, total_cpu_seconds, total_pss_bytes, total_rss_bytes  # noqa: E402
+
+# The page both browsers load: a grid of participant tiles, like a Meet call
+PAGE = b"""<!doctype html>
+<html><head><style>
+  body { margin: 0; background: #202124; }
+  #grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(30%, 1fr)); gap: 4px; height: 100vh; }
+  video { width: 100%; height: 100%; object-fit: cover; background: #3c4043; border-radius: 8px; }
+</style></head><body><div id="grid"></div></body></html>
+"""
+
+# Runs in the participants' browser: one animated video track per tile and one audio track,
+# offered to the bot once ICE candidates are gathered
+PARTICIPANTS_SCRIPT = """
+const [tiles, width, height, fps, done] = arguments;
+(async () => {
+  window.pc = new RTCPeerConnection();
+  for (let i = 0; i < tiles; i++) {
+    const canvas = document.createElement("canvas");
+    canvas.width = width;
+    canvas.height = height;
+    const context = canvas.getContext("2d");
+    let frame = 0;
+    setInterval(() => {
+      frame++;
+      context.fillStyle = `hsl(${(frame + i * 40) % 360}, 60%, 40%)`;
+      context.fillRect(0, 0, width, height);
+      for (let j = 0; j < 20; j++) {
+        context.fillStyle = `hsl(${(j * 18 + frame * 3) % 360}, 80%, 60%)`;
+        context.fillRect((frame * (j + 1) * 3) % width, (j * height / 20 + frame) % height, width / 8, height / 12);
+      }
+    }, 1000 / fps);
+    const stream = canvas.captureStream(fps);
+    pc.addTrack(stream.getVideoTracks()[0], stream);
+  }
+  const audio = new AudioContext();
+  const oscillator = audio.createOscillator();
+  const destination = audio.createMediaStreamDestination();
+  oscillator.connect(destination);
+  oscillator.start();
+  pc.addTrack(destination.stream.getAudioTracks()[0], destination.stream);
+  await pc.setLocalDescription(await pc.createOffer());
+  await new Promise(resolve => {
+    if (pc.iceGatheringState === "complete") resolve();
+    pc.addEventListener("icegatheringstatechange", () => pc.iceGatheringState === "complete" && resolve());
+  });
+  done(pc.localDescription.sdp);
+})();
+"""
+
+# Runs in the bot's browser: show each received track in a tile and answer the offer
+BOT_SCRIPT = """
+const [offer, done] = arguments;
+(async () => {
+  window.pc = new RTCPeerConnection();
+  pc.ontrack = event => {
+    const element = document.createElement(event.track.kind);
+    element.autoplay = true;
+    element.srcObject = new MediaStream([event.track]);
+    document.getElementById("grid").appendChild(element);
+  };
+  await pc.setRemoteDescription({type: "offer", sdp: offer});
+  await pc.setLocalDescription(await pc.createAnswer());
+  await new Promise(resolve => {
+    if (pc.iceGatheringState === "complete") resolve();
+    pc.addEventListener("icegatheringstatechange", () => pc.iceGatheringState === "complete" && resolve());
+  });
+  done(pc.localDescription.sdp);
+})();
+"""
+
+ANSWER_SCRIPT = """
+const [answer, done] = arguments;
+pc.setRemoteDescription({type: "answer", sdp: answer}).then(() => done(true));
+"""
+
+# Totals of what the bot's browser received so far
+STATS_SCRIPT = """
+const done = arguments[0];
+pc.getStats().then(report => {
+  const totals = {audio_packets: 0, audio_energy: 0, video_frames: 0, bytes: 0};
+  report.forEach(stat => {
+    if (stat.type !== "inbound-rtp") return;
+    totals.bytes += stat.bytesReceived || 0;
+    if (stat.kind === "audio") {
+      totals.audio_packets += stat.packetsReceived || 0;
+      totals.audio_energy += stat.totalAudioEnergy || 0;
+    } else {
+      totals.video_frames += stat.framesDecoded || 0;
+    }
+  });
+  done(totals);
+});
+"""
+
+
+def serve_page():
+    # Serve PAGE on a free localhost port from a background thread; returns the server and its URL
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+async def start_chrome(arguments):
+    options = uc.ChromeOptions()
+    for arg in arguments:
+        options.add_argument(arg)
+    browser = BrowserWorker()
+    await browser.start(lambda: uc.Chrome(use_subprocess=False, options=options))
+    return browser
+
+
+async def execute_async(browser, script, *args, timeout=60):
+    browser.driver.set_script_timeout(timeout)
+    return await browser.run(browser.driver.execute_async_script, script, *args)
+
+
+async def measure(lean, url, tiles, tile_size, fps, warmup, seconds):
+    # Resource use of a bot browser receiving a call of `tiles` video participants, as the bots
+    # configure it, with the participants in a separate headless browser that is not measured
+    participants = await start_chrome(["--headless=new", "--no-sandbox", "--autoplay-policy=no-user-gesture-required"])
+    bot = await start_chrome(chrome_arguments(lean))
+    try:
+        await bot.set_window_size(*window_size(lean))
+        if lean:
+            await bot.use_lean_pages()
+        await participants.get(url)
+        await bot.get(url)
+
+        offer = await execute_async(participants, PARTICIPANTS_SCRIPT, tiles, *tile_size, fps)
+        answer = await execute_async(bot, BOT_SCRIPT, offer)
+        await execute_async(participants, ANSWER_SCRIPT, answer)
+        if lean:
+            # As the bots do once in the meeting
+            await bot.block_images()
+        await asyncio.sleep(warmup)
+
+        pids = [bot.driver.browser_pid] + descendants(bot.driver.browser_pid)
+        stats_start = await execute_async(bot, STATS_SCRIPT)
+        cpu_start, wall_start = total_cpu_seconds(pids), time.monotonic()
+        await asyncio.sleep(seconds)
+        cpu = total_cpu_seconds(pids) - cpu_start
+        wall = time.monotonic() - wall_start
+        stats = await execute_async(bot, STATS_SCRIPT)
+        # Processes may have come and gone; memory is taken from those alive now
+        pids = [bot.driver.browser_pid] + descendants(bot.driver.browser_pid)
+        return {
+            "cpu": cpu / wall,
+            "rss": total_rss_bytes(pids),
+            "pss": total_pss_bytes(pids),
+            "processes": len(pids),
+            **{key: (stats[key] - stats_start[key]) / wall for key in stats}
+        }
+    finally:
+        await bot.quit()
+        await participants.quit()
+
+
+@click.command()
+@click.option("--modes", default="default,lean", help="Comma-separated browser modes to measure")
+@click.option("--tiles", default=9, help="Participants sending video")
+@click.option("--tile-size", default="640x360", help="Resolution of each participant's video")
+@click.option("--fps", default=30)
+@click.option("--warmup", default=10.0, help="Seconds before measuring, for the call to settle")
+@click.option("--seconds", default=30.0, help="Seconds to measure each mode for")
+def main(modes, tiles, tile_size, fps, warmup, seconds):
+    # CPU and memory of one bot's Chrome in the default and lean browser modes, in a call of
+    # `tiles` participants sending video and audio to it over WebRTC, like a Meet call. Audio
+    # packets and energy received show the meeting audio still arrives in lean mode.
+    # Run inside the bot container (Chrome, Xvfb on DISPLAY; PulseAudio to play the audio).
+    server, url = serve_page()
+    size = tuple(int(n) for n in tile_size.split("x"))
+    results = {}
+    click.echo(
+        f"{'mode':<8} {'cpu % core':>10} {'RSS MB':>8} {'PSS MB':>8} {'procs':>6} "
+        f"{'audio pkt/s':>12} {'audio energy/s':>15} {'video fps':>10} {'kbit/s in':>10}"
+    )
+    try:
+        for mode in modes.split(","):
+            result = results[mode] = asyncio.run(measure(mode == "lean", url, tiles, size, fps, warmup, seconds))
+            click.echo(
+                f"{mode:<8} {result['cpu'] * 100:>10.1f} {result['rss'] / 1e6:>8.0f} {result['pss'] / 1e6:>8.0f} "
+                f"{result['processes']:>6} {result['audio_packets']:>12.1f} {result['audio_energy']:>15.4f} "
+                f"{result['video_frames']:>10.1f} {result['bytes'] * 8 / 1e3:>10.0f}"
+            )
+    finally:
+        server.shutdown()
+
+    if "default" in results and "lean" in results:
+        default, lean = results["default"], results["lean"]
+        click.echo(
+            f"lean vs default: CPU {(lean['cpu'] / default['cpu'] - 1) if default['cpu'] else 0:+.0%}, "
+            f"PSS {(lean['pss'] / default['pss'] - 1) if default['pss'] else 0:+.0%}"
+        )
+        # Lean mode must leave the audio alone
+        if lean["audio_packets"] < 0.9 * default["audio_packets"]:
+            click.echo("Lean mode received noticeably less audio than the default mode", err=True)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from browser import BrowserWorker  # noqa: E402
+from streaming import AudioStreamer  # noqa: E402
+from pcm_source import RecordingWebSocket, feed_realtime_pcm  # noqa: E402
+
+
+class SlowElement:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def click(self):
+        time.sleep(self.latency)
+
+    def send_keys(self, keys):
+        time.sleep(self.latency)
+
+
+class SlowDriver:
+    # WebDriver stand-in whose every command blocks like a chromedriver round trip
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get(self, url):
+        time.sleep(self.latency * 5)
+
+    def find_element(self, by, value):
+        time.sleep(self.latency)
+        return SlowElement(self.latency)
+
+    def save_screenshot(self, path):
+        time.sleep(self.latency * 2)
+        return True
+
+    def quit(self):
+        pass
+
+
+async def browser_actions_on_worker(browser, stop):
+    while not stop.is_set():
+        await browser.get("https://meet.google.com")
+        await browser.click("xpath", "//span")
+        await browser.save_screenshot("screenshot.png")
+
+
+async def browser_actions_inline(driver, stop):
+    # The old pattern: blocking WebDriver calls made directly from a coroutine
+    while not stop.is_set():
+        driver.get("https://meet.google.com")
+        driver.find_element("xpath", "//span").click()
+        driver.save_screenshot("screenshot.png")
+        await asyncio.sleep(0)
+
+
+def send_jitter_ms(sent_at, chunk_duration):
+    # Absolute deviation of each send from its slot on an ideal audio clock
+    origin = sent_at[0]
+    return [abs(t - origin - i * chunk_duration) * 1000 for i, t in enumerate(sent_at)]
+
+
+async def measure(mode, seconds, latency, chunk_ms):
+    websocket = RecordingWebSocket(time.monotonic)
+    streamer = AudioStreamer(websocket, 16000, chunk_ms)
+    reader = asyncio.StreamReader()
+    stop = asyncio.Event()
+
+    driver = SlowDriver(latency)
+    if mode == "worker":
+        browser = BrowserWorker()
+        await browser.start(lambda: driver)
+        actions = asyncio.create_task(browser_actions_on_worker(browser, stop))
+    else:
+        actions = asyncio.create_task(browser_actions_inline(driver, stop))
+
+    await asyncio.gather(feed_realtime_pcm(reader, seconds, 16000, chunk_ms), streamer.run(reader))
+    stop.set()
+    await actions
+    if mode == "worker":
+        await browser.quit()
+    return send_jitter_ms(websocket.sent_at, streamer.chunk_duration)
+
+
+@click.command()
+@click.option("--seconds", default=20.0, help="Seconds of audio to stream in each mode")
+@click.option("--latency", default=0.2, help="Seconds each simulated WebDriver command blocks for")
+@click.option("--chunk-ms", default=100, help="Chunk duration in milliseconds")
+@click.option("--max-jitter-ms", default=50.0, help="Bound on p99 send jitter with the browser worker")
+def main(seconds, latency, chunk_ms, max_jitter_ms):
+    # Stream synthetic audio while browser actions run, with WebDriver calls on the worker
+    # thread and inline on the event loop, and check the worker keeps send jitter bounded
+    results = {}
+    click.echo(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("worker", "inline"):
+        jitter = sorted(asyncio.run(measure(mode, seconds, latency, chunk_ms)))
+        p99 = jitter[int(len(jitter) * 0.99) - 1]
+        results[mode] = p99
+        click.echo(f"{mode:<8} {statistics.median(jitter):>8.1f} {p99:>8.1f} {jitter[-1]:>8.1f}")
+
+    if results["worker"] > max_jitter_ms:
+        click.echo(f"FAIL: p99 jitter {results['worker']:.1f}ms exceeds {max_jitter_ms:g}ms with the browser worker")
+        sys.exit(1)
+    click.echo(f"OK: p99 jitter stays under {max_jitter_ms:g}ms with the browser worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bot_scripts import load_bot  # noqa: E402
+from capture import CAPTURE_BACKENDS  # noqa: E402
+from end_to_end import percentiles  # noqa: E402
+from pcm_source import tone_chunk  # noqa: E402
+from proc_stats import descendants, pids_named, total_cpu_seconds, total_rss_bytes  # noqa: E402
+
+SAMPLE_RATE = 16000
+# Plays our PCM into the bot's sink with as little buffering as PulseAudio allows
+PLAYBACK_COMMAND = (
+    "pacat --playback --device={sink} --format=s16le --rate={rate} --channels=1 "
+    "--latency-msec=10 --process-time-msec=5"
+)
+# Beeps are this loud, and anything above half of it counts as the beep arriving
+BEEP_AMPLITUDE = 0.5
+
+
+class BeepDetector:
+    # Stand-in websocket that notes when each beep shows up in the audio being sent
+    def __init__(self):
+        self.beep_detected_at = []
+        self.in_beep = False
+        self.threshold = 32767 * BEEP_AMPLITUDE / 2
+
+    async def send(self, frame):
+        loud = bool(np.abs(np.frombuffer(frame, dtype="<i2")).max() > self.threshold)
+        if loud and not self.in_beep:
+            self.beep_detected_at.append(time.monotonic())
+        self.in_beep = loud
+
+
+async def play_beeps(player, seconds, beep_every, chunk_ms=10):
+    # Write silence in real time, with a 100 ms beep every `beep_every` seconds; returns when each beep was written
+    silence = bytes(SAMPLE_RATE * chunk_ms // 1000 * 2)
+    beep = tone_chunk(SAMPLE_RATE, chunk_ms, frequency=1000, amplitude=BEEP_AMPLITUDE)
+    chunk_duration = chunk_ms / 1000
+    beep_chunks = int(0.1 / chunk_duration)
+    every = int(beep_every / chunk_duration)
+    beeps_written_at = []
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    for i in range(int(seconds / chunk_duration)):
+        delay = started_at + i * chunk_duration - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        position = i % every
+        if position == 0 and i:
+            beeps_written_at.append(time.monotonic())
+        player.stdin.write(beep if 0 < i and position < beep_chunks else silence)
+        player.stdin.flush()
+    return beeps_written_at
+
+
+async def run_backend(bot, backend, sink, seconds, beep_every):
+    bot.CAPTURE_BACKEND = backend
+    player = subprocess.Popen(PLAYBACK_COMMAND.format(sink=sink, rate=SAMPLE_RATE).split(), stdin=subprocess.PIPE)
+    detector = BeepDetector()
+    capture = asyncio.create_task(bot.capture_and_stream_audio(detector, f"{sink}.monitor"))
+    try:
+        # Let the capture start before measuring
+        await asyncio.sleep(2)
+        excluded = {player.pid}
+        measured = [pid for pid in descendants(os.getpid()) if pid not in excluded]
+        process_count = 1 + len(measured)
+        measured += [os.getpid()] + pids_named("pulseaudio")
+        cpu_start, wall_start = total_cpu_seconds(measured), time.monotonic()
+        beeps_written_at = await play_beeps(player, seconds, beep_every)
+        await asyncio.sleep(1)
+        cpu = (total_cpu_seconds(measured) - cpu_start) / (time.monotonic() - wall_start)
+        rss = total_rss_bytes([pid for pid in measured if pid not in pids_named("pulseaudio")])
+    finally:
+        capture.cancel()
+        await asyncio.gather(capture, return_exceptions=True)
+        player.stdin.close()
+        player.terminate()
+        player.wait()
+
+    # Pair each beep written with the first detection after it
+    latencies = []
+    for written_at in beeps_written_at:
+        detected = [t for t in detector.beep_detected_at if t >= written_at]
+        if detected and detected[0] - written_at < beep_every:
+            latencies.append(detected[0] - written_at)
+    return latencies, len(beeps_written_at), cpu, rss, process_count
+
+
+@click.command()
+@click.option("--seconds", default=30.0, help="Seconds to measure each backend for")
+@click.option("--beep-every", default=1.0, help="Seconds between beeps used to measure latency")
+@click.option("--chunk-ms", default=20, help="Audio chunk duration; latency can't be resolved below it")
+@click.option("--backends", default=",".join(CAPTURE_BACKENDS), help="Comma-separated backends to compare")
+def main(seconds, beep_every, chunk_ms, backends):
+    # Compare the live capture backends: latency from audio being played into the meeting
+    # sink to the streamer sending it, CPU of the bot's processes plus PulseAudio, RSS of
+    # the bot's processes, and how many processes the bot runs.
+    # Run inside the live container, after setup_audio_drivers() has started PulseAudio.
+    os.environ["AUDIO_CHUNK_DURATION_MS"] = str(chunk_ms)
+    bot = load_bot("gmeet-live.py")
+    sink, module_index = asyncio.run(bot.create_session_sink(99))
+    try:
+        click.echo(f"{seconds:g}s per backend, {chunk_ms} ms chunks, a beep every {beep_every:g}s")
+        click.echo(f"{'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'beeps':>7} {'cpu % core':>11} {'RSS MB':>8} {'processes':>10}")
+        for backend in backends.split(","):
+            latencies, beeps, cpu, rss, processes = asyncio.run(run_backend(bot, backend, sink, seconds, beep_every))
+            p = percentiles(latencies)
+            click.echo(
+                f"{backend:<10} {p[50]:>8.1f} {p[95]:>8.1f} {len(latencies):>3}/{beeps:<3} "
+                f"{cpu * 100:>11.1f} {rss / 1e6:>8.1f} {processes:>10}"
+            )
+    finally:
+        asyncio.run(bot.remove_session_sink(module_index))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from bot_scripts import load_bot  # noqa: E402
+from proc_stats import cpu_seconds, rss_bytes  # noqa: E402
+from streaming import BYTES_PER_SAMPLE, LiveConnection, ReplayBuffer  # noqa: E402
+
+FAKE_GLADIA = os.path.join(BENCHMARKS_DIR, "fake_gladia.py")
+PCM_SOURCE = os.path.join(BENCHMARKS_DIR, "pcm_source.py")
+
+
+def percentiles(values, points=(50, 95, 99)):
+    # Nearest-rank percentiles, in milliseconds, of latencies given in seconds
+    if not values:
+        return {point: float("nan") for point in points}
+    ordered = sorted(values)
+    return {point: ordered[min(len(ordered) - 1, len(ordered) * point // 100)] * 1000 for point in points}
+
+
+def format_latencies(name, values):
+    p = percentiles(values)
+    return f"{name:<22} n={len(values):<6} p50 {p[50]:7.1f}ms  p95 {p[95]:7.1f}ms  p99 {p[99]:7.1f}ms"
+
+
+class InstrumentedConnection:
+    # Wraps a LiveConnection and times each acknowledgment and transcript against the
+    # moment the audio it covers was sent
+    def __init__(self, connection, bytes_per_second):
+        self.connection = connection
+        self.bytes_per_second = bytes_per_second
+        self.sent_offsets = []
+        self.sent_times = []
+        self.sent_bytes = 0
+        self.messages = 0
+        self.ack_latencies = []
+        self.partial_latencies = []
+        self.final_latencies = []
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    async def send_audio(self, chunk, frame):
+        self.sent_bytes += len(chunk)
+        self.sent_offsets.append(self.sent_bytes)
+        self.sent_times.append(time.monotonic())
+        await self.connection.send_audio(chunk, frame)
+
+    def _since_sent(self, offset):
+        i = bisect.bisect_left(self.sent_offsets, offset)
+        if i == len(self.sent_offsets):
+            return None
+        return time.monotonic() - self.sent_times[i]
+
+    async def __aiter__(self):
+        async for message in self.connection:
+            self.messages += 1
+            content = json.loads(message)
+            if content.get("type") == "audio_chunk" and content.get("acknowledged"):
+                latency = self._since_sent(content["data"]["byte_range"][1])
+                if latency is not None:
+                    self.ack_latencies.append(latency)
+            elif content.get("type") == "transcript":
+                offset = round(content["data"]["utterance"]["end"] * self.bytes_per_second)
+                latency = self._since_sent(offset)
+                if latency is not None:
+                    (self.final_latencies if content["data"]["is_final"] else self.partial_latencies).append(latency)
+            yield message
+
+
+async def run_live_session(bot, seconds, output_dir):
+    # One live session: synthetic capture -> streamer -> fake live API -> message handler
+    bytes_per_second = bot.SAMPLE_RATE * BYTES_PER_SAMPLE
+
+    async def open_session():
+        return (await bot.init_live_session("benchmark"))["url"]
+
+    connection = InstrumentedConnection(
+        LiveConnection(open_session, ReplayBuffer(bot.REPLAY_BUFFER_SECONDS * bytes_per_second), bytes_per_second),
+        bytes_per_second
+    )
+    await connection.connect()
+    os.makedirs(output_dir, exist_ok=True)
+    transcription = asyncio.create_task(bot.handle_transcription_messages(connection, output_dir))
+    try:
+        # Like transcribe_live, stream for the meeting's duration then stop the capture
+        audio = asyncio.create_task(bot.capture_and_stream_audio(connection))
+        await asyncio.sleep(seconds)
+        audio.cancel()
+        await asyncio.gather(audio, return_exceptions=True)
+        await asyncio.wait_for(connection.stop(), 30)
+        await asyncio.wait_for(transcription, 60)
+    finally:
+        transcription.cancel()
+        await connection.close()
+    return connection
+
+
+async def run_live(bot, sessions, seconds, output_dir):
+    pid = os.getpid()
+    cpu_start, wall_start = cpu_seconds(pid), time.monotonic()
+    try:
+        connections = await asyncio.gather(*(
+            run_live_session(bot, seconds, os.path.join(output_dir, f"live-{i}")) for i in range(sessions)
+        ))
+    finally:
+        await bot.close_http_session()
+    return connections, (cpu_seconds(pid) - cpu_start) / (time.monotonic() - wall_start), rss_bytes(pid)
+
+
+async def run_batch(gladia, jobs, upload_mb, output_dir):
+    # `jobs` concurrent uploads + transcriptions of a synthetic recording
+    file_path = os.path.join(output_dir, "recording.ogg")
+    with open(file_path, "wb") as f:
+        f.write(os.urandom(int(upload_mb * 1e6)))
+
+    async def one_job(i):
+        started_at = time.monotonic()
+        response = await gladia.handle_transcription(
+            "benchmark", file_path, "audio/ogg", os.path.join(output_dir, f"batch-{i}")
+        )
+        return time.monotonic() - started_at, response
+
+    pid = os.getpid()
+    cpu_start, wall_start = cpu_seconds(pid), time.monotonic()
+    try:
+        results = await asyncio.gather(*(one_job(i) for i in range(jobs)))
+    finally:
+        await gladia.close_http_session()
+    wall = time.monotonic() - wall_start
+    return results, wall, (cpu_seconds(pid) - cpu_start) / wall, rss_bytes(pid)
+
+
+def wait_for_server(server, port_file, timeout=10):
+    # The port the fake server listens on, once it does. Fails fast if it exits first, e.g. when
+    # the port is taken, rather than benchmarking whatever else is listening there.
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise click.ClickException(f"Fake Gladia server exited with code {server.returncode} before listening")
+        if os.path.exists(port_file):
+            with open(port_file) as f:
+                return int(f.read())
+        time.sleep(0.1)
+    raise click.ClickException(f"Fake Gladia server did not start within {timeout:.0f}s")
+
+
+@click.command()
+@click.option("--seconds", default=30.0, help="Seconds of synthetic meeting audio per live session")
+@click.option("--sessions", default=1, help="Concurrent live sessions")
+@click.option("--jobs", default=4, help="Concurrent batch upload + transcription jobs")
+@click.option("--upload-mb", default=5.0, help="Size of the synthetic recording uploaded by each job")
+@click.option("--port", default=0, help="Port for the fake Gladia server (0 = any free port)")
+@click.option("--ack-latency-ms", default=20.0)
+@click.option("--transcript-latency-ms", default=300.0)
+@click.option("--partial-interval", default=0.5)
+@click.option("--final-interval", default=3.0)
+@click.option("--processing-seconds", default=2.0)
+@click.option("--max-final-p95-ms", default=0.0, help="Fail if final transcript p95 latency exceeds this (0 = no limit)")
+@click.option("--max-cpu-percent", default=0.0, help="Fail if live streaming CPU exceeds this (0 = no limit)")
+@click.option("--verbose", is_flag=True, help="Keep the bot's INFO logging")
+def main(seconds, sessions, jobs, upload_mb, port, ack_latency_ms, transcript_latency_ms, partial_interval,
+         final_interval, processing_seconds, max_final_p95_ms, max_cpu_percent, verbose):
+    # End-to-end benchmark of the bots' Gladia paths against a local fake Gladia API.
+    # Live: synthetic real-time PCM stands in for the PulseAudio capture and is driven through
+    # capture_and_stream_audio and handle_transcription_messages. Batch: handle_transcription
+    # uploads a synthetic recording and waits in poll_transcription_results.
+    # Only this process is measured; the fake server and the PCM source run as subprocesses.
+    port_dir = tempfile.TemporaryDirectory()
+    port_file = os.path.join(port_dir.name, "port")
+    server = subprocess.Popen([
+        sys.executable, FAKE_GLADIA, "--port", str(port), "--port-file", port_file,
+        "--ack-latency-ms", str(ack_latency_ms), "--transcript-latency-ms", str(transcript_latency_ms),
+        "--partial-interval", str(partial_interval), "--final-interval", str(final_interval),
+        "--processing-seconds", str(processing_seconds),
+    ])
+    try:
+        port = wait_for_server(server, port_file)
+        # The Gladia URL is read when the bot modules are imported
+        os.environ["GLADIA_API_URL"] = f"http://127.0.0.1:{port}/v2"
+        bot = load_bot("gmeet-live.py")
+        import gladia
+        if not verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        # The synthetic source replaces the ffmpeg PulseAudio capture; it outlives the
+        # measured window since the capture is stopped the way the bot stops it
+        bot.build_live_capture_command = lambda source, sample_rate, *args: (
+            f"{sys.executable} {PCM_SOURCE} --seconds {seconds + 60} --sample-rate {sample_rate}"
+        )
+
+        failed = False
+        with tempfile.TemporaryDirectory() as output_dir:
+            connections, cpu, rss = asyncio.run(run_live(bot, sessions, seconds, output_dir))
+            sent = sum(connection.sent_bytes for connection in connections)
+            messages = sum(connection.messages for connection in connections)
+            finals = [latency for connection in connections for latency in connection.final_latencies]
+            click.echo(f"Live: {sessions} session(s) x {seconds:.0f}s of audio")
+            click.echo(f"  throughput             {sent / 1e3 / seconds:.1f} KB/s audio sent, {messages / seconds:.1f} messages/s handled")
+            click.echo("  " + format_latencies("ack round trip", [l for c in connections for l in c.ack_latencies]))
+            click.echo("  " + format_latencies("partial transcript", [l for c in connections for l in c.partial_latencies]))
+            click.echo("  " + format_latencies("final transcript", finals))
+            click.echo(f"  cpu                    {cpu * 100:.1f}% of a core, RSS {rss / 1e6:.1f} MB")
+
+            if max_final_p95_ms and percentiles(finals)[95] > max_final_p95_ms:
+                click.echo(f"FAIL: final transcript p95 above {max_final_p95_ms:.0f}ms")
+                failed = True
+            if max_cpu_percent and cpu * 100 > max_cpu_percent:
+                click.echo(f"FAIL: live streaming CPU above {max_cpu_percent:.1f}%")
+                failed = True
+
+            if jobs:
+                results, wall, cpu, rss = asyncio.run(run_batch(gladia, jobs, upload_mb, output_dir))
+                done = sum(1 for _, response in results if response and response.get("status") == "done")
+                click.echo(f"Batch: {jobs} job(s) x {upload_mb:.1f} MB")
+                click.echo(f"  throughput             {jobs * upload_mb / wall:.1f} MB/s uploaded, {done}/{jobs} done in {wall:.1f}s")
+                click.echo("  " + format_latencies("upload to transcript", [latency for latency, _ in results]))
+                click.echo(f"  cpu                    {cpu * 100:.1f}% of a core, RSS {rss / 1e6:.1f} MB")
+                if done < jobs:
+                    click.echo("FAIL: some batch jobs did not complete")
+                    failed = True
+    finally:
+        server.terminate()
+        server.wait()
+        port_dir.cleanup()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import asyncio
+import base64
+import json
+import os
+import time
+import uuid
+
+import click
+from aiohttp import WSMsgType, web
+
+# Audio the live sessions receive is mono s16le at this rate
+BYTES_PER_SECOND = 16000 * 2
+
+WORDS = "the quick brown fox jumps over the lazy dog".split()
+
+
+def sample_text(seconds):
+    # Roughly two and a half words per second of speech
+    count = max(1, int(seconds * 2.5))
+    return " ".join(WORDS[i % len(WORDS)] for i in range(count))
+
+
+class DueQueue(asyncio.Queue):
+    # Queue whose messages become available at the time they are due
+    def put(self, due, message):
+        asyncio.get_running_loop().call_at(due, self.put_nowait, message)
+
+
+class FakeGladia:
+    # Local stand-in for the Gladia v2 API, for load testing the bots without an account.
+    #
+    # Live sessions acknowledge every audio chunk after `ack_latency`, send a partial
+    # transcript every `partial_interval` seconds of audio received and a final one every
+    # `final_interval` seconds, each `transcript_latency` after the audio it covers
+    # arrived. Batch jobs accept uploads, then stay queued/processing for
+    # `processing_seconds` before returning a canned transcript.
+
+    def __init__(self, ack_latency=0.02, transcript_latency=0.3, partial_interval=0.5, final_interval=3.0,
+                 upload_latency=0.05, processing_seconds=2.0):
+        self.ack_latency = ack_latency
+        self.transcript_latency = transcript_latency
+        self.partial_interval = partial_interval
+        self.final_interval = final_interval
+        self.upload_latency = upload_latency
+        self.processing_seconds = processing_seconds
+        self.jobs = {}
+        self.base_url = None
+
+    def app(self):
+        app = web.Application(client_max_size=0)
+        for path, handler in (
+            ("/v2/live", self.init_live),
+            ("/v2/upload", self.upload),
+            ("/v2/transcription", self.create_transcription),
+        ):
+            app.router.add_post(path, handler)
+            app.router.add_post(f"{path}/", handler)
+        app.router.add_get("/v2/live/{session_id}", self.live_session)
+        app.router.add_get("/v2/transcription/{job_id}", self.get_transcription)
+        return app
+
+    async def init_live(self, request):
+        session_id = uuid.uuid4().hex
+        ws_url = self.base_url.replace("http", "ws", 1)
+        return web.json_response({"id": session_id, "url": f"{ws_url}/v2/live/{session_id}"})
+
+    async def live_session(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        outgoing = DueQueue()
+        sender = asyncio.create_task(self._send_when_due(ws, outgoing))
+        loop = asyncio.get_running_loop()
+        received = 0
+        utterance_start = 0.0
+        next_partial = self.partial_interval
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.BINARY:
+                    length = len(msg.data)
+                elif msg.type == WSMsgType.TEXT:
+                    content = json.loads(msg.data)
+                    if content.get("type") == "stop_recording":
+                        outgoing.put(loop.time() + self.transcript_latency, {
+                            "type": "post_processing_result",
+                            "transcription": {"full_transcript": sample_text(received / BYTES_PER_SECOND)},
+                        })
+                        outgoing.put(loop.time() + self.transcript_latency, None)
+                        continue
+                    if content.get("type") != "audio_chunk":
+                        continue
+                    length = len(base64.b64decode(content["data"]["chunk"]))
+                else:
+                    break
+
+                start, received = received, received + length
+                now = loop.time()
+                outgoing.put(now + self.ack_latency, {
+                    "type": "audio_chunk", "acknowledged": True, "data": {"byte_range": [start, received]},
+                })
+
+                audio_time = received / BYTES_PER_SECOND
+                if audio_time - utterance_start >= self.final_interval:
+                    outgoing.put(now + self.transcript_latency, self._transcript(utterance_start, audio_time, True))
+                    utterance_start = audio_time
+                    next_partial = audio_time + self.partial_interval
+                elif audio_time >= next_partial:
+                    outgoing.put(now + self.transcript_latency, self._transcript(utterance_start, audio_time, False))
+                    next_partial = audio_time + self.partial_interval
+        finally:
+            outgoing.put(0, None)
+            await sender
+        return ws
+
+    def _transcript(self, start, end, is_final):
+        return {
+            "type": "transcript",
+            "data": {
+                "is_final": is_final,
+                "utterance": {"start": start, "end": end, "text": sample_text(end - start)},
+            },
+        }
+
+    async def _send_when_due(self, ws, outgoing):
+        # Send messages as they come due; None closes the session
+        while True:
+            message = await outgoing.get()
+            if message is None:
+                await ws.close()
+                return
+            if not ws.closed:
+                await ws.send_str(json.dumps(message))
+
+    async def upload(self, request):
+        size = 0
+        async for data in request.content.iter_any():
+            size += len(data)
+        await asyncio.sleep(self.upload_latency)
+        return web.json_response({
+            "audio_url": f"{self.base_url}/files/{uuid.uuid4().hex}",
+            "audio_metadata": {"size": size},
+        })
+
+    async def create_transcription(self, request):
+        await request.json()
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = time.monotonic()
+        return web.json_response({"id": job_id, "result_url": f"{self.base_url}/v2/transcription/{job_id}"})
+
+    async def get_transcription(self, request):
+        job_id = request.match_info["job_id"]
+        if job_id not in self.jobs:
+            return web.json_response({"error": "not found"}, status=404)
+        elapsed = time.monotonic() - self.jobs[job_id]
+        if elapsed < self.processing_seconds / 2:
+            return web.json_response({"id": job_id, "status": "queued"})
+        if elapsed < self.processing_seconds:
+            return web.json_response({"id": job_id, "status": "processing"})
+        text = sample_text(60)
+        return web.json_response({
+            "id": job_id,
+            "status": "done",
+            "result": {"transcription": {
+                "full_transcript": text,
+                "utterances": [{"start": 0.0, "end": 60.0, "text": text, "speaker": 0}],
+            }},
+        })
+
+
+async def serve(fake, host, port, port_file=None):
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    # The port actually bound, when asked for any free one (port 0)
+    port = runner.addresses[0][1]
+    fake.base_url = f"http://{host}:{port}"
+    if port_file:
+        # Written whole in one go, so a reader never sees half of it
+        with open(f"{port_file}.tmp", "w") as f:
+            f.write(str(port))
+        os.replace(f"{port_file}.tmp", port_file)
+    click.echo(f"Fake Gladia API listening on {fake.base_url}/v2", err=True)
+    await asyncio.Event().wait()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=8080, help="Port to listen on (0 = any free port)")
+@click.option("--port-file", default=None, help="Write the port listened on to this file once listening")
+@click.option("--ack-latency-ms", default=20.0, help="Delay before each audio chunk is acknowledged")
+@click.option("--transcript-latency-ms", default=300.0, help="Delay between audio arriving and its transcript")
+@click.option("--partial-interval", default=0.5, help="Seconds of audio between partial transcripts")
+@click.option("--final-interval", default=3.0, help="Seconds of audio per final transcript")
+@click.option("--upload-latency-ms", default=50.0, help="Delay before an upload is answered")
+@click.option("--processing-seconds", default=2.0, help="How long batch jobs take to complete")
+def main(host, port, port_file, ack_latency_ms, transcript_latency_ms, partial_interval, final_interval,
+         upload_latency_ms, processing_seconds):
+    # Run the fake API; point the bots at it with GLADIA_API_URL=http://<host>:<port>/v2
+    fake = FakeGladia(
+        ack_latency_ms / 1000, transcript_latency_ms / 1000, partial_interval, final_interval,
+        upload_latency_ms / 1000, processing_seconds
+    )
+    try:
+        asyncio.run(serve(fake, host, port, port_file))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
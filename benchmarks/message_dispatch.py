@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import message_router  # noqa: E402
+from bot_scripts import load_bot  # noqa: E402
+from end_to_end import percentiles  # noqa: E402
+from fake_gladia import WORDS  # noqa: E402
+from streaming import LiveConnection, ReplayBuffer  # noqa: E402
+
+# A live session with the bot's STREAMING_CONFIGURATION: audio is acknowledged every chunk,
+# partials arrive every half second and an utterance is finalized every few seconds
+CHUNK_SECONDS = 0.1
+PARTIAL_INTERVAL = 0.5
+UTTERANCE_SECONDS = (2.0, 8.0)
+PAUSE_SECONDS = (0.3, 2.0)
+ENTITIES = {"Gladia": "ORGANIZATION", "Paris": "LOCATION", "Léo": "PERSON"}
+
+
+def decoding_connection(decode):
+    # LiveConnection whose acknowledgments are decoded with `decode`
+    class DecodingConnection(LiveConnection):
+        def _handle_acknowledgment(self, message):
+            content = decode(message)
+            if content.get("type") == "audio_chunk" and content.get("acknowledged"):
+                byte_range = content.get("data", {}).get("byte_range")
+                if byte_range:
+                    self.buffer.acknowledge(self.session_base_offset + byte_range[1])
+    return DecodingConnection
+
+
+def modes():
+    # (name, router class, connection class): every message decoded by the standard library, as
+    # before routing, then with the router peeking types, and the same with orjson when installed
+    found = [
+        ("json", functools.partial(message_router.MessageRouter, decode=json.loads, peek=False),
+         decoding_connection(json.loads)),
+        ("json, peek", functools.partial(message_router.MessageRouter, decode=json.loads, peek=True),
+         decoding_connection(json.loads)),
+    ]
+    if message_router.loads is not json.loads:
+        found += [
+            ("orjson", functools.partial(message_router.MessageRouter, peek=False), LiveConnection),
+            ("orjson, peek", functools.partial(message_router.MessageRouter, peek=True), LiveConnection),
+        ]
+    return found
+
+
+def synthetic_stream(seconds, seed=0):
+    # (arrival time, raw message) of a live session shaped like Gladia's, ending with its post-processing result
+    rng = random.Random(seed)
+    session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    events = []
+
+    def add(at, message_type, **fields):
+        message = {"session_id": session_id, "created_at": f"2026-01-01T00:00:{at % 60:06.3f}Z", "type": message_type}
+        message.update(fields)
+        events.append((at, json.dumps(message, ensure_ascii=False)))
+
+    def utterance(start, end):
+        words = [rng.choice(WORDS + list(ENTITIES)) for _ in range(max(1, int((end - start) * 2.5)))]
+        step = (end - start) / len(words)
+        return {
+            "text": " ".join(words), "start": start, "end": end, "confidence": 0.9, "channel": 0, "language": "en",
+            "words": [
+                {"word": f" {word}", "start": round(start + i * step, 3), "end": round(start + (i + 1) * step, 3), "confidence": 0.9}
+                for i, word in enumerate(words)
+            ],
+        }
+
+    add(0.0, "start_session")
+    add(0.0, "start_recording")
+    for i in range(int(seconds / CHUNK_SECONDS)):
+        start, end = i * CHUNK_SECONDS, (i + 1) * CHUNK_SECONDS
+        add(end + 0.02, "audio_chunk", acknowledged=True, error=None, data={
+            "byte_range": [int(start * 32000), int(end * 32000)], "time_range": [round(start, 3), round(end, 3)],
+        })
+
+    at, index, full_transcript = rng.uniform(*PAUSE_SECONDS), 0, []
+    while at < seconds:
+        end = min(at + rng.uniform(*UTTERANCE_SECONDS), seconds)
+        utterance_id = f"00-{index:08d}"
+        add(at + 0.1, "speech_start", data={"time": round(at, 3), "channel": 0})
+        partial_end = at + PARTIAL_INTERVAL
+        while partial_end < end:
+            add(partial_end + 0.3, "transcript", data={"id": utterance_id, "is_final": False, "utterance": utterance(at, partial_end)})
+            partial_end += PARTIAL_INTERVAL
+        add(end + 0.1, "speech_end", data={"time": round(end, 3), "channel": 0})
+        final = utterance(at, end)
+        full_transcript.append(final["text"])
+        add(end + 0.4, "transcript", data={"id": utterance_id, "is_final": True, "utterance": final})
+        entities = [
+            {"entity_type": ENTITIES[word["word"].strip()], "text": word["word"].strip(), "start": word["start"], "end": word["end"]}
+            for word in final["words"] if word["word"].strip() in ENTITIES
+        ]
+        add(end + 0.6, "named_entity_recognition", data={"utterance_id": utterance_id, "utterance": final, "results": entities})
+        add(end + 0.6, "sentiment_analysis", data={"utterance_id": utterance_id, "utterance": final, "results": [
+            {"sentiment": "neutral", "emotion": "neutral", "text": final["text"], "start": at, "end": end, "channel": 0}
+        ]})
+        at, index = end + rng.uniform(*PAUSE_SECONDS), index + 1
+
+    add(seconds + 0.5, "end_recording")
+    add(seconds + 1.0, "post_processing_result", transcription={"full_transcript": " ".join(full_transcript)},
+        summarization={"results": "- a meeting"}, chapters={"results": []})
+    add(seconds + 1.0, "end_session")
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def load_stream(path):
+    # A stream recorded by the live bot with LIVE_MESSAGE_LOG (live_messages.jsonl)
+    with open(path, encoding="utf-8") as f:
+        return [(record["at"], record["message"]) for record in map(json.loads, f)]
+
+
+class ReplayWebSocket:
+    # Stand-in websocket yielding the recorded messages at `speed` times their original pace,
+    # timing how long the bot takes with each one and how late it gets to it
+    def __init__(self, stream, speed):
+        self.stream = stream
+        self.speed = speed
+        self.handling_seconds = []
+        self.lateness_seconds = []
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        for at, message in self.stream:
+            due = started_at + at / self.speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.lateness_seconds.append(max(0.0, loop.time() - due))
+            handling_started_at = time.perf_counter()
+            yield message
+            self.handling_seconds.append(time.perf_counter() - handling_started_at)
+
+
+def replay_connection(connection_class, websocket):
+    # A live connection receiving from the replayed stream, acknowledgments included
+    connection = connection_class(None, ReplayBuffer(1 << 20), 32000)
+    connection._websocket = websocket
+    connection._connected.set()
+    # The stream ending is the end of the session, not a dropped connection
+    connection._stopping = True
+    return connection
+
+
+async def replay(bot, connection_class, stream, speed, output_dir):
+    websocket = ReplayWebSocket(stream, speed)
+    connection = replay_connection(connection_class, websocket)
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    await bot.handle_transcription_messages(connection, output_dir)
+    cpu = (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+    return websocket, cpu
+
+
+@click.command()
+@click.option("--stream", "stream_path", default=None, help="Recorded live_messages.jsonl to replay (default: a synthetic session)")
+@click.option("--seconds", default=600.0, help="Length of the synthetic session")
+@click.option("--speed", default=10.0, help="Replay speed relative to real time")
+@click.option("--save", default=None, help="Write the synthetic session to this file in the recorded format")
+def main(stream_path, seconds, speed, save):
+    # Replay a live message stream through a LiveConnection and handle_transcription_messages,
+    # faster than real time, with every message (acknowledgments included) decoded, or with the
+    # router peeking types to skip decoding unhandled ones, by the standard library and by orjson
+    # (the default when installed), and report
+    # per-message handling time, how far behind the receive loop falls, and CPU.
+    stream = load_stream(stream_path) if stream_path else synthetic_stream(seconds)
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            for at, message in stream:
+                f.write(json.dumps({"at": at, "message": message}, ensure_ascii=False) + "\n")
+    bot = load_bot("gmeet-live.py")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    duration = stream[-1][0]
+    types = {message_router.peek_type(message) for _, message in stream}
+    click.echo(
+        f"{len(stream)} messages of {len(types)} types over {duration:.0f}s, replayed at {speed:g}x "
+        f"({len(stream) / duration * speed:.0f} messages/s), default decoder {message_router.loads.__module__}"
+    )
+    acknowledgments = [message_router.peek_type(message) == "audio_chunk" for _, message in stream]
+    click.echo(
+        f"{'mode':<14} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'ack p50 us':>11} {'ack p99 us':>11} "
+        f"{'max lag ms':>11} {'cpu % core':>11}"
+    )
+    for name, router, connection_class in modes():
+        bot.MessageRouter = router
+        with tempfile.TemporaryDirectory() as output_dir:
+            websocket, cpu = asyncio.run(replay(bot, connection_class, stream, speed, output_dir))
+        # percentiles() reports milliseconds
+        p = percentiles(websocket.handling_seconds)
+        ack = percentiles([seconds for seconds, is_ack in zip(websocket.handling_seconds, acknowledgments) if is_ack])
+        click.echo(
+            f"{name:<14} {p[50] * 1000:>8.1f} {p[95] * 1000:>8.1f} {p[99] * 1000:>8.1f} {ack[50] * 1000:>11.1f} "
+            f"{ack[99] * 1000:>11.1f} {max(websocket.lateness_seconds) * 1000:>11.1f} {cpu * 100:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bot_scripts import load_bot  # noqa: E402
+from pcm_source import RecordingWebSocket  # noqa: E402
+from proc_stats import descendants, pids_named, total_cpu_seconds, total_rss_bytes  # noqa: E402
+
+# Plays a tone into a session sink, standing in for the meeting audio Chrome would play
+TONE_COMMAND = "ffmpeg -loglevel error -re -f lavfi -i sine=frequency={frequency} -f pulse -device {sink} tone"
+
+
+async def run_sessions(bot, sessions, seconds):
+    # Run `sessions` isolated sink + capture pipelines side by side for `seconds`
+    sinks, tones, tasks, websockets = [], [], [], []
+    for session_id in range(1, sessions + 1):
+        sinks.append(await bot.create_session_sink(session_id))
+    try:
+        for session_id, (sink_name, _) in enumerate(sinks, start=1):
+            tones.append(subprocess.Popen(
+                TONE_COMMAND.format(frequency=200 + 50 * session_id, sink=sink_name).split()
+            ))
+            websocket = RecordingWebSocket(time.monotonic)
+            websockets.append(websocket)
+            tasks.append(asyncio.create_task(bot.capture_and_stream_audio(websocket, f"{sink_name}.monitor")))
+
+        # Let captures start before measuring
+        await asyncio.sleep(2)
+        tone_pids = {tone.pid for tone in tones}
+        measured = [pid for pid in descendants(os.getpid()) if pid not in tone_pids]
+        measured += [os.getpid()] + pids_named("pulseaudio")
+        cpu_start, wall_start = total_cpu_seconds(measured), time.monotonic()
+        streamed_start = sum(websocket.wire_bytes for websocket in websockets)
+        await asyncio.sleep(seconds)
+        cpu = total_cpu_seconds(measured) - cpu_start
+        wall = time.monotonic() - wall_start
+        rss = total_rss_bytes(measured)
+        streamed = sum(websocket.wire_bytes for websocket in websockets) - streamed_start
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for tone in tones:
+            tone.terminate()
+            tone.wait()
+        for _, module_index in sinks:
+            await bot.remove_session_sink(module_index)
+
+    return cpu / wall, rss, streamed
+
+
+@click.command()
+@click.option("--sessions", default="1,2,4,8", help="Comma-separated session counts to measure")
+@click.option("--seconds", default=30.0, help="Seconds to measure each session count for")
+def main(sessions, seconds):
+    # Load test of multi-session mode's audio side: per-session CPU and memory of the
+    # shared PulseAudio server, the per-session sinks and capture pipelines, and the
+    # streamers in this process, as the number of sessions grows.
+    # Run inside the live container, after setup_audio_drivers() has started PulseAudio.
+    bot = load_bot("gmeet-live.py")
+    click.echo(f"{'sessions':>8} {'cpu % core':>11} {'cpu/session':>12} {'RSS MB':>8} {'RSS/session':>12} {'KB/s/session':>13}")
+    for count in (int(n) for n in sessions.split(",")):
+        cpu, rss, streamed = asyncio.run(run_sessions(bot, count, seconds))
+        click.echo(
+            f"{count:>8} {cpu * 100:>11.1f} {cpu * 100 / count:>12.1f} {rss / 1e6:>8.1f} "
+            f"{rss / 1e6 / count:>12.1f} {streamed / 1e3 / seconds / count:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import math
+import os
+import struct
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from streaming import BYTES_PER_SAMPLE  # noqa: E402
+
+
+def tone_chunk(sample_rate, chunk_duration_ms, frequency=440.0, amplitude=0.3):
+    # One chunk of a sine tone as mono s16le PCM
+    samples = int(sample_rate * chunk_duration_ms / 1000)
+    peak = int(32767 * amplitude)
+    return struct.pack(
+        f"<{samples}h",
+        *(int(peak * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(samples))
+    )
+
+
+async def feed_realtime_pcm(reader, seconds, sample_rate=16000, chunk_duration_ms=100, chunk=None):
+    # Feed `seconds` of PCM into an asyncio.StreamReader at real-time rate, like ffmpeg reading
+    # from PulseAudio would. Chunks are scheduled on an absolute clock so they do not drift.
+    chunk = chunk or tone_chunk(sample_rate, chunk_duration_ms)
+    chunk_duration = len(chunk) / BYTES_PER_SAMPLE / sample_rate
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    for i in range(int(seconds / chunk_duration)):
+        delay = started_at + i * chunk_duration - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        reader.feed_data(chunk)
+    reader.feed_eof()
+
+
+def write_realtime_pcm(stream, seconds, sample_rate=16000, chunk_duration_ms=100):
+    # Blocking version of feed_realtime_pcm writing to a binary stream such as stdout
+    chunk = tone_chunk(sample_rate, chunk_duration_ms)
+    chunk_duration = chunk_duration_ms / 1000
+    started_at = time.monotonic()
+    for i in range(int(seconds / chunk_duration)):
+        delay = started_at + i * chunk_duration - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        stream.write(chunk)
+        stream.flush()
+
+
+class RecordingWebSocket:
+    # Stand-in websocket that records when each frame was sent and how big it was
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent_at = []
+        self.wire_bytes = 0
+
+    async def send(self, message):
+        self.sent_at.append(self.clock())
+        self.wire_bytes += len(message.encode("utf-8") if isinstance(message, str) else message)
+
+
+@click.command()
+@click.option("--seconds", default=60.0, help="Seconds of audio to produce")
+@click.option("--sample-rate", default=16000)
+@click.option("--chunk-ms", default=20, help="Size of each write, like a capture period")
+def main(seconds, sample_rate, chunk_ms):
+    # Synthetic stand-in for the ffmpeg PulseAudio capture: mono s16le PCM on stdout in real time
+    try:
+        write_realtime_pcm(sys.stdout.buffer, seconds, sample_rate, chunk_ms)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _stat_fields(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name is in parentheses and may itself contain spaces
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def all_pids():
+    return [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+
+
+def descendants(pid):
+    # Every process below pid in the process tree
+    children = {}
+    for other in all_pids():
+        try:
+            children.setdefault(int(_stat_fields(other)[1]), []).append(other)
+        except (OSError, IndexError):
+            continue
+    found, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def pids_named(name):
+    # Processes whose command name is exactly `name`
+    pids = []
+    for pid in all_pids():
+        try:
+            with open(f"/proc/{pid}/comm") as f:
+                if f.read().strip() == name:
+                    pids.append(pid)
+        except OSError:
+            continue
+    return pids
+
+
+def cpu_seconds(pid):
+    # User plus system CPU time consumed by pid so far
+    try:
+        fields = _stat_fields(pid)
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def pss_bytes(pid):
+    # Proportional set size: shared pages (e.g. between Chrome's processes) split among their users
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def total_cpu_seconds(pids):
+    return sum(cpu_seconds(pid) for pid in pids)
+
+
+def total_rss_bytes(pids):
+    return sum(rss_bytes(pid) for pid in pids)
+
+
+def total_pss_bytes(pids):
+    return sum(pss_bytes(pid) for pid in pids)
@@ -0,0 +1,60 @@
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from recording import AUDIO_CODECS, build_record_command  # noqa: E402
+
+# Synthetic stand-ins for the PulseAudio monitor and the Xvfb display
+SYNTHETIC_AUDIO_INPUT = "-f lavfi -i anoisesrc=color=pink:amplitude=0.1:sample_rate=48000"
+SYNTHETIC_VIDEO_INPUT = "-f lavfi -i testsrc2=size=1920x1080:rate={fps}"
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(mode, duration, output_dir, audio_codec="opus", video_fps=5):
+    # Record `duration` seconds of synthetic media, returning CPU seconds, wall seconds and file size
+    command, output_path, _ = build_record_command(
+        mode, duration, output_dir=output_dir, audio_codec=audio_codec, video_fps=video_fps,
+        audio_input=SYNTHETIC_AUDIO_INPUT, video_input=SYNTHETIC_VIDEO_INPUT
+    )
+    cpu_start = children_cpu_seconds()
+    wall_start = time.monotonic()
+    subprocess.run(shlex.split(command), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.monotonic() - wall_start
+    cpu = children_cpu_seconds() - cpu_start
+    return cpu, wall, os.path.getsize(output_path)
+
+
+@click.command()
+@click.option("--duration", default=60, help="Seconds of media to record in each mode")
+@click.option("--video-fps", default=5, help="Frame rate of the low fps video mode")
+@click.option("--uplink-mbps", default=20.0, help="Upload bandwidth used to estimate upload time")
+def main(duration, video_fps, uplink_mbps):
+    # Compare encode CPU, file size and upload time of every recording mode.
+    # Inputs are generated as fast as ffmpeg can encode them, so CPU is reported
+    # as a share of one core while recording in real time.
+    variants = [("audio", codec) for codec in AUDIO_CODECS] + [("video", None), ("full", None)]
+    click.echo(f"{duration}s of synthetic media per mode, upload estimated at {uplink_mbps:g} Mbit/s")
+    click.echo(f"{'mode':<12} {'cpu % core':>10} {'size MB':>10} {'MB/hour':>10} {'upload s':>10}")
+    with tempfile.TemporaryDirectory() as output_dir:
+        for mode, codec in variants:
+            cpu, _, size = run_mode(mode, duration, output_dir, audio_codec=codec or "opus", video_fps=video_fps)
+            label = f"{mode}/{codec}" if codec else mode
+            click.echo(
+                f"{label:<12} {cpu * 100 / duration:>10.1f} {size / 1e6:>10.2f} "
+                f"{size * 3600 / duration / 1e6:>10.1f} {size * 8 / (uplink_mbps * 1e6):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
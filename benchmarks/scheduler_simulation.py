@@ -0,0 +1,190 @@
+import asyncio
+import datetime
+import logging
+import os
+import random
+import selectors
+import sys
+import tempfile
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from end_to_end import percentiles  # noqa: E402
+from jobs import JobQueue  # noqa: E402
+from scheduler import Scheduler, WarmPool  # noqa: E402
+
+# Scheduled meeting lengths, in minutes, and how start times fall on the clock
+DURATIONS = (15, 30, 30, 45, 60, 60, 90)
+START_MINUTES = ((0, 0.6), (30, 0.3), (15, 0.05), (45, 0.05))
+WORKDAY_HOURS = (8, 18)
+
+# Simulated costs, in seconds. A one-shot container starts Chrome and PulseAudio and signs in
+# for every meeting; a scheduler node does that once, and only prepares a tab and a sink per job
+ONE_SHOT_PREPARE_SECONDS = 35.0
+SESSION_PREPARE_SECONDS = 2.0
+# Opening the meeting, turning media off and asking to join: lognormal around this median
+JOIN_MEDIAN_SECONDS = 8.0
+JOIN_SIGMA = 0.4
+# Meetings end somewhere in the last half of their slot, and the bot notices within this long
+MEETING_END_DETECTION_SECONDS = 30.0
+
+
+def synthetic_day(count, seed=0):
+    # (start_at, scheduled minutes, actual seconds) of a day of meetings, as Unix times of an arbitrary day
+    rng = random.Random(seed)
+    day = datetime.datetime(2026, 1, 5).timestamp()
+    minutes, weights = zip(*START_MINUTES)
+    jobs = []
+    for _ in range(count):
+        hour = rng.randrange(*WORKDAY_HOURS)
+        start_at = day + hour * 3600 + rng.choices(minutes, weights)[0] * 60
+        scheduled = rng.choice(DURATIONS)
+        jobs.append((start_at, scheduled, scheduled * 60 * rng.uniform(0.5, 1.0)))
+    return sorted(jobs)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    # Instead of waiting for the next timer, moves the loop's clock forward to it. Real waits
+    # only happen while a worker thread (the job queue's SQLite calls) is running, and
+    # simulated time stands still meanwhile.
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if self.loop.in_executor or timeout is None:
+            return super().select(None)
+        self.loop.now += timeout
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    # Event loop on simulated time: a day of scheduling runs in seconds, with exact timings
+    def __init__(self):
+        selector = VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.now = 0.0
+        self.in_executor = 0
+
+    def time(self):
+        return self.now
+
+    def run_in_executor(self, executor, func, *args):
+        self.in_executor += 1
+        future = super().run_in_executor(executor, func, *args)
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, future):
+        self.in_executor -= 1
+
+
+async def simulate(day, nodes, capacity, lead_seconds, pool_size, prepare_seconds, poll_seconds, queue_path, seed):
+    rng = random.Random(seed)
+    queue = JobQueue(queue_path)
+    actual_seconds = {}
+    for start_at, scheduled, actual in day:
+        actual_seconds[queue.add(f"https://meet.google.com/sim-{len(actual_seconds)}", start_at, scheduled)] = actual
+
+    # Unix time on the simulated clock, starting ten minutes before the first meeting
+    loop = asyncio.get_running_loop()
+    started_at = day[0][0] - 600 - loop.time()
+
+    def clock():
+        return started_at + loop.time()
+
+    held = []  # (session prepared from, released at)
+    in_call = []  # (in lobby at, left at)
+
+    async def prepare():
+        prepared_from = clock()
+        await asyncio.sleep(prepare_seconds)
+        return prepared_from
+
+    async def release(prepared_from):
+        held.append((prepared_from, clock()))
+
+    async def run_job(job, prepared_from, in_lobby):
+        try:
+            await asyncio.sleep(rng.lognormvariate(0, JOIN_SIGMA) * JOIN_MEDIAN_SECONDS)
+            await in_lobby()
+            lobby_at = clock()
+            scheduled_end = job["start_at"] + job["duration_minutes"] * 60
+            meeting_end = job["start_at"] + actual_seconds[job["id"]] + MEETING_END_DETECTION_SECONDS
+            await asyncio.sleep(max(0.0, min(meeting_end, scheduled_end) - lobby_at))
+            in_call.append((lobby_at, clock()))
+        finally:
+            await release(prepared_from)
+
+    until = max(start_at + scheduled * 60 for start_at, scheduled, _ in day)
+    schedulers = [
+        Scheduler(queue, WarmPool(prepare, release, pool_size), run_job, capacity, lead_seconds, poll_seconds,
+                  f"node-{i}", clock=clock)
+        for i in range(nodes)
+    ]
+    await asyncio.gather(*(scheduler.run(until) for scheduler in schedulers))
+    jobs = queue.jobs()
+    queue.close()
+    span = until - day[0][0]
+    return jobs, held, in_call, span, sum(s.pool.warm_takes for s in schedulers), sum(s.pool.cold_takes for s in schedulers)
+
+
+@click.command()
+@click.option("--jobs", "job_count", default=150, help="Meetings in the simulated day")
+@click.option("--nodes", default=4, help="Scheduler nodes sharing the queue")
+@click.option("--capacity", default=4, help="Meetings per node")
+@click.option("--lead-seconds", default=45.0, help="How early scheduled nodes start joining")
+@click.option("--warm-pool", default=1, help="Warm sessions per node in the warm configuration")
+@click.option("--poll-seconds", default=5.0, help="Scheduler poll interval, in simulated seconds")
+@click.option("--seed", default=0)
+def main(job_count, nodes, capacity, lead_seconds, warm_pool, poll_seconds, seed):
+    # Simulate a day of meeting jobs through the real scheduler and job queue, on simulated time,
+    # and report join punctuality (lobby time relative to the meeting start) and node utilization
+    # (time in calls, and time sessions are held including lobby waits and warm sessions) for:
+    #   one-shot:  each meeting starts a fresh bot at its start time, as with one docker run per meeting
+    #   scheduled: long-running nodes start joining lead_seconds early, preparing each session cold
+    #   warm:      the same, with sessions prepared ahead in a warm pool
+    logging.getLogger().setLevel(logging.ERROR)
+    day = synthetic_day(job_count, seed)
+    click.echo(
+        f"{job_count} meetings on {nodes} nodes x {capacity} slots, {lead_seconds:g}s lead, "
+        f"{poll_seconds:g}s polls"
+    )
+    click.echo(
+        f"{'mode':<10} {'lobby p50':>10} {'p95':>8} {'max':>8} {'on time':>8} {'>60s late':>10} {'missed':>7} "
+        f"{'in call':>8} {'held':>8} {'warm/cold':>10}"
+    )
+    for mode, lead, pool_size, prepare_seconds in (
+        ("one-shot", 0.0, 0, ONE_SHOT_PREPARE_SECONDS),
+        ("scheduled", lead_seconds, 0, SESSION_PREPARE_SECONDS),
+        ("warm", lead_seconds, warm_pool, SESSION_PREPARE_SECONDS),
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            loop = VirtualTimeLoop()
+            try:
+                jobs, held, in_call, span, warm, cold = loop.run_until_complete(simulate(
+                    day, nodes, capacity, lead, pool_size, prepare_seconds, poll_seconds,
+                    os.path.join(directory, "jobs.db"), seed
+                ))
+            finally:
+                loop.close()
+        lateness = [job["lobby_at"] - job["start_at"] for job in jobs if job["lobby_at"]]
+        # percentiles() takes seconds and reports milliseconds
+        p = {point: value / 1000 for point, value in percentiles(lateness).items()}
+        slot_seconds = nodes * capacity * span
+        click.echo(
+            f"{mode:<10} {p[50]:>+9.0f}s {p[95]:>+7.0f}s {max(lateness):>+7.0f}s "
+            f"{sum(l <= 0 for l in lateness) / len(jobs):>8.0%} {sum(l > 60 for l in lateness) / len(jobs):>10.0%} "
+            f"{sum(job['status'] == 'missed' for job in jobs):>7} "
+            f"{sum(end - start for start, end in in_call) / slot_seconds:>8.1%} "
+            f"{sum(end - start for start, end in held) / slot_seconds:>8.1%} {warm:>5}/{cold:<4}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import datetime
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from end_to_end import format_latencies  # noqa: E402
+from transcript_store import BATCH, TranscriptStore, fts_query  # noqa: E402
+
+# Synthetic meeting language: a Zipf-distributed vocabulary, so searches range from words in
+# nearly every meeting to words said a handful of times in the whole store
+VOCABULARY_SIZE = 20000
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "pa", "bri", "tor", "an", "el", "us", "ix")
+UTTERANCE_WORDS = (4, 30)
+SPEAKERS = 4
+CHAPTERS = 4
+MEETING_SECONDS = 45 * 60
+
+
+def vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def synthetic_meeting(rng, words, cum_weights, utterance_count):
+    def text(length):
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=length))
+
+    utterances = []
+    for index in range(utterance_count):
+        start = index * MEETING_SECONDS / utterance_count
+        utterances.append((start, start + 5.0, str(rng.randrange(SPEAKERS)), "en", 0.9, text(rng.randint(*UTTERANCE_WORDS))))
+    notes = [("summary", None, None, None, text(80))]
+    for index in range(CHAPTERS):
+        notes.append((
+            "chapter", index * MEETING_SECONDS / CHAPTERS, (index + 1) * MEETING_SECONDS / CHAPTERS, text(4), text(40)
+        ))
+    return utterances, notes
+
+
+@click.command()
+@click.option("--meetings", default=10000, help="Meetings in the store")
+@click.option("--utterances", default=200, help="Utterances per meeting")
+@click.option("--queries", default=50, help="Searches of each kind")
+@click.option("--db", default=None, help="Store file to build, or reuse if it exists (default: a temporary file)")
+@click.option("--seed", default=0)
+@click.option("--max-p95-ms", default=1000.0, help="Exit non-zero if a kind of search has a slower p95")
+def main(meetings, utterances, queries, db, seed, max_p95_ms):
+    # Build a transcript store of synthetic meetings spread over a year, report the ingestion
+    # rate, then time searches of rare, common and mixed words and phrases, with and without
+    # date and speaker filters, over utterances and over summaries and chapters
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    directory = None
+    if db is None:
+        directory = tempfile.TemporaryDirectory()
+        db = os.path.join(directory.name, "transcripts.db")
+    reuse = os.path.exists(db)
+    store = TranscriptStore(db)
+
+    year_start = datetime.datetime(2026, 1, 1).timestamp()
+    if not reuse:
+        started_at = time.perf_counter()
+        for index in range(meetings):
+            meeting_id = store.add_meeting(BATCH, year_start + index * 365 * 86400 / meetings)
+            meeting_utterances, notes = synthetic_meeting(rng, words, cum_weights, utterances)
+            store.write(meeting_id, meeting_utterances, notes)
+            if (index + 1) % 1000 == 0:
+                click.echo(f"  {index + 1} meetings stored", err=True)
+        store.optimize()
+        elapsed = time.perf_counter() - started_at
+        click.echo(
+            f"Stored {meetings} meetings, {meetings * utterances} utterances in {elapsed:.1f}s "
+            f"({meetings * utterances / elapsed:,.0f} utterances/s), {os.path.getsize(db) / 1e6:.0f} MB"
+        )
+
+    # Words by frequency rank: the head is in almost every meeting, the tail in a few
+    common, mid, rare = words[:50], words[500:2000], words[-5000:]
+    last_month = year_start + 335 * 86400
+
+    def phrase():
+        # Two consecutive words of a stored utterance
+        meeting_id = rng.randint(1, meetings)
+        text = store.transcript(meeting_id)[1][rng.randrange(utterances)]["text"].split()
+        index = rng.randrange(len(text) - 1)
+        return f'"{text[index]} {text[index + 1]}"'
+
+    searches = (
+        ("rare word", lambda: (fts_query(rng.choice(rare)), {})),
+        ("mid word", lambda: (fts_query(rng.choice(mid)), {})),
+        ("common word", lambda: (fts_query(rng.choice(common)), {})),
+        ("common, recent first", lambda: (fts_query(rng.choice(common)), {"order": "recent"})),
+        ("two mid words", lambda: (fts_query(f"{rng.choice(mid)} {rng.choice(mid)}"), {})),
+        ("phrase", lambda: (phrase(), {})),
+        ("mid word, last month", lambda: (fts_query(rng.choice(mid)), {"since": last_month})),
+        ("mid word, speaker", lambda: (fts_query(rng.choice(mid)), {"speaker": "1"})),
+        ("prefix", lambda: (rng.choice(mid)[:4] + "*", {})),
+        ("notes, mid word", lambda: (fts_query(rng.choice(mid)), {"notes": True})),
+    )
+    failed = False
+    for name, make_query in searches:
+        latencies = []
+        found = 0
+        for _ in range(queries):
+            query, options = make_query()
+            started_at = time.perf_counter()
+            found += len(store.search(query, **options))
+            latencies.append(time.perf_counter() - started_at)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)] * 1000
+        failed |= p95 > max_p95_ms
+        click.echo(f"{format_latencies(name, latencies)}  max {latencies[-1] * 1000:7.1f}ms  {found / queries:5.1f} results")
+
+    store.close()
+    if directory is not None:
+        directory.cleanup()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+import asyncio
+import contextlib
+import fcntl
+import functools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+# How often waits re-check their condition, and how long one wait may hold the worker thread
+WAIT_POLL_SECONDS = 0.1
+WAIT_SLICE_SECONDS = 1.0
+
+# Cookie fields accepted back by the DevTools Network.setCookies command
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+# Lean browser mode: the bots only need the meeting audio, so Chrome runs in a small window,
+# does not receive, decode or draw remote video (see LEAN_PAGE_SCRIPT) and leaves out
+# subsystems a bot never uses
+LEAN_BROWSER = str(os.getenv("LEAN_BROWSER", "")).lower() in ["true", "t", "1", "yes", "y"]
+WINDOW_SIZE = (1920, 1080)
+LEAN_WINDOW_SIZE = tuple(int(n) for n in os.getenv("LEAN_WINDOW_SIZE", "960x540").split("x"))
+
+CHROME_ARGUMENTS = [
+    "--use-fake-ui-for-media-stream",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-application-cache",
+    "--disable-dev-shm-usage"
+]
+LEAN_CHROME_ARGUMENTS = [
+    # Background services: updates, sync, crash and metrics reporting, phishing lists, translation
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,BackForwardCache",
+    # Rendering: no software WebGL or smooth scrolling, smaller caches and pools. Images are
+    # blocked per tab once in the meeting (see LEAN_BLOCKED_URLS), as sign-in pages need them.
+    "--disable-software-rasterizer",
+    "--disable-smooth-scrolling",
+    "--enable-low-end-device-mode",
+    # Meeting audio must play without a user gesture on the page
+    "--autoplay-policy=no-user-gesture-required"
+]
+
+# Images a tab in a meeting stops loading in lean mode: participant avatars and pictures
+LEAN_BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*googleusercontent.com/*"]
+
+
+def window_size(lean=LEAN_BROWSER):
+    return LEAN_WINDOW_SIZE if lean else WINDOW_SIZE
+
+
+def chrome_arguments(lean=LEAN_BROWSER):
+    # Command line of the bots' Chrome
+    width, height = window_size(lean)
+    return [*CHROME_ARGUMENTS, f"--window-size={width},{height}", *(LEAN_CHROME_ARGUMENTS if lean else [])]
+
+
+class BrowserWorker:
+    # Async facade over a WebDriver that runs every WebDriver call on one dedicated thread.
+    #
+    # Each WebDriver command is a blocking HTTP round trip to chromedriver, so calling it
+    # from a coroutine freezes the event loop until Chrome answers. Here the calls are
+    # queued to a single worker thread (WebDriver is not thread safe) and awaited, which
+    # keeps audio streaming and websocket traffic running while the browser is busy.
+    # Long waits are split into short slices so several tabs (see BrowserTab) can share
+    # the worker without one lobby wait holding it for minutes.
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="webdriver")
+        self._current_handle = None
+        self.driver = None
+
+    async def run(self, fn, *args, **kwargs):
+        # Run fn(*args, **kwargs) on the WebDriver thread and wait for its result
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def start(self, driver_factory):
+        # Create the driver on the worker thread, e.g. start(lambda: uc.Chrome(...))
+        self.driver = await self.run(driver_factory)
+        return self.driver
+
+    async def quit(self):
+        # Close the browser and stop the worker thread
+        if self.driver is not None:
+            try:
+                await self.run(self.driver.quit)
+            except Exception as e:
+                logger.warning(f"Failed to quit browser: {str(e)}")
+            self.driver = None
+        self._executor.shutdown(wait=False)
+
+    async def get(self, url):
+        await self.run(self.driver.get, url)
+
+    async def current_url(self):
+        return await self.run(lambda: self.driver.current_url)
+
+    async def get_cookies(self):
+        # Every cookie in the browser, for all domains
+        result = await self.execute_cdp_cmd("Network.getAllCookies", {})
+        return result.get("cookies", [])
+
+    async def set_cookies(self, cookies):
+        # Restore cookies saved with get_cookies, without visiting their domains first
+        await self.execute_cdp_cmd("Network.setCookies", {"cookies": [
+            {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+            for cookie in cookies
+        ]})
+
+    async def find_element(self, by, value):
+        return await self.run(self.driver.find_element, by, value)
+
+    async def wait_for(self, condition, timeout):
+        # Wait until condition(driver) is truthy and return its value.
+        # Raises selenium's TimeoutException if it is still false after `timeout` seconds.
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(0.0, min(WAIT_SLICE_SECONDS, deadline - time.monotonic()))
+            try:
+                return await self.run(
+                    lambda: WebDriverWait(self.driver, remaining, poll_frequency=WAIT_POLL_SECONDS).until(condition)
+                )
+            except TimeoutException:
+                if time.monotonic() >= deadline:
+                    raise
+
+    async def click(self, by, value, timeout=0):
+        # Find an element and click it, waiting up to `timeout` seconds for it to become clickable
+        if not timeout:
+            await self.run(lambda: self.driver.find_element(by, value).click())
+            return
+
+        def click_when_clickable(driver):
+            element = EC.element_to_be_clickable((by, value))(driver)
+            if element:
+                element.click()
+            return element
+        await self.wait_for(click_when_clickable, timeout)
+
+    async def send_keys(self, by, value, keys, click=False, timeout=0):
+        # Find an element, optionally click it, then type into it
+        if timeout:
+            element = await self.wait_for(EC.element_to_be_clickable((by, value)), timeout)
+        else:
+            element = await self.find_element(by, value)
+
+        def _send_keys():
+            if click:
+                element.click()
+            element.send_keys(keys)
+        await self.run(_send_keys)
+
+    async def save_screenshot(self, path):
+        return await self.run(self.driver.save_screenshot, path)
+
+    async def set_window_size(self, width, height):
+        await self.run(self.driver.set_window_size, width, height)
+
+    async def execute_cdp_cmd(self, cmd, params):
+        return await self.run(self.driver.execute_cdp_cmd, cmd, params)
+
+    async def execute_script(self, script, *args):
+        return await self.run(self.driver.execute_script, script, *args)
+
+    async def route_audio_to(self, sink_label):
+        # Send every sound played by pages loaded from now on to the audio output
+        # whose label contains sink_label, instead of the default output
+        await self.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument",
+            {"source": ROUTE_AUDIO_SCRIPT.replace("__SINK_LABEL__", json.dumps(sink_label))}
+        )
+
+    async def use_lean_pages(self):
+        # Pages loaded from now on receive no remote video and draw no animations (lean mode)
+        await self.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": LEAN_PAGE_SCRIPT})
+
+    async def block_images(self):
+        # This tab loads no more images (lean mode); only once in the meeting, since Google
+        # sign-in and its challenges ("verify it's you", captchas) show images that must load
+        await self.execute_cdp_cmd("Network.enable", {})
+        await self.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+
+    def switch_to(self, handle):
+        # Runs on the worker thread: make `handle` the current tab if it is not already
+        if self._current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self._current_handle = handle
+
+    async def open_tab(self):
+        # Open a new tab in this browser and return a BrowserTab driving it
+        def _open_tab():
+            self.driver.switch_to.new_window("tab")
+            self._current_handle = self.driver.current_window_handle
+            return self._current_handle
+        return BrowserTab(self, await self.run(_open_tab))
+
+
+class BrowserTab(BrowserWorker):
+    # One tab of a browser shared by several meetings.
+    # Calls run on the owning worker's thread and switch to this tab first, so each
+    # meeting's task can drive its own tab as if it had the browser to itself.
+
+    def __init__(self, worker, handle):
+        self.worker = worker
+        self.handle = handle
+
+    @property
+    def driver(self):
+        return self.worker.driver
+
+    async def run(self, fn, *args, **kwargs):
+        def in_tab():
+            self.worker.switch_to(self.handle)
+            return fn(*args, **kwargs)
+        return await self.worker.run(in_tab)
+
+    async def start(self, driver_factory):
+        raise RuntimeError("Tabs are opened with BrowserWorker.open_tab()")
+
+    async def open_tab(self):
+        return await self.worker.open_tab()
+
+    async def quit(self):
+        # Close this tab only; the browser keeps running for the other meetings
+        def _close():
+            self.worker.switch_to(self.handle)
+            self.driver.close()
+            self.worker._current_handle = None
+        try:
+            await self.worker.run(_close)
+        except Exception as e:
+            logger.warning(f"Failed to close tab: {str(e)}")
+
+
+# Injected before a page loads to route its audio to one output device by label.
+# Media elements are routed when they start playing (and re-checked periodically, since
+# Meet creates them on the fly); Web Audio contexts are routed when they are created.
+ROUTE_AUDIO_SCRIPT = """
+(() => {
+  const sinkLabel = __SINK_LABEL__;
+  let sinkId = null;
+  async function findSink() {
+    if (sinkId === null) {
+      const devices = await navigator.mediaDevices.enumerateDevices();
+      const sink = devices.find(d => d.kind === "audiooutput" && d.label.includes(sinkLabel));
+      if (sink) sinkId = sink.deviceId;
+    }
+    return sinkId;
+  }
+  async function route(target) {
+    const id = await findSink();
+    if (id !== null && target.sinkId !== id) {
+      try { await target.setSinkId(id); } catch (e) {}
+    }
+  }
+  const play = HTMLMediaElement.prototype.play;
+  HTMLMediaElement.prototype.play = function () {
+    route(this);
+    return play.apply(this, arguments);
+  };
+  const NativeAudioContext = window.AudioContext;
+  if (NativeAudioContext && "setSinkId" in NativeAudioContext.prototype) {
+    window.AudioContext = class extends NativeAudioContext {
+      constructor(...args) {
+        super(...args);
+        route(this);
+      }
+    };
+  }
+  setInterval(() => document.querySelectorAll("audio, video").forEach(route), 2000);
+})();
+"""
+
+# Injected before a page loads in lean mode. Remote descriptions are rewritten so every video
+# section is inactive: the other side (Meet's media server) sends no video, so none is received
+# or decoded, while audio sections are untouched. Should a rewritten description be refused,
+# the original one is applied instead. Video elements are hidden and animations stopped, so
+# what is left of the page is drawn rarely.
+LEAN_PAGE_SCRIPT = """
+(() => {
+  const withoutVideo = sdp => sdp.split(/(?=\\r\\nm=)/).map(section =>
+    section.startsWith("\\r\\nm=video") ? section.replace(/\\r\\na=(sendrecv|sendonly|recvonly)/g, "\\r\\na=inactive") : section
+  ).join("");
+  const setRemoteDescription = RTCPeerConnection.prototype.setRemoteDescription;
+  RTCPeerConnection.prototype.setRemoteDescription = function (description, ...rest) {
+    if (!description || !description.sdp) {
+      return setRemoteDescription.call(this, description, ...rest);
+    }
+    const lean = {type: description.type, sdp: withoutVideo(description.sdp)};
+    return setRemoteDescription.call(this, lean, ...rest)
+      .catch(() => setRemoteDescription.call(this, description, ...rest));
+  };
+  const style = document.createElement("style");
+  style.textContent = `
+    video { visibility: hidden !important; }
+    *, *::before, *::after { animation: none !important; transition: none !important; }
+  `;
+  const addStyle = () => (document.head || document.documentElement).appendChild(style);
+  if (document.documentElement) {
+    addStyle();
+  } else {
+    document.addEventListener("DOMContentLoaded", addStyle);
+  }
+})();
+"""
+
+
+class CookieJar:
+    # Google session cookies saved on disk and shared by every bot using the same account.
+    #
+    # Access goes through an flock on a sibling .lock file: readers take it shared, and a
+    # bot that has to sign in takes it exclusive, so only one bot signs in at a time while
+    # the others wait and then pick up the session it saved.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    @contextlib.asynccontextmanager
+    async def locked(self, exclusive=False):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield self
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def load(self):
+        # Saved cookies, or an empty list if there is no usable snapshot; call with the lock held
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def save(self, cookies):
+        # Atomically replace the snapshot; call with the exclusive lock held
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cookies, f)
+        os.replace(tmp_path, self.path)
+
+
+def on_google_account_page(url):
+    # Whether a URL is Google's account page, where only a signed-in visitor stays. Signed-out
+    # visitors are redirected to the accounts.google.com sign-in page, whose query still names
+    # the account page (?continue=https://myaccount.google.com...), hence the host comparison.
+    return urlparse(url).hostname == "myaccount.google.com"
+
+
+def signed_in_to_google(driver):
+    # Wait condition: the sign-in flow landed on the account page
+    return on_google_account_page(driver.current_url)
+
+
+async def google_session_valid(browser):
+    # Whether the browser (any of its tabs, they share cookies) is signed in to Google
+    await browser.get("https://myaccount.google.com")
+    return on_google_account_page(await browser.current_url())
+
+
+async def restore_google_session(browser, cookies):
+    # Load saved cookies into the browser and check they still hold a signed-in Google session
+    if not cookies:
+        return False
+    await browser.set_cookies(cookies)
+    return await google_session_valid(browser)
+
+
+# Run on Meet's pre-join screen: click "Turn off" on the microphone and camera controls showing
+# it, and report each device as "turned off", "already off" (its control offers to turn it on)
+# or "missing" (no control on the page yet)
+MEDIA_CONTROLS_SCRIPT = """
+const states = {};
+for (const device of ["microphone", "camera"]) {
+  const off = document.querySelector(`div[aria-label="Turn off ${device}"]`);
+  if (off) {
+    off.click();
+    states[device] = "turned off";
+  } else {
+    states[device] = document.querySelector(`div[aria-label="Turn on ${device}"]`) ? "already off" : "missing";
+  }
+}
+return states;
+"""
+MEDIA_CONTROLS_POLL_SECONDS = 0.25
+
+
+async def turn_off_media_controls(browser, timeout):
+    # Turn off the microphone and camera, checking both controls in one script run so that
+    # controls already off cost no wait. Controls not on the page yet are looked for again
+    # for up to `timeout` seconds. Returns {"microphone": state, "camera": state}.
+    deadline = time.monotonic() + timeout
+    states = {}
+    while True:
+        for device, state in (await browser.execute_script(MEDIA_CONTROLS_SCRIPT)).items():
+            if states.get(device) != "turned off":
+                states[device] = state
+        if "missing" not in states.values() or time.monotonic() >= deadline:
+            return states
+        await asyncio.sleep(MEDIA_CONTROLS_POLL_SECONDS)
+
+
+class PhaseTimer:
+    # Records how long each named phase of a flow takes, e.g. the steps of joining a meeting
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.monotonic() - started_at
+
+    def report(self):
+        # One line summary such as "sign_in 3.10s, page_load 1.25s (total 4.35s)"
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        return f"{steps} (total {sum(self.phases.values()):.2f}s)"
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+# Partial and final transcripts are pushed to local subscribers when CAPTIONS_PORT is set
+CAPTIONS_HOST = os.getenv("CAPTIONS_HOST", "127.0.0.1")
+CAPTIONS_PORT = int(os.getenv("CAPTIONS_PORT", 0))
+# Captions waiting to be sent to one subscriber; a subscriber that falls this far behind on finals is dropped
+CAPTIONS_QUEUE_SIZE = int(os.getenv("CAPTIONS_QUEUE_SIZE", 32))
+
+WEBSOCKET_PATH = "/captions"
+SSE_PATH = "/captions/events"
+
+PARTIAL = "partial"
+FINAL = "final"
+
+
+class Subscriber:
+    # One connected client and the captions waiting to be sent to it.
+    #
+    # offer() never waits: a partial or final replaces any partial of the same utterance still
+    # queued, since only the latest is worth showing, and when the queue is full the oldest partial is
+    # dropped to make room. A subscriber whose queue is full of finals is too slow to keep up
+    # and is disconnected. Each subscriber is written to by its own task, so a slow client
+    # only ever delays itself.
+
+    def __init__(self, session=None, max_queue=CAPTIONS_QUEUE_SIZE):
+        self.session = session
+        self.max_queue = max_queue
+        self.queue = deque()  # (kind, utterance key, encoded caption)
+        self.ready = asyncio.Event()
+        self.dropped_partials = 0
+        self.overflowed = False
+        self.closed = False
+
+    def close(self):
+        # The client went away: wake the writer so it stops
+        self.closed = True
+        self.ready.set()
+
+    def offer(self, kind, key, encoded):
+        for i, (queued_kind, queued_key, _) in enumerate(self.queue):
+            if queued_kind == PARTIAL and queued_key == key:
+                self.dropped_partials += 1
+                if kind == PARTIAL:
+                    self.queue[i] = (kind, key, encoded)
+                    return
+                # The final supersedes it
+                del self.queue[i]
+                break
+        if len(self.queue) >= self.max_queue:
+            for i, (queued_kind, _, _) in enumerate(self.queue):
+                if queued_kind == PARTIAL:
+                    del self.queue[i]
+                    self.dropped_partials += 1
+                    break
+            else:
+                if kind == PARTIAL:
+                    self.dropped_partials += 1
+                    return
+                self.overflowed = True
+                self.ready.set()
+                return
+        self.queue.append((kind, key, encoded))
+        self.ready.set()
+
+    async def next_batch(self):
+        # Wait for captions and take all that are queued; empty once the subscriber overflowed or closed
+        await self.ready.wait()
+        self.ready.clear()
+        if self.overflowed or self.closed:
+            return []
+        batch = [encoded for _, _, encoded in self.queue]
+        self.queue.clear()
+        return batch
+
+
+class CaptionHub:
+    # Live captions of every session in this process, fanned out to subscribers
+    def __init__(self):
+        self.subscribers = set()
+        self.published = 0
+
+    def publish(self, session, kind, utterance_id, caption):
+        # Queue a caption for every subscriber of the session; called from the receive loop, never waits
+        subscribers = [s for s in self.subscribers if s.session is None or s.session == session]
+        if not subscribers:
+            return
+        self.published += 1
+        encoded = json.dumps({"session": session, "type": kind, "id": utterance_id, **caption}, ensure_ascii=False)
+        for subscriber in subscribers:
+            subscriber.offer(kind, (session, utterance_id), encoded)
+
+    def subscribe(self, session=None):
+        subscriber = Subscriber(session)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if subscriber.dropped_partials or subscriber.overflowed:
+            logger.info(
+                f"Caption subscriber left: {subscriber.dropped_partials} stale partials dropped"
+                f"{', disconnected for falling behind' if subscriber.overflowed else ''}"
+            )
+
+
+hub = CaptionHub()
+
+
+class SessionCaptions:
+    # Publishes one live session's transcripts to the hub
+    def __init__(self, hub, session):
+        self.hub = hub
+        self.session = session
+
+    def transcript(self, utterance_id, is_final, start, end, text, language=None):
+        self.hub.publish(self.session, FINAL if is_final else PARTIAL, utterance_id, {
+            "start": start, "end": end, "text": text, "language": language
+        })
+
+
+def session_captions(name):
+    # Caption publisher for a live session, or None when captions are not served
+    return SessionCaptions(hub, name) if CAPTIONS_PORT else None
+
+
+class CaptionServer:
+    # Local fan-out of live captions, as a WebSocket and as Server-Sent Events.
+    # Each message is a JSON object: session, type (partial or final), id, start, end, text, language.
+    # ?session=<name> subscribes to one session only.
+
+    def __init__(self, hub, host=CAPTIONS_HOST, port=CAPTIONS_PORT):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(WEBSOCKET_PATH, self._handle_websocket)
+        app.router.add_get(SSE_PATH, self._handle_sse)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving captions on ws://{self.host}:{self.port}{WEBSOCKET_PATH} and http://{self.host}:{self.port}{SSE_PATH}")
+
+    async def stop(self):
+        if self._runner is not None:
+            # Let the subscribers' handlers return, or cleanup waits for them
+            for subscriber in list(self.hub.subscribers):
+                subscriber.close()
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        subscriber = self.hub.subscribe(request.query.get("session"))
+        # Nothing is expected from the client, but reading notices it going away
+        reader = asyncio.create_task(self._wait_for_close(ws, subscriber))
+        try:
+            while not ws.closed:
+                batch = await subscriber.next_batch()
+                if not batch:
+                    break
+                for encoded in batch:
+                    await ws.send_str(encoded)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.hub.unsubscribe(subscriber)
+            reader.cancel()
+            await ws.close()
+        return ws
+
+    async def _wait_for_close(self, ws, subscriber):
+        async for msg in ws:
+            if msg.type in (WSMsgType.CLOSE, WSMsgType.ERROR):
+                break
+        subscriber.close()
+
+    async def _handle_sse(self, request):
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
+        })
+        await response.prepare(request)
+        subscriber = self.hub.subscribe(request.query.get("session"))
+        try:
+            while True:
+                batch = await subscriber.next_batch()
+                if not batch:
+                    break
+                await response.write("".join(f"data: {encoded}\n\n" for encoded in batch).encode("utf-8"))
+        except ConnectionResetError:
+            pass
+        finally:
+            self.hub.unsubscribe(subscriber)
+        return response
+
+
+async def start_caption_server():
+    # Start serving captions when CAPTIONS_PORT is set; returns the server to stop, or None
+    if not CAPTIONS_PORT:
+        return None
+    server = CaptionServer(hub)
+    await server.start()
+    return server
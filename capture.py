@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from supervisor import STALL_SECONDS, FfmpegSupervisor
+
+logger = logging.getLogger(__name__)
+
+# Ways the live bot can read the meeting audio:
+#   ffmpeg:    an ffmpeg subprocess resamples the PulseAudio source and pipes PCM to the bot
+#   portaudio: the bot reads the source itself through PortAudio, PulseAudio does the resampling
+CAPTURE_BACKENDS = ("ffmpeg", "portaudio")
+
+# PortAudio device that reaches PulseAudio (ALSA's pulse plugin); the source is picked with PULSE_SOURCE
+PORTAUDIO_DEVICE = os.getenv("PORTAUDIO_DEVICE", "pulse")
+# How much audio PortAudio hands over per callback, and how much the ring buffer holds
+PORTAUDIO_BLOCK_MS = 20
+PORTAUDIO_BUFFER_SECONDS = 10
+
+# PULSE_SOURCE is process-wide, so streams are opened one at a time, each with its own source set
+_PORTAUDIO_OPEN_LOCK = threading.Lock()
+
+
+def check_capture_backend(backend, sessions):
+    # The portaudio backend picks its source through the process-wide PULSE_SOURCE, so it
+    # cannot be trusted to capture the right meeting when several run in one process
+    if backend == "portaudio" and sessions > 1:
+        raise ValueError(
+            f"The portaudio capture backend captures one meeting per process, not {sessions}: "
+            "use CAPTURE_BACKEND=ffmpeg with GMEET_LINKS or the scheduler"
+        )
+
+
+class FfmpegCapture:
+    # Capture through a supervised ffmpeg subprocess writing mono s16le PCM to a pipe.
+    # command_for(attempt) builds the ffmpeg command; see FfmpegSupervisor for restarts.
+
+    def __init__(self, command_for, name, bytes_per_second, frame_bytes, on_start=None, on_restart=None):
+        self.supervisor = FfmpegSupervisor(
+            command_for, name=name, stdout=True, restart=True, bytes_per_second=bytes_per_second,
+            frame_bytes=frame_bytes, on_start=on_start, on_restart=on_restart
+        )
+        self._task = None
+
+    async def start(self):
+        # Start capturing; returns the stream to read PCM from
+        self._task = asyncio.create_task(self.supervisor.run())
+        return self.supervisor.output
+
+    async def stop(self):
+        await self.supervisor.stop()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self):
+        return self.supervisor.health.summary()
+
+
+class PortAudioCapture:
+    # Capture in-process through PortAudio, with no subprocess and no pipe.
+    #
+    # The stream is opened at the target rate as mono int16, so PulseAudio does the
+    # resampling. The audio callback copies each block straight into a ring buffer
+    # allocated once up front, and readexactly() slices chunks out of it on the event
+    # loop, the same interface the streamer uses on ffmpeg's pipe. If no audio arrives
+    # for `stall_seconds` the stream is reopened and the gap filled with silence.
+
+    def __init__(self, source, sample_rate, device=PORTAUDIO_DEVICE, block_ms=PORTAUDIO_BLOCK_MS,
+                 buffer_seconds=PORTAUDIO_BUFFER_SECONDS, stall_seconds=STALL_SECONDS, on_restart=None):
+        self.source = source
+        self.sample_rate = sample_rate
+        self.device = device
+        self.block_frames = sample_rate * block_ms // 1000
+        self.bytes_per_second = sample_rate * 2
+        self.stall_seconds = stall_seconds
+        self.on_restart = on_restart
+        self.ring = bytearray(buffer_seconds * self.bytes_per_second)
+        self.view = memoryview(self.ring)
+        # Total bytes written by the callback and read by the loop; positions in the ring are modulo its size
+        self.written = 0
+        self.read = 0
+        self.overruns = 0
+        self.restarts = 0
+        self.last_data_at = None
+        self._stream = None
+        self._loop = None
+        self._data_ready = asyncio.Event()
+        self._closed = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self._open)
+        return self
+
+    def _open(self):
+        # Imported here so the ffmpeg backend does not need PortAudio installed
+        import sounddevice
+
+        # The pulse plugin connects as a new PulseAudio client and records from PULSE_SOURCE,
+        # read once the stream is started; the lock keeps another open from changing it meanwhile
+        with _PORTAUDIO_OPEN_LOCK:
+            previous_source = os.environ.get("PULSE_SOURCE")
+            os.environ["PULSE_SOURCE"] = self.source
+            try:
+                self._stream = sounddevice.RawInputStream(
+                    samplerate=self.sample_rate, blocksize=self.block_frames, device=self.device,
+                    channels=1, dtype="int16", callback=self._callback
+                )
+                self._stream.start()
+            finally:
+                if previous_source is None:
+                    del os.environ["PULSE_SOURCE"]
+                else:
+                    os.environ["PULSE_SOURCE"] = previous_source
+        self.last_data_at = time.monotonic()
+        logger.info(f"PortAudio capture of {self.source} started ({self.device}, {self._stream.latency * 1000:.0f}ms latency)")
+
+    def _callback(self, indata, frames, time_info, status):
+        # Runs on PortAudio's thread: copy the block into the ring, then wake the reader
+        if status.input_overflow:
+            self.overruns += 1
+        self._write(memoryview(indata).cast("B"))
+        self._loop.call_soon_threadsafe(self._data_ready.set)
+
+    def _write(self, data):
+        size = len(self.ring)
+        start = self.written % size
+        first = min(len(data), size - start)
+        self.view[start:start + first] = data[:first]
+        if first < len(data):
+            self.view[:len(data) - first] = data[first:]
+        self.written += len(data)
+        self.last_data_at = time.monotonic()
+
+    async def readexactly(self, n):
+        while True:
+            self._data_ready.clear()
+            available = self.written - self.read
+            if available > len(self.ring) - n:
+                # The reader fell a whole ring behind: skip ahead to the most recent half
+                self.overruns += 1
+                self.read = self.written - len(self.ring) // 2
+                logger.warning(f"PortAudio capture of {self.source} overran, dropping audio")
+                continue
+            if available >= n:
+                break
+            if self._closed:
+                raise asyncio.IncompleteReadError(b"", n)
+            try:
+                await asyncio.wait_for(self._data_ready.wait(), self.stall_seconds)
+            except asyncio.TimeoutError:
+                if not self._closed:
+                    await self._restart()
+
+        size = len(self.ring)
+        start = self.read % size
+        if start + n <= size:
+            chunk = bytes(self.view[start:start + n])
+        else:
+            chunk = bytes(self.view[start:]) + bytes(self.view[:start + n - size])
+        self.read += n
+        return chunk
+
+    async def _restart(self):
+        # No audio for stall_seconds: reopen the stream, filling the gap with silence
+        gap = time.monotonic() - self.last_data_at
+        logger.error(f"PortAudio capture of {self.source} produced no audio for {gap:.1f}s, reopening it")
+        self.restarts += 1
+        if self.on_restart:
+            self.on_restart()
+        await asyncio.to_thread(self._close_stream)
+        # Written while no callback can run, so the ring has a single writer
+        self._write(bytes(min(int(gap * self.sample_rate) * 2, len(self.ring) // 2)))
+        try:
+            await asyncio.to_thread(self._open)
+        except Exception as e:
+            logger.error(f"Failed to reopen PortAudio capture: {str(e)}")
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.abort()
+                self._stream.close()
+            except Exception as e:
+                logger.warning(f"Failed to close PortAudio stream: {str(e)}")
+            self._stream = None
+
+    async def stop(self):
+        self._closed = True
+        self._data_ready.set()
+        await asyncio.to_thread(self._close_stream)
+
+    def summary(self):
+        return f"{self.written / 1e6:.1f} MB captured, {self.overruns} overruns, {self.restarts} restarts"
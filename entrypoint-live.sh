@@ -1,5 +1,10 @@
 #!/bin/bash
 
-Xvfb :99 -screen 0 1920x1080x24 &
+# Lean browser mode runs Chrome in a small window, so the virtual display can be as small
+SCREEN=1920x1080x24
+if [[ "${LEAN_BROWSER,,}" =~ ^(true|t|1|yes|y)$ ]]; then
+    SCREEN="${LEAN_WINDOW_SIZE:-960x540}x24"
+fi
+Xvfb :99 -screen 0 $SCREEN &
 export DISPLAY=:99
-python3 gmeet-live.py
\ No newline at end of file
+python3 gmeet-live.py
@@ -1,5 +1,12 @@
 #!/bin/bash
 
-Xvfb :99 -screen 0 1920x1080x24 &
+# Lean browser mode runs Chrome in a small window, so the virtual display can be as small,
+# unless the recording mode records the screen at 1080p
+SCREEN=1920x1080x24
+RECORDING_MODE="${RECORDING_MODE:-audio}"
+if [[ "${LEAN_BROWSER,,}" =~ ^(true|t|1|yes|y)$ && "${RECORDING_MODE,,}" == "audio" ]]; then
+    SCREEN="${LEAN_WINDOW_SIZE:-960x540}x24"
+fi
+Xvfb :99 -screen 0 $SCREEN &
 export DISPLAY=:99
-python3 gmeet-prerecorded.py
\ No newline at end of file
+python3 gmeet-prerecorded.py
@@ -0,0 +1,406 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import secrets
+import time
+import uuid
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Overridable to point the bots at another deployment, e.g. the fake server in benchmarks/
+GLADIA_API_URL = os.getenv("GLADIA_API_URL", "https://api.gladia.io/v2").rstrip("/")
+
+# Every Gladia call shares one keep-alive connection pool
+HTTP_POOL_SIZE = int(os.getenv("GLADIA_HTTP_POOL_SIZE", 8))
+HTTP_KEEPALIVE_SECONDS = 60
+
+# Polling starts fast and backs off to this ceiling while the job is queued or processing
+POLL_INITIAL_INTERVAL = 1.0
+POLL_MAX_INTERVAL = float(os.getenv("GLADIA_POLL_MAX_INTERVAL", 30))
+POLL_BACKOFF_FACTOR = 1.5
+
+# Public URL Gladia should call when a job finishes; polling is used when it is not set
+CALLBACK_URL = os.getenv("GLADIA_CALLBACK_URL", "")
+CALLBACK_HOST = os.getenv("GLADIA_CALLBACK_HOST", "0.0.0.0")
+CALLBACK_PORT = int(os.getenv("GLADIA_CALLBACK_PORT", 8765))
+CALLBACK_PATH = "/gladia/callback"
+# How long to wait for a callback before falling back to polling
+CALLBACK_TIMEOUT = float(os.getenv("GLADIA_CALLBACK_TIMEOUT", 3600))
+# Callbacks nobody claims (a waiter that timed out, a job of another process) are dropped
+# after CALLBACK_TIMEOUT, and the oldest ones beyond this many
+CALLBACK_MAX_UNCLAIMED = 1000
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", 3))
+
+_http_session = None
+_callback_receiver = None
+
+
+def get_http_session():
+    # Shared client session, created on first use inside the running event loop
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=HTTP_POOL_SIZE, keepalive_timeout=HTTP_KEEPALIVE_SECONDS
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=120)
+        )
+    return _http_session
+
+
+async def close_http_session():
+    # Close pooled connections and the callback receiver, if any
+    global _http_session, _callback_receiver
+    if _callback_receiver is not None:
+        await _callback_receiver.stop()
+        _callback_receiver = None
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+async def make_request(url, headers, method="GET", data=None, timeout=None):
+    # Make a GET or POST request to the API and return JSON response
+    request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+    try:
+        async with get_http_session().request(
+            method, url, headers=headers, json=data, timeout=request_timeout
+        ) as response:
+            if response.status >= 400:
+                logger.error(f"API request failed with status {response.status}: {await response.text()}")
+            response.raise_for_status()
+            return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"API request failed: {str(e)}")
+        raise
+
+
+class MultipartFileStream:
+    # Multipart/form-data body that streams a single file from disk in bounded chunks.
+    # Its length is known up front so the upload goes out with a Content-Length header,
+    # and each iteration reopens the file so a retry starts cleanly.
+    def __init__(self, file_path, field_name, content_type, chunk_size=UPLOAD_CHUNK_SIZE, progress=None):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.boundary = uuid.uuid4().hex
+        self.size = os.path.getsize(file_path)
+        self.head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{os.path.basename(file_path)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    async def __aiter__(self):
+        yield self.head
+        sent = 0
+        with open(self.file_path, "rb") as f:
+            while True:
+                # Disk reads happen off the event loop
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if not chunk:
+                    break
+                sent += len(chunk)
+                if self.progress:
+                    self.progress(sent, self.size)
+                yield chunk
+        yield self.tail
+
+
+class UploadProgressLog:
+    # Logs upload progress each time another `step_percent` of the file has been sent,
+    # however large the chunks it is read in
+    def __init__(self, step_percent=10):
+        self.step_percent = step_percent
+        self.logged_percent = 0
+
+    def __call__(self, sent, total):
+        percent = sent * 100 // max(total, 1)
+        if percent >= self.logged_percent + self.step_percent or (sent == total and percent > self.logged_percent):
+            self.logged_percent = percent - percent % self.step_percent if sent < total else percent
+            logger.info(f"Uploaded {sent / 1e6:.1f} / {total / 1e6:.1f} MB ({percent}%)")
+
+
+async def upload_file(headers, file_path, content_type, progress=None):
+    # Stream a file to the upload endpoint, retrying the whole upload on transient failures.
+    # The endpoint takes a single multipart request, so a failed upload restarts from the
+    # beginning of the file rather than resuming at the failed chunk.
+    url = f"{GLADIA_API_URL}/upload/"
+    for attempt in range(1, UPLOAD_MAX_RETRIES + 1):
+        # A retry starts from the beginning of the file, and so does its progress log
+        body = MultipartFileStream(file_path, "audio", content_type, progress=progress or UploadProgressLog())
+        upload_headers = {**headers, "Content-Type": body.content_type, "Content-Length": str(len(body))}
+        try:
+            async with get_http_session().post(url, headers=upload_headers, data=body) as response:
+                if response.status < 500:
+                    if response.status >= 400:
+                        logger.error(f"Upload failed with status {response.status}: {await response.text()}")
+                    response.raise_for_status()
+                    return await response.json()
+                logger.warning(f"Upload attempt {attempt} failed with status {response.status}")
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            logger.warning(f"Upload attempt {attempt} failed: {str(e)}")
+        if attempt < UPLOAD_MAX_RETRIES:
+            await asyncio.sleep(2 ** attempt)
+    raise Exception(f"Failed to upload {file_path} after {UPLOAD_MAX_RETRIES} attempts")
+
+
+def poll_intervals():
+    # Exponential backoff with jitter, capped at POLL_MAX_INTERVAL
+    interval = POLL_INITIAL_INTERVAL
+    while True:
+        yield random.uniform(interval / 2, interval)
+        interval = min(interval * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL)
+
+
+async def poll_until_complete(result_url, headers):
+    # Poll a transcription job until it is done or has failed, and return the last response
+    intervals = poll_intervals()
+    while True:
+        poll_response = await make_request(result_url, headers)
+        status = poll_response.get("status")
+        if status in ("done", "error"):
+            return poll_response
+        logger.info(f"Transcription status: {status}")
+        await asyncio.sleep(next(intervals))
+
+
+class CallbackReceiver:
+    # Small HTTP server that receives Gladia's job completion callbacks.
+    # Only callbacks to the URL carrying this receiver's secret token are accepted. Those that
+    # arrive before anyone waits for them are kept until claimed, within CALLBACK_TIMEOUT and
+    # CALLBACK_MAX_UNCLAIMED.
+    def __init__(self, host=CALLBACK_HOST, port=CALLBACK_PORT, path=CALLBACK_PATH):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.token = secrets.token_urlsafe(24)
+        self._runner = None
+        self._waiters = {}
+        # Job id -> (monotonic time received, callback body), oldest first
+        self._received = {}
+
+    def url(self, public_url):
+        # The callback URL to give Gladia: the public URL with this receiver's token
+        separator = "&" if "?" in public_url else "?"
+        return f"{public_url}{separator}token={self.token}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_callback)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Listening for Gladia callbacks on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_callback(self, request):
+        if not hmac.compare_digest(request.query.get("token", ""), self.token):
+            return web.json_response({"error": "invalid token"}, status=403)
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "invalid JSON"}, status=400)
+        job_id = body.get("id")
+        if not job_id:
+            return web.json_response({"error": "missing id"}, status=400)
+        waiter = self._waiters.pop(job_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(body)
+        else:
+            self._keep(job_id, body)
+        return web.json_response({"ok": True})
+
+    def _keep(self, job_id, body):
+        # Keep an unclaimed callback, dropping those expired or beyond CALLBACK_MAX_UNCLAIMED
+        now = time.monotonic()
+        self._received.pop(job_id, None)
+        self._received[job_id] = (now, body)
+        while self._received:
+            oldest_id, (received_at, _) = next(iter(self._received.items()))
+            if len(self._received) <= CALLBACK_MAX_UNCLAIMED and now - received_at < CALLBACK_TIMEOUT:
+                break
+            del self._received[oldest_id]
+
+    async def wait_for(self, job_id, timeout):
+        # Wait for the callback of a job, raising asyncio.TimeoutError after `timeout` seconds
+        if job_id in self._received:
+            return self._received.pop(job_id)[1]
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = waiter
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            self._waiters.pop(job_id, None)
+
+
+async def get_callback_receiver():
+    # Shared callback receiver, started on first use when GLADIA_CALLBACK_URL is set
+    global _callback_receiver
+    if not CALLBACK_URL:
+        return None
+    if _callback_receiver is None:
+        _callback_receiver = CallbackReceiver()
+        await _callback_receiver.start()
+    return _callback_receiver
+
+
+async def callback_options():
+    # Extra transcription request fields asking Gladia to call us back when the job ends.
+    # The receiver is started here so it is listening before the job is submitted.
+    receiver = await get_callback_receiver()
+    if receiver is None:
+        return {}
+    return {"callback": True, "callback_config": {"url": receiver.url(CALLBACK_URL), "method": "POST"}}
+
+
+async def wait_for_transcription(result_url, headers, job_id=None):
+    # Wait for a transcription job to finish, through the callback receiver when one is
+    # configured, otherwise (or if the callback never comes) by polling result_url
+    receiver = await get_callback_receiver()
+    if receiver is not None and job_id:
+        try:
+            await receiver.wait_for(job_id, CALLBACK_TIMEOUT)
+            logger.info(f"Received completion callback for job {job_id}")
+        except asyncio.TimeoutError:
+            logger.warning(f"No callback for job {job_id} after {CALLBACK_TIMEOUT:.0f}s, polling instead")
+    return await poll_until_complete(result_url, headers)
+
+
+async def handle_transcription(gladia_api_key, file_path="recordings/output.mp4", content_type="video/mp4",
+                               output_dir="transcriptions", job=None):
+    # Handle the transcription process of a recording using Gladia API.
+    # `job`, when given, is filled in as the steps complete (the uploaded audio_url, then the
+    # job's id and result_url), so a call retried with the same dict after a failure, e.g. a
+    # 429, resumes at the step that failed instead of uploading and submitting the file again.
+    if not os.path.exists(file_path):
+        logger.error("Recording file not found")
+        return
+    job = {} if job is None else job
+
+    # Prepare API request
+    headers = {
+        "x-gladia-key": gladia_api_key,
+        "accept": "application/json",
+    }
+
+    # Upload file, streaming it from disk
+    if "audio_url" not in job:
+        logger.info("Uploading file to Gladia...")
+        upload_response = await upload_file(headers, file_path, content_type)
+        job["audio_url"] = upload_response.get("audio_url")
+
+    # Request transcription
+    headers["Content-Type"] = "application/json"
+    if "result_url" not in job:
+        data = {
+            "audio_url": job["audio_url"],
+            "diarization": str(os.getenv("DIARIZATION", "")).lower() in ["true", "t", "1", "yes", "y", "oui", "o"],
+            **await callback_options()
+        }
+
+        post_response = await make_request(
+            f"{GLADIA_API_URL}/transcription/", headers, "POST", data=data
+        )
+        job["result_url"] = post_response.get("result_url")
+        job["id"] = post_response.get("id")
+
+    # Wait for results; a resumed wait goes straight to polling, its callback may have come already
+    if job["result_url"]:
+        callback_job_id = None if job.get("waiting") else job["id"]
+        job["waiting"] = True
+        return await poll_transcription_results(job["result_url"], headers, callback_job_id, output_dir)
+
+
+async def poll_transcription_results(result_url, headers, job_id=None, output_dir="transcriptions"):
+    # Wait until transcription is done, by callback when configured or by polling with backoff
+    poll_response = await wait_for_transcription(result_url, headers, job_id)
+    status = poll_response.get("status")
+    os.makedirs(output_dir, exist_ok=True)
+
+    if status == "done":
+        # Get the full transcript
+        transcript = poll_response.get("result", {}).get("transcription", {}).get("full_transcript", "")
+        logger.info("Transcription completed")
+        logger.info(f"\nTranscript:\n{transcript}\n")
+
+        # Save complete response to file
+        with open(os.path.join(output_dir, "transcript.json"), "w") as f:
+            json.dump(poll_response, f, indent=2)
+
+    elif status == "error":
+        logger.error("Transcription failed")
+        with open(os.path.join(output_dir, "error.json"), "w") as f:
+            json.dump(poll_response, f, indent=2)
+
+    return poll_response
+
+
+def merge_transcriptions(segments):
+    # Stitch the results of consecutively recorded segments into one transcription result.
+    # `segments` holds (start offset in seconds, poll response) pairs in recording order;
+    # utterance and word timestamps are shifted by the offset of their segment. Speaker
+    # numbers come from each segment's own diarization and may differ between segments.
+    full_transcripts = []
+    utterances = []
+    failed = []
+    for index, (offset, poll_response) in enumerate(segments):
+        if not poll_response or poll_response.get("status") != "done":
+            failed.append(index)
+            continue
+        transcription = poll_response.get("result", {}).get("transcription", {})
+        if transcription.get("full_transcript"):
+            full_transcripts.append(transcription["full_transcript"])
+        for utterance in transcription.get("utterances", []):
+            shifted = {**utterance, "segment": index,
+                       "start": utterance["start"] + offset, "end": utterance["end"] + offset}
+            if "words" in utterance:
+                shifted["words"] = [
+                    {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+                    for word in utterance["words"]
+                ]
+            utterances.append(shifted)
+    return {
+        "status": "done" if not failed else "partial",
+        "failed_segments": failed,
+        "result": {"transcription": {"full_transcript": "\n".join(full_transcripts), "utterances": utterances}},
+    }
+
+
+async def transcribe_parts(gladia_api_key, parts, content_type, output_dir="transcriptions"):
+    # Transcribe the parts of one recording side by side and save the stitched result.
+    # `parts` holds (file path, start offset in seconds) pairs in recording order.
+    results = await asyncio.gather(*(
+        handle_transcription(gladia_api_key, file_path, content_type, os.path.join(output_dir, "parts", str(index)))
+        for index, (file_path, _) in enumerate(parts)
+    ), return_exceptions=True)
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Transcription of part {index} failed: {str(result)}")
+    merged = merge_transcriptions([
+        (start, None if isinstance(result, Exception) else result) for (_, start), result in zip(parts, results)
+    ])
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "transcript.json"), "w") as f:
+        json.dump(merged, f, indent=2)
+    return merged
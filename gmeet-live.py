@@ -4,23 +4,92 @@ import subprocess
 import click
 import datetime
 import json
+import time
 from time import sleep
 import logging
 import websockets
 from websockets.exceptions import ConnectionClosedOK
 import undetected_chromedriver as uc
+from browser import (
+    LEAN_BROWSER, BrowserWorker, CookieJar, PhaseTimer, chrome_arguments, google_session_valid, restore_google_session,
+    signed_in_to_google, turn_off_media_controls, window_size
+)
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException, TimeoutException
-import requests
-import base64
+from selenium.webdriver.support import expected_conditions as EC
+from streaming import BYTES_PER_SAMPLE, TRANSPORTS, AudioStreamer, LiveConnection, ReplayBuffer
+from vad import SpeechGate
+from gladia import GLADIA_API_URL, close_http_session, handle_transcription, make_request, transcribe_parts
+from recording import audio_recording_output, build_live_capture_command, recording_part_path
+from capture import CAPTURE_BACKENDS, FfmpegCapture, PortAudioCapture, check_capture_backend
+from metrics import close_session_metrics, session_metrics, start_metrics_server
+from captions import session_captions, start_caption_server
+from meeting_end import MeetingEndDetector, SilenceTracker
+from jobs import JobQueue
+from scheduler import NODE_CAPACITY, Scheduler, WarmPool
+from transcript_sink import TranscriptSink
+from transcript_store import BATCH, FINAL, LIVE, MeetingIngest, close_transcript_store
+from message_router import MessageRouter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bounds for each sign-in and join step; steps move on as soon as the page is ready
+SIGN_IN_STEP_TIMEOUT = int(os.getenv("SIGN_IN_STEP_TIMEOUT", 20))
+PAGE_LOAD_TIMEOUT = int(os.getenv("PAGE_LOAD_TIMEOUT", 30))
+MEDIA_CONTROL_TIMEOUT = 3
+
+# Saved Google session shared by bots using the same account; sign-in only runs when it has expired
+GOOGLE_SESSION_FILE = os.getenv("GOOGLE_SESSION_FILE", "")
+
+# Any of these means the Meet pre-join screen is ready to be used
+PREJOIN_READY_XPATH = (
+    "//span[contains(text(), 'Ask to join')]"
+    " | //span[contains(text(), 'Continue without microphone')]"
+    " | //div[@aria-label='Turn off microphone' or @aria-label='Turn on microphone']"
+)
+
+# Multi-session mode (GMEET_LINKS): how many meetings may run at once in this container
+MAX_CONCURRENT_SESSIONS = int(os.getenv("MAX_CONCURRENT_SESSIONS", 4))
+
 # Audio Configuration for Gladia
 SAMPLE_RATE = 16000
+# Duration of each audio chunk sent to Gladia: longer chunks mean fewer messages, shorter ones lower latency
+AUDIO_CHUNK_DURATION_MS = int(os.getenv("AUDIO_CHUNK_DURATION_MS", 100))
+# "binary" sends raw PCM frames, "json" falls back to base64 audio_chunk messages
+AUDIO_TRANSPORT = os.getenv("AUDIO_TRANSPORT", "binary").lower()
+if AUDIO_TRANSPORT not in TRANSPORTS:
+    raise ValueError(f"Unknown audio transport: {AUDIO_TRANSPORT} (expected one of {', '.join(TRANSPORTS)})")
+# "ffmpeg" pipes PCM from an ffmpeg subprocess, "portaudio" reads PulseAudio in-process
+CAPTURE_BACKEND = os.getenv("CAPTURE_BACKEND", "ffmpeg").lower()
+if CAPTURE_BACKEND not in CAPTURE_BACKENDS:
+    raise ValueError(f"Unknown capture backend: {CAPTURE_BACKEND} (expected one of {', '.join(CAPTURE_BACKENDS)})")
+# Seconds of unacknowledged audio kept for replay after a dropped connection
+REPLAY_BUFFER_SECONDS = int(os.getenv("REPLAY_BUFFER_SECONDS", 120))
+
+# Hybrid mode: the live capture is also recorded to disk and transcribed in batch after the meeting
+HYBRID_RECORDING = str(os.getenv("HYBRID_RECORDING", "")).lower() in ["true", "t", "1", "yes", "y"]
+RECORDING_AUDIO_CODEC = os.getenv("RECORDING_AUDIO_CODEC", "opus").lower()
+
+# Client-side voice activity gate: silent audio is not streamed (or billed)
+VAD_ENABLED = str(os.getenv("VAD_ENABLED", "")).lower() in ["true", "t", "1", "yes", "y"]
+VAD_THRESHOLD_DBFS = float(os.getenv("VAD_THRESHOLD_DBFS", -50))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", 500))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", 300))
+
+# Scheduler mode: run meeting jobs from this SQLite queue (see jobs.py) instead of GMEET_LINK(S)
+SCHEDULER_DB = os.getenv("SCHEDULER_DB", "")
+# Scheduler mode: a warm session that has waited this long has its Google sign-in checked again before joining
+SIGN_IN_CHECK_SECONDS = 600
+
+# Machine-readable live output: one JSON record per final utterance (with word timestamps),
+# named entity event and sentiment event, all in meeting time
+LIVE_EVENTS_FILE = "live_events.jsonl"
+# Record every raw message received, with its arrival time, for replaying through benchmarks/message_dispatch.py
+LIVE_MESSAGE_LOG = str(os.getenv("LIVE_MESSAGE_LOG", "")).lower() in ["true", "t", "1", "yes", "y"]
+LIVE_MESSAGE_LOG_FILE = "live_messages.jsonl"
 
 STREAMING_CONFIGURATION = {
    # === Audio Basics ===
@@ -79,19 +148,20 @@ STREAMING_CONFIGURATION = {
    }
 }
 
-def init_live_session(api_key: str):
+async def init_live_session(api_key: str):
     # Initialize a live transcription session with Gladia
     logger.info(f"Our streaming configuration is: {STREAMING_CONFIGURATION}")
-    response = requests.post(
-        "https://api.gladia.io/v2/live",
-        headers={"X-Gladia-Key": api_key},
-        json=STREAMING_CONFIGURATION,
-        timeout=3
-    )
-    if not response.ok:
-        logger.error(f"Failed to initialize live session: {response.text}")
+    try:
+        return await make_request(
+            f"{GLADIA_API_URL}/live",
+            {"X-Gladia-Key": api_key},
+            "POST",
+            data=STREAMING_CONFIGURATION,
+            timeout=3
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize live session: {str(e)}")
         raise Exception("Failed to initialize live session")
-    return response.json()
 
 async def run_command_async(command):
     # Run a shell command asynchronously
@@ -100,29 +170,51 @@ async def run_command_async(command):
     )
     return await process.communicate()
 
-async def google_sign_in(email, password, driver):
+async def google_sign_in(email, password, browser):
     # Handle Google account sign-in process
     try:
         logger.info("Starting Google sign-in process")
-        driver.get("https://accounts.google.com")
-        await asyncio.sleep(1)
+        await browser.get("https://accounts.google.com")
 
-        email_field = driver.find_element(By.NAME, "identifier")
-        email_field.send_keys(email)
-        await asyncio.sleep(2)
+        await browser.send_keys(By.NAME, "identifier", email, timeout=SIGN_IN_STEP_TIMEOUT)
 
-        driver.find_element(By.ID, "identifierNext").click()
-        await asyncio.sleep(3)
+        await browser.click(By.ID, "identifierNext", timeout=SIGN_IN_STEP_TIMEOUT)
 
-        password_field = driver.find_element(By.NAME, "Passwd")
-        password_field.click()
-        password_field.send_keys(password + Keys.RETURN)
-        await asyncio.sleep(5)
+        await browser.send_keys(
+            By.NAME, "Passwd", password + Keys.RETURN, click=True, timeout=SIGN_IN_STEP_TIMEOUT
+        )
+        try:
+            await browser.wait_for(signed_in_to_google, SIGN_IN_STEP_TIMEOUT)
+        except TimeoutException:
+            logger.warning("Sign-in did not land on the account page, continuing anyway")
         logger.info("Successfully signed in to Google")
-    except NoSuchElementException as e:
+    except (NoSuchElementException, TimeoutException) as e:
         logger.error(f"Failed to sign in: {str(e)}")
         raise
 
+async def sign_in(email, password, browser):
+    # Reuse the saved Google session when it is still valid, otherwise sign in and save it
+    if not GOOGLE_SESSION_FILE:
+        await google_sign_in(email, password, browser)
+        return
+
+    jar = CookieJar(GOOGLE_SESSION_FILE)
+    async with jar.locked():
+        cookies = jar.load()
+    if await restore_google_session(browser, cookies):
+        logger.info("Reusing saved Google session")
+        return
+
+    # Only one bot per account signs in at a time, the others wait for its session
+    async with jar.locked(exclusive=True):
+        fresh_cookies = jar.load()
+        if fresh_cookies != cookies and await restore_google_session(browser, fresh_cookies):
+            logger.info("Reusing Google session saved by another bot")
+            return
+        await google_sign_in(email, password, browser)
+        jar.save(await browser.get_cookies())
+        logger.info("Saved Google session")
+
 async def setup_audio_drivers():
     # Configure virtual audio drivers for recording
     logger.info("Setting up virtual audio drivers")
@@ -139,8 +231,16 @@ async def setup_audio_drivers():
     for cmd in commands:
         await run_command_async(cmd)
 
-async def handle_media_controls(driver):
+async def handle_media_controls(browser):
     #Simple function to turn off both microphone and camera.
+    # Wait for the pre-join screen rather than for a fixed time
+    try:
+        await browser.wait_for(
+            EC.presence_of_element_located((By.XPATH, PREJOIN_READY_XPATH)), PAGE_LOAD_TIMEOUT
+        )
+    except TimeoutException:
+        logger.warning("Pre-join screen did not load in time")
+
     try:
         initial_buttons = [
             "//span[contains(text(), 'Continue without microphone')]",
@@ -149,144 +249,241 @@ async def handle_media_controls(driver):
         
         for button in initial_buttons:
             try:
-                driver.find_element(By.XPATH, button).click()
-                await asyncio.sleep(1)
+                await browser.click(By.XPATH, button)
             except:
                 continue
     except Exception as e:
         logger.info(f"No initial popups found: {e}")
 
-    # Then handle microphone
-    try:
-        microphone_off = driver.find_element(By.XPATH, "//div[@aria-label='Turn off microphone']")
-        microphone_off.click()
-        driver.save_screenshot("screenshots/disable_microphone.png")
-        logger.info("Microphone turned off")
-    except:
-        logger.info("Microphone already off or not found")
-
-    await asyncio.sleep(1)  # Short pause between actions
-
-    # Then handle camera
+    # Then handle microphone and camera, both at once
     try:
-        camera_off = driver.find_element(By.XPATH, "//div[@aria-label='Turn off camera']")
-        camera_off.click()
-        driver.save_screenshot("screenshots/disable_camera.png")
-        logger.info("Camera turned off")
-    except:
-        logger.info("Camera already off or not found")
+        states = await turn_off_media_controls(browser, MEDIA_CONTROL_TIMEOUT)
+    except Exception as e:
+        logger.info(f"Could not check microphone and camera: {e}")
+        return
+    for device, screenshot in (("microphone", "disable_microphone"), ("camera", "disable_camera")):
+        if states[device] == "turned off":
+            await browser.save_screenshot(f"screenshots/{screenshot}.png")
+            logger.info(f"{device.capitalize()} turned off")
+        else:
+            logger.info(f"{device.capitalize()} already off or not found")
         
-async def join_meeting(driver):
-    #Attempt to join the meeting
-    max_time = datetime.datetime.now() + datetime.timedelta(
-        minutes=int(os.getenv("MAX_WAITING_TIME_IN_MINUTES", 5))
-    )
-    
-    while datetime.datetime.now() < max_time:
-        try:
-            join_button = driver.find_element(By.XPATH, "//span[contains(text(), 'Ask to join')]")
-            join_button.click()
-            await asyncio.sleep(2)
-            driver.save_screenshot("screenshots/joining.png")
-            logger.info("Meeting joined")
-            return True
-        except NoSuchElementException:
-            await asyncio.sleep(5)
-            logger.info("Waiting to join meeting...")
+async def join_meeting(browser):
+    #Attempt to join the meeting, clicking "Ask to join" as soon as it shows up
+    max_wait = int(os.getenv("MAX_WAITING_TIME_IN_MINUTES", 5)) * 60
     
-    logger.error("Failed to join meeting within the timeout period")
-    return False
+    try:
+        await browser.click(By.XPATH, "//span[contains(text(), 'Ask to join')]", timeout=max_wait)
+    except (NoSuchElementException, TimeoutException):
+        logger.error("Failed to join meeting within the timeout period")
+        return False
 
-async def capture_and_stream_audio(websocket):
-    # Capture audio using ffmpeg and stream to Gladia
-    logger.info("Starting audio capture")
-    
-    # FFmpeg command to capture audio and output raw PCM
-    ffmpeg_command = (
-        f"ffmpeg -y -f pulse -i MicOutput.monitor "
-        f"-acodec pcm_s16le -ac 1 -ar {SAMPLE_RATE} "
-        f"-f s16le -"  # Output raw PCM to stdout
-    )
+    await browser.save_screenshot("screenshots/joining.png")
+    logger.info("Meeting joined")
+    return True
 
-    process = await asyncio.create_subprocess_shell(
-        ffmpeg_command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
+async def capture_and_stream_audio(websocket, source="MicOutput.monitor", gate=None, record_path=None,
+                                   metrics=None, record_parts=None, silence=None):
+    # Capture audio and stream to Gladia, optionally recording it to record_path as well.
+    # The capture is restarted if it dies or stalls; with ffmpeg each restart records to a new
+    # part, and (path, start offset in seconds) of every part is appended to record_parts.
+    backend = CAPTURE_BACKEND
+    if backend == "portaudio" and record_path:
+        logger.warning("Hybrid recording needs the ffmpeg capture backend, using ffmpeg")
+        backend = "ffmpeg"
+    logger.info(f"Starting audio capture from {source} ({backend} capture, {AUDIO_TRANSPORT} transport)")
 
-    chunk_size = 3200  # Same as original FRAMES_PER_BUFFER
+    def capture_command(attempt):
+        # FFmpeg command to capture audio and output raw PCM to stdout
+        part_path = recording_part_path(record_path, attempt) if record_path else None
+        return build_live_capture_command(source, SAMPLE_RATE, part_path, RECORDING_AUDIO_CODEC)
+
+    def capture_started(attempt, offset):
+        if record_path and record_parts is not None:
+            record_parts.append((recording_part_path(record_path, attempt), offset))
+
+    def capture_restarted():
+        if metrics is not None:
+            metrics.ffmpeg_restarts += 1
+
+    if backend == "portaudio":
+        capture = PortAudioCapture(source, SAMPLE_RATE, on_restart=capture_restarted)
+    else:
+        capture = FfmpegCapture(
+            capture_command, f"capture {source}", SAMPLE_RATE * BYTES_PER_SAMPLE, BYTES_PER_SAMPLE,
+            on_start=capture_started, on_restart=capture_restarted
+        )
+
+    streamer = AudioStreamer(
+        websocket, SAMPLE_RATE, AUDIO_CHUNK_DURATION_MS, transport=AUDIO_TRANSPORT, gate=gate, metrics=metrics,
+        silence=silence
+    )
     try:
-        while True:
-            # Read chunk of raw audio data
-            audio_chunk = await process.stdout.read(chunk_size)
-            if not audio_chunk:
-                break
-
-            # Encode and send to Gladia
-            data = base64.b64encode(audio_chunk).decode("utf-8")
-            json_data = json.dumps({"type": "audio_chunk", "data": {"chunk": str(data)}})
-            await websocket.send(json_data)
-            await asyncio.sleep(0.1)  # Control streaming rate
+        await streamer.run(await capture.start())
     except Exception as e:
         logger.error(f"Error in audio capture: {str(e)}")
     finally:
-        process.terminate()
-        try:
-            await process.wait()
-        except:
-            pass
+        logger.info(
+            f"Audio capture stopped after {streamer.chunks_sent} chunks "
+            f"(queue depth {streamer.queue_depth}, lag {streamer.lag:.2f}s)"
+        )
+        if gate is not None:
+            logger.info(f"Voice activity gate: {gate.report()}")
+        await capture.stop()
+        logger.info(f"Capture health: {capture.summary()}")
+
+def _meeting_time_converter(websocket, timeline):
+    # Map a time in the current Gladia session to seconds since the meeting capture started
+    # Sessions reopened after a lost connection restart their clock at zero
+    time_offset = getattr(websocket, "session_time_offset", 0.0)
+    if timeline is None:
+        return lambda t: t + time_offset
+    # Silence skipped by the voice activity gate is not in Gladia's timeline
+    return lambda t: timeline.meeting_time(t + time_offset)
+
+def _utterance_record(utterance, meeting_time):
+    # JSONL record of a final utterance, with word timestamps in meeting time
+    return {
+        "type": "utterance",
+        "start": meeting_time(utterance["start"]),
+        "end": meeting_time(utterance["end"]),
+        "text": utterance["text"].strip(),
+        "language": utterance.get("language"),
+        "channel": utterance.get("channel"),
+        "confidence": utterance.get("confidence"),
+        "words": [
+            {
+                "word": word["word"],
+                "start": meeting_time(word["start"]),
+                "end": meeting_time(word["end"]),
+                "confidence": word.get("confidence")
+            }
+            for word in utterance.get("words", [])
+        ]
+    }
+
+def _realtime_event_record(content, meeting_time):
+    # JSONL record of a named entity or sentiment event, with its timestamps in meeting time
+    data = content.get("data") or {}
+    results = []
+    for result in data.get("results") or []:
+        result = dict(result)
+        for key in ("start", "end"):
+            if isinstance(result.get(key), (int, float)):
+                result[key] = meeting_time(result[key])
+        results.append(result)
+    return {"type": content["type"], "utterance_id": data.get("utterance_id"), "results": results}
 
-async def handle_transcription_messages(websocket):
+async def handle_transcription_messages(websocket, output_dir="transcriptions", timeline=None, metrics=None,
+                                       captions=None, ingest=None):
     # Process transcription messages from Gladia
+    # Files are written by the sink on a worker thread, so the receive loop never waits on disk,
+    # and so is the transcript store when enabled (ingest)
+    sink = await TranscriptSink(output_dir).start()
+    router = MessageRouter()
+    first_partial_at = None
+
+    @router.on("transcript")
+    def on_transcript(content):
+        nonlocal first_partial_at
+        if metrics is not None:
+            # Time from an utterance's first partial to its final transcript
+            if not content["data"]["is_final"]:
+                if first_partial_at is None:
+                    first_partial_at = time.monotonic()
+            elif first_partial_at is not None:
+                metrics.partial_to_final_seconds.observe(time.monotonic() - first_partial_at)
+                first_partial_at = None
+
+        if captions is not None:
+            # Partials too, so caption overlays can show speech as it is recognized
+            utterance = content["data"]["utterance"]
+            meeting_time = _meeting_time_converter(websocket, timeline)
+            captions.transcript(
+                content["data"].get("id"), content["data"]["is_final"], meeting_time(utterance["start"]),
+                meeting_time(utterance["end"]), utterance["text"].strip(), utterance.get("language")
+            )
+
+        if content["data"]["is_final"]:
+            record = _utterance_record(content["data"]["utterance"], _meeting_time_converter(websocket, timeline))
+            start_time, end_time, text = record["start"], record["end"], record["text"]
+            logger.info(f"{start_time:.2f}s --> {end_time:.2f}s | {text}")
+
+            # Save transcription to file
+            sink.append_line("live_transcript.txt", f"{start_time:.2f}s --> {end_time:.2f}s | {text}\n")
+            sink.append_record(LIVE_EVENTS_FILE, record)
+            if ingest is not None:
+                ingest.add_utterance(record)
+
+    def on_realtime_event(content):
+        sink.append_record(LIVE_EVENTS_FILE, _realtime_event_record(content, _meeting_time_converter(websocket, timeline)))
+
+    router.on("named_entity_recognition", on_realtime_event)
+    router.on("sentiment_analysis", on_realtime_event)
+
+    # Both possible final transcript message types end the session
+    def on_final_transcript(content):
+        logger.info(f"Received final transcript of type: {content['type']}")
+        
+        # Save complete transcript JSON
+        sink.write_json("final_transcript.json", content)
+        
+        # Save full transcript text
+        if "transcription" in content and "full_transcript" in content["transcription"]:
+            logger.info("Saving full transcript")
+            sink.write_text("full_transcript.txt", content["transcription"]["full_transcript"])
+        
+        # Save summary if available
+        if "summarization" in content and content["summarization"].get("results"):
+            logger.info("Saving summary")
+            sink.write_text("summary.txt", content["summarization"]["results"])
+        
+        # Save chapters if available
+        if "chapters" in content and content["chapters"].get("results"):
+            logger.info("Saving chapters")
+            sink.write_json("chapters.json", content["chapters"]["results"])
+
+        # Its utterances supersede the live ones in the store
+        if ingest is not None:
+            ingest.add_result(content, FINAL)
+        return True
+
+    router.on("final_transcript", on_final_transcript)
+    router.on("post_processing_result", on_final_transcript)
+
+    started_at = time.monotonic()
     try:
         async for message in websocket:
-            content = json.loads(message)
-            
-            if content["type"] == "transcript" and content["data"]["is_final"]:
-                start_time = content["data"]["utterance"]["start"]
-                end_time = content["data"]["utterance"]["end"]
-                text = content["data"]["utterance"]["text"].strip()
-                logger.info(f"{start_time:.2f}s --> {end_time:.2f}s | {text}")
-                
-                # Save transcription to file
-                with open("transcriptions/live_transcript.txt", "a") as f:
-                    f.write(f"{start_time:.2f}s --> {end_time:.2f}s | {text}\n")
-            
-            # Check for both possible final transcript message types
-            elif content["type"] in ["final_transcript", "post_processing_result"]:
-                logger.info(f"Received final transcript of type: {content['type']}")
-                
-                # Save complete transcript JSON
-                with open("transcriptions/final_transcript.json", "w") as f:
-                    json.dump(content, f, indent=2)
-                
-                # Save full transcript text
-                if "transcription" in content and "full_transcript" in content["transcription"]:
-                    logger.info("Saving full transcript")
-                    with open("transcriptions/full_transcript.txt", "w") as f:
-                        f.write(content["transcription"]["full_transcript"])
-                
-                # Save summary if available
-                if "summarization" in content and content["summarization"].get("results"):
-                    logger.info("Saving summary")
-                    with open("transcriptions/summary.txt", "w") as f:
-                        f.write(content["summarization"]["results"])
-                
-                # Save chapters if available
-                if "chapters" in content and content["chapters"].get("results"):
-                    logger.info("Saving chapters")
-                    with open("transcriptions/chapters.json", "w") as f:
-                        json.dump(content["chapters"]["results"], f, indent=2)
-                
-                return  
+            if LIVE_MESSAGE_LOG:
+                sink.append_record(LIVE_MESSAGE_LOG_FILE, {"at": round(time.monotonic() - started_at, 3), "message": message})
+            message_type, done = router.dispatch(message)
+            if metrics is not None:
+                metrics.messages[message_type] += 1
+            if done:
+                return
     except Exception as e:
         logger.error(f"Error processing transcription: {str(e)}")
+    finally:
+        await sink.close()
 
-async def join_meet():
-    # Main function to handle the Google Meet recording process
-    meet_link = os.getenv("GMEET_LINK", "https://meet.google.com/dau-pztc-yad")
-    logger.info(f"Starting recorder for {meet_link}")
+async def create_session_sink(session_id):
+    # Create a null sink for one meeting in multi-session mode, returns its name and module index
+    sink_name = f"MicOutput_{session_id}"
+    stdout, _ = await run_command_async(
+        f"sudo pactl load-module module-null-sink sink_name={sink_name} "
+        f"sink_properties=device.description={session_sink_label(session_id)}"
+    )
+    return sink_name, stdout.decode().strip()
 
+def session_sink_label(session_id):
+    # Device label Chrome shows for a session's sink
+    return f"Meet_Session_{session_id}_Output"
+
+async def remove_session_sink(module_index):
+    if module_index:
+        await run_command_async(f"sudo pactl unload-module {module_index}")
+
+def prepare_output_directories():
     # Create transcriptions directory if it doesn't exist
     os.makedirs("transcriptions", exist_ok=True)
     
@@ -296,28 +493,156 @@ async def join_meet():
             os.remove(f"screenshots/{f}")
     else:
         os.mkdir("screenshots")
-        
-    # Setup audio drivers
-    await setup_audio_drivers()
 
+async def start_browser():
     # Configure Chrome options
     options = uc.ChromeOptions()
-    chrome_args = [
-        "--use-fake-ui-for-media-stream",
-        "--window-size=1920x1080",
-        "--no-sandbox",
-        "--disable-setuid-sandbox",
-        "--disable-gpu",
-        "--disable-extensions",
-        "--disable-application-cache",
-        "--disable-dev-shm-usage"
-    ]
-    for arg in chrome_args:
+    for arg in chrome_arguments():
         options.add_argument(arg)
 
     # Initialize Chrome driver
-    driver = uc.Chrome(service_log_path="chromedriver.log", use_subprocess=False, options=options)
-    driver.set_window_size(1920, 1080)
+    browser = BrowserWorker()
+    await browser.start(
+        lambda: uc.Chrome(service_log_path="chromedriver.log", use_subprocess=False, options=options)
+    )
+    await browser.set_window_size(*window_size())
+    return browser
+
+async def enter_meeting(browser, meet_link, timer):
+    # Open the meeting page, turn off microphone and camera and ask to join
+    if LEAN_BROWSER:
+        await browser.use_lean_pages()
+    with timer.phase("page_load"):
+        await browser.get(meet_link)
+
+    # Grant necessary permissions
+    await browser.execute_cdp_cmd(
+        "Browser.grantPermissions",
+        {
+            "origin": meet_link,
+            "permissions": [
+                "geolocation",
+                "audioCapture",
+                "displayCapture",
+                "videoCapture",
+                "videoCapturePanTiltZoom",
+            ]
+        }
+    )
+
+    # Handle initial setup and media controls
+    with timer.phase("media_controls"):
+        await handle_media_controls(browser)
+    with timer.phase("lobby_join"):
+        joined = await join_meeting(browser)
+    logger.info(f"Join timing for {meet_link}: {timer.report()}")
+    if joined and LEAN_BROWSER:
+        await browser.block_images()
+    return joined
+
+async def transcribe_live(gladia_api_key, source="MicOutput.monitor", output_dir="transcriptions",
+                          recording_dir="recordings", session_name="main", browser=None, duration=None,
+                          meet_link=None):
+    # Stream the meeting audio to a Gladia live session and save what comes back, until the
+    # meeting is over (see meeting_end; the browser is the meeting's tab, used to tell).
+    # In hybrid mode the same capture is also recorded, and transcribed in batch afterwards.
+    # Finals are also stored as they come in the transcript store, when enabled.
+    os.makedirs(output_dir, exist_ok=True)
+    record_path = content_type = None
+    record_parts = []
+    if HYBRID_RECORDING:
+        os.makedirs(recording_dir, exist_ok=True)
+        record_path, content_type = audio_recording_output(RECORDING_AUDIO_CODEC, recording_dir)
+
+    async def open_session():
+        # Initialize live transcription session
+        session = await init_live_session(gladia_api_key)
+        return session["url"]
+
+    # Exposed on the metrics endpoint, when enabled, under this session's name
+    metrics = session_metrics(session_name)
+    # Pushed to caption subscribers, when enabled, under the same name
+    captions = session_captions(session_name)
+
+    # Audio not yet acknowledged by Gladia is kept for replay if the connection drops
+    bytes_per_second = SAMPLE_RATE * BYTES_PER_SAMPLE
+    connection = LiveConnection(
+        open_session, ReplayBuffer(REPLAY_BUFFER_SECONDS * bytes_per_second), bytes_per_second, metrics
+    )
+    await connection.connect()
+
+    # Optionally hold back silent audio before it reaches Gladia
+    gate = None
+    if VAD_ENABLED:
+        gate = SpeechGate(
+            SAMPLE_RATE, AUDIO_CHUNK_DURATION_MS, VAD_THRESHOLD_DBFS, VAD_HANGOVER_MS, VAD_PREROLL_MS
+        )
+    
+    # Watches the meeting page and the captured audio for the end of the meeting
+    silence = SilenceTracker()
+    meeting_end = MeetingEndDetector(browser, silence)
+
+    # Stored as a new meeting of the transcript store, when enabled
+    ingest = await MeetingIngest.open(LIVE, meet_link, output_dir)
+
+    # Start live transcription
+    try:
+        logger.info("Starting live transcription")
+        
+        # Create tasks for audio streaming and transcription handling
+        audio_task = asyncio.create_task(capture_and_stream_audio(
+            connection, source, gate, record_path, metrics, record_parts, silence
+        ))
+        transcription_task = asyncio.create_task(handle_transcription_messages(
+            connection, output_dir, gate.timeline if gate else None, metrics, captions, ingest
+        ))
+        
+        # Wait for the meeting to end, staying no longer than the specified duration
+        if duration is None:
+            duration = int(os.getenv("DURATION_IN_MINUTES", 15)) * 60
+        reason = await meeting_end.wait(duration)
+        logger.info(f"Meeting over: {reason}")
+        
+        # Stop audio capture first
+        logger.info("Stopping audio capture...")
+        audio_task.cancel()
+        
+        # Send stop signal to Gladia and wait for final transcript (add timeout to prevent infinite wait)
+        try:
+            await asyncio.wait_for(connection.stop(), timeout=30)
+            logger.info("Waiting for final transcript...")
+            await asyncio.wait_for(transcription_task, timeout=120)  # 120 second timeout
+        except asyncio.TimeoutError:
+            logger.warning("Timeout waiting for final transcript")
+        finally:
+            transcription_task.cancel()
+    finally:
+        if connection.reconnects:
+            logger.info(f"Live transcription reconnected {connection.reconnects} times")
+        await connection.close()
+        if ingest is not None:
+            await ingest.close()
+        close_session_metrics(session_name)
+
+    if record_path:
+        # Let ffmpeg finish writing the recording, then run the batch transcription on it
+        await asyncio.gather(audio_task, return_exceptions=True)
+        if len(record_parts) > 1:
+            # The capture was restarted during the meeting, stitch the parts back together
+            result = await transcribe_parts(gladia_api_key, record_parts, content_type, output_dir)
+        else:
+            result = await handle_transcription(gladia_api_key, record_path, content_type, output_dir)
+        # The diarized batch transcript replaces the live one in the store
+        if ingest is not None and result and result.get("status") in ("done", "partial"):
+            try:
+                await asyncio.to_thread(ingest.store.write_result, ingest.meeting_id, result["result"], BATCH)
+            except Exception as e:
+                logger.error(f"Failed to store the batch transcript of meeting {ingest.meeting_id}: {str(e)}")
+
+async def join_meet():
+    # Main function to handle the Google Meet recording process
+    meet_link = os.getenv("GMEET_LINK", "https://meet.google.com/dau-pztc-yad")
+    logger.info(f"Starting recorder for {meet_link}")
 
     # Get credentials
     email = os.getenv("GMAIL_USER_EMAIL", "")
@@ -328,67 +653,200 @@ async def join_meet():
         logger.error("Missing required credentials")
         return
 
-    try:
-        # Sign in and join meet
-        await google_sign_in(email, password, driver)
-        driver.get(meet_link)
+    prepare_output_directories()
+        
+    # Setup audio drivers
+    await setup_audio_drivers()
 
-        # Grant necessary permissions
-        driver.execute_cdp_cmd(
-            "Browser.grantPermissions",
-            {
-                "origin": meet_link,
-                "permissions": [
-                    "geolocation",
-                    "audioCapture",
-                    "displayCapture",
-                    "videoCapture",
-                    "videoCapturePanTiltZoom",
-                ]
-            }
-        )
+    browser = await start_browser()
 
-        # Handle initial setup and media controls
-        await handle_media_controls(driver)
-        if not await join_meeting(driver):
+    metrics_server = await start_metrics_server()
+    caption_server = await start_caption_server()
+    try:
+        # Sign in and join meet, timing each step
+        timer = PhaseTimer()
+        with timer.phase("sign_in"):
+            await sign_in(email, password, browser)
+        if not await enter_meeting(browser, meet_link, timer):
             return
 
-        # Initialize live transcription session
-        session = init_live_session(gladia_api_key)
-        
-        # Start live transcription
-        async with websockets.connect(session["url"]) as websocket:
-            logger.info("Starting live transcription")
-            
-            # Create tasks for audio streaming and transcription handling
-            audio_task = asyncio.create_task(capture_and_stream_audio(websocket))
-            transcription_task = asyncio.create_task(handle_transcription_messages(websocket))
-            
-            # Wait for the specified duration
-            duration = int(os.getenv("DURATION_IN_MINUTES", 15)) * 60
-            await asyncio.sleep(duration)
-            
-            # Stop audio capture first
-            logger.info("Stopping audio capture...")
-            audio_task.cancel()
-            
-            # Send stop signal to Gladia
-            await websocket.send(json.dumps({"type": "stop_recording"}))
-            
-            # Wait for final transcript (add timeout to prevent infinite wait)
-            try:
-                logger.info("Waiting for final transcript...")
-                await asyncio.wait_for(transcription_task, timeout=120)  # 120 second timeout
-            except asyncio.TimeoutError:
-                logger.warning("Timeout waiting for final transcript")
-            finally:
-                transcription_task.cancel()
+        await transcribe_live(gladia_api_key, browser=browser, meet_link=meet_link)
     except Exception as e:
         logger.error(f"Error during meeting: {str(e)}")
     finally:
-        driver.quit()
+        await browser.quit()
+        await close_http_session()
+        close_transcript_store()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if caption_server is not None:
+            await caption_server.stop()
+
+async def join_meet_session(session_id, meet_link, browser, gladia_api_key, slots):
+    # Join one meeting in its own tab of the shared browser, with its own sink and capture
+    async with slots:
+        logger.info(f"Starting session {session_id} for {meet_link}")
+        sink_name, module_index = await create_session_sink(session_id)
+        tab = await browser.open_tab()
+        try:
+            await tab.route_audio_to(session_sink_label(session_id))
+            if not await enter_meeting(tab, meet_link, PhaseTimer()):
+                return
+            await transcribe_live(
+                gladia_api_key,
+                source=f"{sink_name}.monitor",
+                output_dir=os.path.join("transcriptions", f"session-{session_id}"),
+                recording_dir=os.path.join("recordings", f"session-{session_id}"),
+                session_name=str(session_id),
+                browser=tab,
+                meet_link=meet_link
+            )
+        except Exception as e:
+            logger.error(f"Error during meeting {meet_link}: {str(e)}")
+        finally:
+            await tab.quit()
+            await remove_session_sink(module_index)
+            logger.info(f"Session {session_id} finished")
+
+async def join_meets(meet_links):
+    # Multi-session mode: several meetings share one Chrome and one PulseAudio server,
+    # each in its own tab with its own null sink, capture pipeline and live session
+    logger.info(
+        f"Starting recorder for {len(meet_links)} meetings, "
+        f"at most {MAX_CONCURRENT_SESSIONS} at a time"
+    )
+
+    # Get credentials
+    email = os.getenv("GMAIL_USER_EMAIL", "")
+    password = os.getenv("GMAIL_USER_PASSWORD", "")
+    gladia_api_key = os.getenv("GLADIA_API_KEY", "")
+
+    if not all([email, password, gladia_api_key]):
+        logger.error("Missing required credentials")
+        return
+
+    prepare_output_directories()
+    await setup_audio_drivers()
+    browser = await start_browser()
+
+    metrics_server = await start_metrics_server()
+    caption_server = await start_caption_server()
+    try:
+        # All tabs share the browser's Google session, so sign in once
+        await sign_in(email, password, browser)
+
+        slots = asyncio.Semaphore(MAX_CONCURRENT_SESSIONS)
+        await asyncio.gather(*(
+            join_meet_session(session_id, meet_link, browser, gladia_api_key, slots)
+            for session_id, meet_link in enumerate(meet_links, start=1)
+        ))
+    finally:
+        await browser.quit()
+        await close_http_session()
+        close_transcript_store()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if caption_server is not None:
+            await caption_server.stop()
+
+async def run_scheduler(queue_path):
+    # Scheduler mode: a long-running node taking meeting jobs from a queue. Chrome, PulseAudio
+    # and the Google sign-in are set up once, and each job's tab and sink are prepared ahead
+    # in a warm pool, so joining a meeting only means opening it
+    logger.info(f"Starting scheduler on {queue_path}")
+
+    # Get credentials
+    email = os.getenv("GMAIL_USER_EMAIL", "")
+    password = os.getenv("GMAIL_USER_PASSWORD", "")
+    gladia_api_key = os.getenv("GLADIA_API_KEY", "")
+
+    if not all([email, password, gladia_api_key]):
+        logger.error("Missing required credentials")
+        return
+
+    prepare_output_directories()
+    await setup_audio_drivers()
+    browser = await start_browser()
+
+    session_ids = iter(range(1, 1 << 31))
+    sign_in_lock = asyncio.Lock()
+
+    async def ensure_signed_in(tab):
+        # The node outlives its Google session: sign in again (from the saved session first,
+        # when there is one) if the tab finds itself signed out. Tabs share cookies, so one at a time.
+        async with sign_in_lock:
+            if not await google_session_valid(tab):
+                logger.warning("Google session expired, signing in again")
+                await sign_in(email, password, tab)
+
+    async def prepare_session():
+        # A signed-in tab whose audio goes to its own sink, ready to open a meeting
+        session_id = next(session_ids)
+        sink_name, module_index = await create_session_sink(session_id)
+        tab = await browser.open_tab()
+        try:
+            await tab.route_audio_to(session_sink_label(session_id))
+            await ensure_signed_in(tab)
+        except Exception:
+            await tab.quit()
+            await remove_session_sink(module_index)
+            raise
+        return session_id, sink_name, module_index, tab, time.monotonic()
+
+    async def release_session(session):
+        _, _, module_index, tab, _ = session
+        await tab.quit()
+        await remove_session_sink(module_index)
+
+    async def run_job(job, session, in_lobby):
+        session_id, sink_name, _, tab, signed_in_at = session
+        try:
+            if time.monotonic() - signed_in_at > SIGN_IN_CHECK_SECONDS:
+                await ensure_signed_in(tab)
+            if not await enter_meeting(tab, job["meet_link"], PhaseTimer()):
+                raise RuntimeError("could not join the meeting")
+            await in_lobby()
+            # Stay until the meeting is over, and no later than its scheduled end
+            scheduled_end = job["start_at"] + job["duration_minutes"] * 60
+            await transcribe_live(
+                gladia_api_key,
+                source=f"{sink_name}.monitor",
+                output_dir=os.path.join("transcriptions", f"job-{job['id']}"),
+                recording_dir=os.path.join("recordings", f"job-{job['id']}"),
+                session_name=f"job-{job['id']}",
+                browser=tab,
+                duration=max(60, scheduled_end - time.time()),
+                meet_link=job["meet_link"]
+            )
+        finally:
+            await release_session(session)
+
+    queue = JobQueue(queue_path)
+    metrics_server = await start_metrics_server()
+    caption_server = await start_caption_server()
+    try:
+        # All tabs share the browser's Google session, so sign in once
+        await sign_in(email, password, browser)
+        await Scheduler(queue, WarmPool(prepare_session, release_session), run_job).run()
+    finally:
+        queue.close()
+        await browser.quit()
+        await close_http_session()
+        close_transcript_store()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if caption_server is not None:
+            await caption_server.stop()
 
 if __name__ == "__main__":
     click.echo("Starting Google Meet recorder with live transcription...")
-    asyncio.run(join_meet())
+    meet_links = [link.strip() for link in os.getenv("GMEET_LINKS", "").split(",") if link.strip()]
+    if SCHEDULER_DB:
+        check_capture_backend(CAPTURE_BACKEND, NODE_CAPACITY)
+        asyncio.run(run_scheduler(SCHEDULER_DB))
+    elif meet_links:
+        check_capture_backend(CAPTURE_BACKEND, min(len(meet_links), MAX_CONCURRENT_SESSIONS))
+        asyncio.run(join_meets(meet_links))
+    else:
+        asyncio.run(join_meet())
     click.echo("Finished recording Google Meet.")
\ No newline at end of file
@@ -3,31 +3,55 @@ import os
 import subprocess
 import click
 import datetime
-import requests
 import json
+import time
 from time import sleep
 import logging
 import undetected_chromedriver as uc
+from browser import (
+    LEAN_BROWSER, BrowserWorker, CookieJar, PhaseTimer, chrome_arguments, restore_google_session, signed_in_to_google,
+    turn_off_media_controls, window_size
+)
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from recording import PULSE_AUDIO_SOURCE, build_record_command, read_segment_list
+from supervisor import FfmpegSupervisor
+from gladia import close_http_session, handle_transcription, merge_transcriptions
+from meeting_end import MeetingEndDetector, SilenceTracker, monitor_silence
+from transcript_store import close_transcript_store, store_transcription
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def make_request(url, headers, method="GET", data=None, files=None):
-    # Make a GET or POST request to the API and return JSON response
-    try:
-        if method == "POST":
-            response = requests.post(url, headers=headers, json=data, files=files)
-        else:
-            response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request failed: {str(e)}")
-        raise
+# Upper bounds for each sign-in and join step; steps move on as soon as the page is ready
+SIGN_IN_STEP_TIMEOUT = int(os.getenv("SIGN_IN_STEP_TIMEOUT", 20))
+PAGE_LOAD_TIMEOUT = int(os.getenv("PAGE_LOAD_TIMEOUT", 30))
+MEDIA_CONTROL_TIMEOUT = 3
+
+# Saved Google session shared by bots using the same account; sign-in only runs when it has expired
+GOOGLE_SESSION_FILE = os.getenv("GOOGLE_SESSION_FILE", "")
+
+# Any of these means the Meet pre-join screen is ready to be used
+PREJOIN_READY_XPATH = (
+    "//span[contains(text(), 'Ask to join')]"
+    " | //span[contains(text(), 'Continue without microphone')]"
+    " | //div[@aria-label='Turn off microphone' or @aria-label='Turn on microphone']"
+)
+
+# What to record: "audio" (speech codec only), "video" (low fps video) or "full" (1080p30)
+RECORDING_MODE = os.getenv("RECORDING_MODE", "audio").lower()
+RECORDING_AUDIO_CODEC = os.getenv("RECORDING_AUDIO_CODEC", "opus").lower()
+RECORDING_VIDEO_FPS = int(os.getenv("RECORDING_VIDEO_FPS", 5))
+
+# Roll the recording over every N minutes and transcribe finished segments during the meeting (0 = one file)
+RECORDING_SEGMENT_MINUTES = float(os.getenv("RECORDING_SEGMENT_MINUTES", 0))
+# How many segments may be uploaded and transcribed at the same time
+SEGMENT_UPLOAD_CONCURRENCY = int(os.getenv("SEGMENT_UPLOAD_CONCURRENCY", 2))
+# How often the segment list written by ffmpeg is checked for newly finished segments
+SEGMENT_POLL_SECONDS = 2
 
 async def run_command_async(command):
     # Run a shell command asynchronously
@@ -36,35 +60,57 @@ async def run_command_async(command):
     )
     return await process.communicate()
 
-async def google_sign_in(email, password, driver):
+async def google_sign_in(email, password, browser):
     # Handle Google account sign-in process 
     try:
         logger.info("Starting Google sign-in process")
-        driver.get("https://accounts.google.com")
-        await asyncio.sleep(1)
+        await browser.get("https://accounts.google.com")
 
         # Enter email
-        email_field = driver.find_element(By.NAME, "identifier")
-        email_field.send_keys(email)
-        driver.save_screenshot("screenshots/email.png")
-        await asyncio.sleep(2)
+        await browser.send_keys(By.NAME, "identifier", email, timeout=SIGN_IN_STEP_TIMEOUT)
+        await browser.save_screenshot("screenshots/email.png")
 
         # Click next and handle password
-        driver.find_element(By.ID, "identifierNext").click()
-        await asyncio.sleep(3)
-        driver.save_screenshot("screenshots/password.png")
+        await browser.click(By.ID, "identifierNext", timeout=SIGN_IN_STEP_TIMEOUT)
+        await browser.save_screenshot("screenshots/password.png")
 
         # Enter password
-        password_field = driver.find_element(By.NAME, "Passwd")
-        password_field.click()
-        password_field.send_keys(password + Keys.RETURN)
-        await asyncio.sleep(5)
-        driver.save_screenshot("screenshots/signed_in.png")
+        await browser.send_keys(
+            By.NAME, "Passwd", password + Keys.RETURN, click=True, timeout=SIGN_IN_STEP_TIMEOUT
+        )
+        try:
+            await browser.wait_for(signed_in_to_google, SIGN_IN_STEP_TIMEOUT)
+        except TimeoutException:
+            logger.warning("Sign-in did not land on the account page, continuing anyway")
+        await browser.save_screenshot("screenshots/signed_in.png")
         logger.info("Successfully signed in to Google")
-    except NoSuchElementException as e:
+    except (NoSuchElementException, TimeoutException) as e:
         logger.error(f"Failed to sign in: {str(e)}")
         raise
 
+async def sign_in(email, password, browser):
+    # Reuse the saved Google session when it is still valid, otherwise sign in and save it
+    if not GOOGLE_SESSION_FILE:
+        await google_sign_in(email, password, browser)
+        return
+
+    jar = CookieJar(GOOGLE_SESSION_FILE)
+    async with jar.locked():
+        cookies = jar.load()
+    if await restore_google_session(browser, cookies):
+        logger.info("Reusing saved Google session")
+        return
+
+    # Only one bot per account signs in at a time, the others wait for its session
+    async with jar.locked(exclusive=True):
+        fresh_cookies = jar.load()
+        if fresh_cookies != cookies and await restore_google_session(browser, fresh_cookies):
+            logger.info("Reusing Google session saved by another bot")
+            return
+        await google_sign_in(email, password, browser)
+        jar.save(await browser.get_cookies())
+        logger.info("Saved Google session")
+
 async def setup_audio_drivers():
     #Configure virtual audio drivers for recording
     logger.info("Setting up virtual audio drivers")
@@ -96,24 +142,22 @@ async def join_meet():
     # Setup audio drivers
     await setup_audio_drivers()
 
+    # Lean mode draws next to nothing, so it is only used when no video is recorded from the screen
+    lean = LEAN_BROWSER and RECORDING_MODE == "audio"
+    if LEAN_BROWSER and not lean:
+        logger.warning(f"Lean browser mode ignored: the {RECORDING_MODE} recording mode records the screen")
+
     # Configure Chrome options
     options = uc.ChromeOptions()
-    chrome_args = [
-        "--use-fake-ui-for-media-stream",
-        "--window-size=1920x1080",
-        "--no-sandbox",
-        "--disable-setuid-sandbox",
-        "--disable-gpu",
-        "--disable-extensions",
-        "--disable-application-cache",
-        "--disable-dev-shm-usage"
-    ]
-    for arg in chrome_args:
+    for arg in chrome_arguments(lean):
         options.add_argument(arg)
 
     # Initialize Chrome driver
-    driver = uc.Chrome(service_log_path="chromedriver.log", use_subprocess=False, options=options)
-    driver.set_window_size(1920, 1080)
+    browser = BrowserWorker()
+    await browser.start(
+        lambda: uc.Chrome(service_log_path="chromedriver.log", use_subprocess=False, options=options)
+    )
+    await browser.set_window_size(*window_size(lean))
 
     # Get credentials
     email = os.getenv("GMAIL_USER_EMAIL", "")
@@ -130,12 +174,17 @@ async def join_meet():
         return
 
     try:
-        # Sign in and join meet
-        await google_sign_in(email, password, driver)
-        driver.get(meet_link)
+        # Sign in and join meet, timing each step
+        timer = PhaseTimer()
+        with timer.phase("sign_in"):
+            await sign_in(email, password, browser)
+        if lean:
+            await browser.use_lean_pages()
+        with timer.phase("page_load"):
+            await browser.get(meet_link)
 
         # Grant necessary permissions
-        driver.execute_cdp_cmd(
+        await browser.execute_cdp_cmd(
             "Browser.grantPermissions",
             {
                 "origin": meet_link,
@@ -150,22 +199,49 @@ async def join_meet():
         )
 
         # Handle initial setup and media controls
-        driver.save_screenshot("screenshots/initial.png")
-        await handle_media_controls(driver)
-        await join_meeting(driver)
+        await browser.save_screenshot("screenshots/initial.png")
+        with timer.phase("media_controls"):
+            await handle_media_controls(browser)
+        with timer.phase("lobby_join"):
+            await join_meeting(browser)
+        logger.info(f"Join timing: {timer.report()}")
+        if lean:
+            await browser.block_images()
 
         # Start recording
         duration = int(os.getenv("DURATION_IN_MINUTES", 15)) * 60
-        await record_meeting(duration)
+        started_at = time.time()
+        if RECORDING_SEGMENT_MINUTES > 0:
+            # Segments are transcribed while recording goes on
+            result = await record_and_transcribe_segments(duration, gladia_api_key, browser=browser)
+        else:
+            file_path, content_type = await record_meeting(duration, browser)
+
+            # Handle transcription
+            result = await handle_transcription(gladia_api_key, file_path, content_type)
 
-        # Handle transcription
-        await handle_transcription(gladia_api_key)
+        # Keep it searchable across meetings in the transcript store, when enabled
+        if result and result.get("status") in ("done", "partial"):
+            await asyncio.to_thread(
+                store_transcription, result["result"], meet_link=meet_link, output_dir="transcriptions",
+                started_at=started_at
+            )
 
     finally:
-        driver.quit()
+        await browser.quit()
+        await close_http_session()
+        close_transcript_store()
 
-async def handle_media_controls(driver):
+async def handle_media_controls(browser):
     #Simple function to turn off both microphone and camera.
+    # Wait for the pre-join screen rather than for a fixed time
+    try:
+        await browser.wait_for(
+            EC.presence_of_element_located((By.XPATH, PREJOIN_READY_XPATH)), PAGE_LOAD_TIMEOUT
+        )
+    except TimeoutException:
+        logger.warning("Pre-join screen did not load in time")
+
     try:
         initial_buttons = [
             "//span[contains(text(), 'Continue without microphone')]",
@@ -174,131 +250,123 @@ async def handle_media_controls(driver):
         
         for button in initial_buttons:
             try:
-                driver.find_element(By.XPATH, button).click()
-                await asyncio.sleep(1)
+                await browser.click(By.XPATH, button)
             except:
                 continue
     except Exception as e:
         logger.info(f"No initial popups found: {e}")
 
-    # Then handle microphone
+    # Then handle microphone and camera, both at once
     try:
-        microphone_off = driver.find_element(By.XPATH, "//div[@aria-label='Turn off microphone']")
-        microphone_off.click()
-        driver.save_screenshot("screenshots/disable_microphone.png")
-        logger.info("Microphone turned off")
-    except:
-        logger.info("Microphone already off or not found")
-
-    await asyncio.sleep(1)  # Short pause between actions
+        states = await turn_off_media_controls(browser, MEDIA_CONTROL_TIMEOUT)
+    except Exception as e:
+        logger.info(f"Could not check microphone and camera: {e}")
+        return
+    for device, screenshot in (("microphone", "disable_microphone"), ("camera", "disable_camera")):
+        if states[device] == "turned off":
+            await browser.save_screenshot(f"screenshots/{screenshot}.png")
+            logger.info(f"{device.capitalize()} turned off")
+        else:
+            logger.info(f"{device.capitalize()} already off or not found")
 
-    # Then handle camera
-    try:
-        camera_off = driver.find_element(By.XPATH, "//div[@aria-label='Turn off camera']")
-        camera_off.click()
-        driver.save_screenshot("screenshots/disable_camera.png")
-        logger.info("Camera turned off")
-    except:
-        logger.info("Camera already off or not found")
-
-async def join_meeting(driver):
-    #Attempt to join the meeting
-    max_time = datetime.datetime.now() + datetime.timedelta(
-        minutes=int(os.getenv("MAX_WAITING_TIME_IN_MINUTES", 5))
-    )
-    
-    while datetime.datetime.now() < max_time:
-        try:
-            join_button = driver.find_element(By.XPATH, "//span[contains(text(), 'Ask to join')]")
-            join_button.click()
-            await asyncio.sleep(2)
-            driver.save_screenshot("screenshots/joining.png")
-            logger.info("Meeting joined")
-            return True
-        except NoSuchElementException:
-            await asyncio.sleep(5)
-            logger.info("Waiting to join meeting...")
+async def join_meeting(browser):
+    #Attempt to join the meeting, clicking "Ask to join" as soon as it shows up
+    max_wait = int(os.getenv("MAX_WAITING_TIME_IN_MINUTES", 5)) * 60
     
-    logger.error("Failed to join meeting within the timeout period")
-    return False
+    try:
+        await browser.click(By.XPATH, "//span[contains(text(), 'Ask to join')]", timeout=max_wait)
+    except (NoSuchElementException, TimeoutException):
+        logger.error("Failed to join meeting within the timeout period")
+        return False
+
+    await browser.save_screenshot("screenshots/joining.png")
+    logger.info("Meeting joined")
+    return True
+
+async def record_until_meeting_end(supervisor, duration, browser=None):
+    #Run the recording until the meeting is over (see meeting_end), or for the whole duration at most,
+    #then let ffmpeg finish the file
+    silence = SilenceTracker()
+    meeting_end = MeetingEndDetector(browser, silence)
+    # The recording itself is in a file, so silence is listened for on a separate low-rate capture
+    monitor = asyncio.create_task(monitor_silence(PULSE_AUDIO_SOURCE, silence)) if meeting_end.silence else None
+    recording_task = asyncio.create_task(supervisor.run())
+    try:
+        reason = await meeting_end.wait_or_finish(recording_task, duration)
+        if reason:
+            logger.info(f"Meeting over: {reason}, stopping the recording")
+            await supervisor.stop()
+        return await recording_task
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
 
-async def record_meeting(duration):
+async def record_meeting(duration, browser=None):
     #Record the meeting using ffmpeg
-    logger.info("Starting recording")
-    record_command = (
-        f"ffmpeg -y -video_size 1920x1080 -framerate 30 -f x11grab -i :99 "
-        f"-f pulse -i MicOutput.monitor -t {duration} -c:v libx264 -pix_fmt yuv420p "
-        f"-c:a aac -strict experimental recordings/output.mp4"
+    logger.info(f"Starting recording ({RECORDING_MODE} mode)")
+    record_command, file_path, content_type = build_record_command(
+        RECORDING_MODE, duration, audio_codec=RECORDING_AUDIO_CODEC, video_fps=RECORDING_VIDEO_FPS
     )
-    await run_command_async(record_command)
-    logger.info("Recording completed")
-
-async def handle_transcription(gladia_api_key):
-    #Handle the transcription process using Gladia API
-    file_path = "recordings/output.mp4"
-    if not os.path.exists(file_path):
-        logger.error("Recording file not found")
-        return
-
-    # Prepare API request
-    headers = {
-        "x-gladia-key": gladia_api_key,
-        "accept": "application/json",
-    }
-
-    # Upload file
-    with open(file_path, "rb") as f:
-        file_content = f.read()
-    
-    files = [("audio", (file_path, file_content, "video/mp4"))]
-    logger.info("Uploading file to Gladia...")
-    upload_response = make_request(
-        "https://api.gladia.io/v2/upload/", headers, "POST", files=files
+    # Supervised so a hung ffmpeg is stopped instead of holding the bot until the meeting is over
+    supervisor = FfmpegSupervisor(lambda attempt: record_command, name="recording")
+    await record_until_meeting_end(supervisor, duration, browser)
+    logger.info(f"Recording completed ({supervisor.health.summary()})")
+    return file_path, content_type
+
+async def record_and_transcribe_segments(duration, gladia_api_key, output_dir="transcriptions", browser=None):
+    #Record the meeting in segments, transcribing each one in the background as soon as it is
+    #finished, then stitch the segment transcripts into one with meeting timestamps
+    segment_seconds = int(RECORDING_SEGMENT_MINUTES * 60)
+    logger.info(f"Starting recording ({RECORDING_MODE} mode, {segment_seconds}s segments)")
+    record_command, list_path, content_type = build_record_command(
+        RECORDING_MODE, duration, audio_codec=RECORDING_AUDIO_CODEC, video_fps=RECORDING_VIDEO_FPS,
+        segment_seconds=segment_seconds
     )
-    
-    # Request transcription
-    audio_url = upload_response.get("audio_url")
-    headers["Content-Type"] = "application/json"
-    data = {
-        "audio_url": audio_url,
-        "diarization": str(os.getenv("DIARIZATION", "")).lower() in ["true", "t", "1", "yes", "y", "oui", "o"]
-    }
-    
-    post_response = make_request(
-        "https://api.gladia.io/v2/transcription/", headers, "POST", data=data
-    )
-    
-    # Poll for results
-    result_url = post_response.get("result_url")
-    if result_url:
-        await poll_transcription_results(result_url, headers)
-
-async def poll_transcription_results(result_url, headers):
-    # Keep checking until transcription is done
-    while True:
-        poll_response = make_request(result_url, headers)
-        status = poll_response.get("status")
-
-        if status == "done":
-            # Get the full transcript
-            transcript = poll_response.get("result", {}).get("transcription", {}).get("full_transcript", "")
-            logger.info("Transcription completed")
-            logger.info(f"\nTranscript:\n{transcript}\n")
-            
-            # Save complete response to file
-            with open("transcriptions/transcript.json", "w") as f:
-                json.dump(poll_response, f, indent=2)
-            break
-            
-        elif status == "error":
-            logger.error("Transcription failed")
-            with open("transcriptions/error.json", "w") as f:
-                json.dump(poll_response, f, indent=2)
-            break
-            
-        else:
-            logger.info(f"Transcription status: {status}")
-            await asyncio.sleep(1)
+    if os.path.exists(list_path):
+        os.remove(list_path)
+    supervisor = FfmpegSupervisor(lambda attempt: record_command, name="recording")
+    recording_task = asyncio.create_task(record_until_meeting_end(supervisor, duration, browser))
+
+    slots = asyncio.Semaphore(SEGMENT_UPLOAD_CONCURRENCY)
+
+    async def transcribe_segment(index, file_path, start):
+        async with slots:
+            logger.info(f"Transcribing segment {index} ({file_path}, starts at {start:.0f}s)")
+            return await handle_transcription(
+                gladia_api_key, file_path, content_type, output_dir=os.path.join(output_dir, "segments", f"{index:03d}")
+            )
+
+    # Start each segment's transcription as soon as ffmpeg lists it as finished
+    segments = []
+    tasks = []
+    recording = True
+    while recording:
+        try:
+            await asyncio.wait_for(asyncio.shield(recording_task), SEGMENT_POLL_SECONDS)
+            recording = False
+        except asyncio.TimeoutError:
+            pass
+        for file_path, start, _ in read_segment_list(list_path)[len(tasks):]:
+            segments.append(start)
+            tasks.append(asyncio.create_task(transcribe_segment(len(tasks), file_path, start)))
+    logger.info(f"Recording completed ({supervisor.health.summary()})")
+    logger.info(f"Waiting for {sum(not task.done() for task in tasks)} of {len(tasks)} segment transcriptions")
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Transcription of segment {index} failed: {str(result)}")
+    merged = merge_transcriptions([
+        (start, None if isinstance(result, Exception) else result) for start, result in zip(segments, results)
+    ])
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "transcript.json"), "w") as f:
+        json.dump(merged, f, indent=2)
+    logger.info(f"Transcription completed ({len(tasks) - len(merged['failed_segments'])}/{len(tasks)} segments)")
+    logger.info(f"\nTranscript:\n{merged['result']['transcription']['full_transcript']}\n")
+    return merged
 
 if __name__ == "__main__":
     click.echo("Starting Google Meet recorder...")
@@ -0,0 +1,191 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import click
+
+# Meeting jobs waiting to be picked up by a scheduler node, and what became of them
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    meet_link TEXT NOT NULL,
+    start_at REAL NOT NULL,
+    duration_minutes REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    node TEXT,
+    claimed_at REAL,
+    heartbeat_at REAL,
+    lobby_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, start_at);
+"""
+
+# pending -> running -> done / failed; pending jobs whose meeting is over before a node is free are missed.
+# A running job whose node stops renewing its claim (see JobQueue.reclaim) goes back to pending, or to
+# failed once its meeting is over.
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+MISSED = "missed"
+
+
+class JobQueue:
+    # Meeting jobs in a SQLite file, shared by every scheduler node that can open it.
+    # Claiming is a conditional update, so two nodes never run the same job. A claim is a lease
+    # the node renews with heartbeat(); one left to lapse by a crashed or restarted node is
+    # taken back with reclaim(). Calls are short and synchronous; the scheduler runs them on a
+    # worker thread, hence one lock per queue.
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        # Queues created before claims were leases
+        if "heartbeat_at" not in {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def add(self, meet_link, start_at, duration_minutes):
+        # Queue a meeting starting at `start_at` (Unix time); returns the job id
+        return self._execute(
+            "INSERT INTO jobs (meet_link, start_at, duration_minutes) VALUES (?, ?, ?)",
+            (meet_link, start_at, duration_minutes)
+        ).lastrowid
+
+    def due(self, before, limit):
+        # Pending jobs starting before `before`, earliest first
+        rows = self._execute(
+            "SELECT * FROM jobs WHERE status = ? AND start_at <= ? ORDER BY start_at LIMIT ?",
+            (PENDING, before, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def next_start(self):
+        # Start time of the earliest pending job, or None
+        row = self._execute("SELECT MIN(start_at) FROM jobs WHERE status = ?", (PENDING,)).fetchone()
+        return row[0]
+
+    def claim(self, job_id, node, now=None):
+        # Take a pending job for this node; False if another node got it first
+        now = time.time() if now is None else now
+        return self._execute(
+            "UPDATE jobs SET status = ?, node = ?, claimed_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, node, now, now, job_id, PENDING)
+        ).rowcount == 1
+
+    def heartbeat(self, job_ids, node, now=None):
+        # Renew this node's claim on the jobs it runs; returns the ids it still holds
+        if not job_ids:
+            return set()
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE node = ? AND status = ? AND id IN ({placeholders})",
+                (time.time() if now is None else now, node, RUNNING, *job_ids)
+            )
+            rows = self._db.execute(
+                f"SELECT id FROM jobs WHERE node = ? AND status = ? AND id IN ({placeholders})", (node, RUNNING, *job_ids)
+            ).fetchall()
+        return {row["id"] for row in rows}
+
+    def reclaim(self, stale_before, now=None, node=None):
+        # Take back running jobs whose claim was last renewed before `stale_before`, or every
+        # running job of `node` when given (a node restarting has lost them). Jobs whose meeting
+        # is still on go back to pending for any node to claim, the others fail.
+        # Returns (requeued, failed).
+        now = time.time() if now is None else now
+        if node is None:
+            condition, params = "status = ? AND COALESCE(heartbeat_at, claimed_at) < ?", (RUNNING, stale_before)
+        else:
+            condition, params = "status = ? AND node = ?", (RUNNING, node)
+        with self._lock:
+            failed = self._db.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, error = 'node ' || node || ' stopped running it' "
+                f"WHERE {condition} AND start_at + duration_minutes * 60 <= ?",
+                (FAILED, now, *params, now)
+            ).rowcount
+            requeued = self._db.execute(
+                f"UPDATE jobs SET status = ?, node = NULL, claimed_at = NULL, heartbeat_at = NULL, lobby_at = NULL "
+                f"WHERE {condition}",
+                (PENDING, *params)
+            ).rowcount
+        return requeued, failed
+
+    def in_lobby(self, job_id, now=None):
+        self._execute("UPDATE jobs SET lobby_at = ? WHERE id = ?", (time.time() if now is None else now, job_id))
+
+    def finish(self, job_id, status, error=None, now=None, node=None):
+        # Record how a job ended; with `node`, only while that node still holds it
+        if node is None:
+            self._execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                (status, time.time() if now is None else now, error, job_id)
+            )
+        else:
+            self._execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND node = ? AND status = ?",
+                (status, time.time() if now is None else now, error, job_id, node, RUNNING)
+            )
+
+    def expire(self, now=None):
+        # Mark pending jobs whose meeting has already ended as missed; returns how many
+        return self._execute(
+            "UPDATE jobs SET status = ? WHERE status = ? AND start_at + duration_minutes * 60 < ?",
+            (MISSED, PENDING, time.time() if now is None else now)
+        ).rowcount
+
+    def jobs(self, status=None):
+        if status is None:
+            rows = self._execute("SELECT * FROM jobs ORDER BY start_at").fetchall()
+        else:
+            rows = self._execute("SELECT * FROM jobs WHERE status = ? ORDER BY start_at", (status,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@click.group()
+@click.option("--db", default=lambda: os.getenv("SCHEDULER_DB", "jobs.db"), help="Job queue file (SCHEDULER_DB)")
+@click.pass_context
+def cli(ctx, db):
+    # Manage the meeting job queue read by the live bot's scheduler mode
+    ctx.obj = JobQueue(db)
+
+
+@cli.command()
+@click.argument("meet_link")
+@click.option("--start", "start", required=True, help="Start time, ISO 8601 (local time unless an offset is given)")
+@click.option("--duration", default=60.0, help="Scheduled length in minutes; the bot stays no longer")
+@click.pass_obj
+def add(queue, meet_link, start, duration):
+    start_at = datetime.datetime.fromisoformat(start).timestamp()
+    click.echo(queue.add(meet_link, start_at, duration))
+
+
+@cli.command("list")
+@click.option("--status", default=None, help="Only jobs in this state")
+@click.pass_obj
+def list_jobs(queue, status):
+    for job in queue.jobs(status):
+        lobby = f"{job['lobby_at'] - job['start_at']:+.0f}s" if job["lobby_at"] else "-"
+        click.echo(
+            f"{job['id']:>6} {datetime.datetime.fromtimestamp(job['start_at']):%Y-%m-%d %H:%M} "
+            f"{job['duration_minutes']:>5.0f}min {job['status']:<8} {job['node'] or '-':<12} lobby {lobby:>6} {job['meet_link']}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
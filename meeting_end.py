@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+from capture import FfmpegCapture
+from recording import build_live_capture_command
+
+logger = logging.getLogger(__name__)
+
+# Leave the meeting as soon as it is over instead of staying for all of DURATION_IN_MINUTES,
+# which then only bounds how long the bot can stay
+MEETING_END_DETECTION = str(os.getenv("MEETING_END_DETECTION", "true")).lower() in ["true", "t", "1", "yes", "y"]
+# How often the meeting page is checked
+MEETING_END_CHECK_SECONDS = float(os.getenv("MEETING_END_CHECK_SECONDS", 5))
+# The bot has been the only participant for this long (0 = never leave for that)
+ALONE_TIMEOUT_SECONDS = float(os.getenv("ALONE_TIMEOUT_SECONDS", 120))
+# Nothing louder than the threshold has been heard for this long (0 = never leave for that)
+SILENCE_TIMEOUT_SECONDS = float(os.getenv("SILENCE_TIMEOUT_SECONDS", 600))
+SILENCE_THRESHOLD_DBFS = float(os.getenv("SILENCE_THRESHOLD_DBFS", -60))
+
+# Text Meet shows once the bot is no longer in the call, and while it is the only one in it
+ENDED_PHRASES = (
+    "You've been removed from the meeting",
+    "You left the meeting",
+    "The call has ended",
+    "ended the meeting for everyone",
+    "Return to home screen",
+)
+ALONE_PHRASES = (
+    "You're the only one here",
+    "No one else is here",
+)
+
+# One round trip to the page: which end-of-call text is shown, whether Meet says the bot is
+# alone, and how many distinct participant tiles there are (0 when none could be found)
+MEETING_STATE_SCRIPT = """
+const text = document.body ? document.body.innerText : "";
+const participants = new Set();
+document.querySelectorAll("[data-participant-id]").forEach(e => participants.add(e.getAttribute("data-participant-id")));
+return {
+    ended: arguments[0].find(phrase => text.includes(phrase)) || null,
+    alone: arguments[1].some(phrase => text.includes(phrase)),
+    participants: participants.size
+};
+"""
+
+# The prerecorded bot listens for silence on its own low-rate capture of the meeting audio
+SILENCE_MONITOR_SAMPLE_RATE = 8000
+SILENCE_MONITOR_CHUNK_SECONDS = 0.5
+
+
+class SilenceTracker:
+    # Notes when meeting audio was last louder than the threshold, from mono s16le chunks
+    def __init__(self, threshold_dbfs=SILENCE_THRESHOLD_DBFS):
+        # Mean square of a full scale signal at the threshold, to compare without a log per chunk
+        self.threshold_power = (32768.0 * 10 ** (threshold_dbfs / 20)) ** 2
+        self.last_sound_at = time.monotonic()
+
+    def observe(self, chunk):
+        samples = np.frombuffer(chunk, dtype="<i2", count=len(chunk) // 2).astype(np.float32)
+        if len(samples) and float(np.mean(samples * samples)) > self.threshold_power:
+            self.last_sound_at = time.monotonic()
+
+    @property
+    def silent_for(self):
+        return time.monotonic() - self.last_sound_at
+
+
+async def monitor_silence(source, tracker):
+    # Feed the tracker from a low-rate supervised capture of the source, until cancelled
+    bytes_per_second = SILENCE_MONITOR_SAMPLE_RATE * 2
+    capture = FfmpegCapture(
+        lambda attempt: build_live_capture_command(source, SILENCE_MONITOR_SAMPLE_RATE),
+        f"silence monitor {source}", bytes_per_second, 2
+    )
+    stream = await capture.start()
+    chunk_size = int(bytes_per_second * SILENCE_MONITOR_CHUNK_SECONDS)
+    try:
+        while True:
+            try:
+                tracker.observe(await stream.readexactly(chunk_size))
+            except asyncio.IncompleteReadError:
+                return
+    finally:
+        await capture.stop()
+
+
+class MeetingEndDetector:
+    # Decides when the meeting is over, from the meeting page and the meeting audio.
+    #
+    # The meeting is over when Meet shows an end-of-call page (the bot was removed, the call
+    # ended), when the bot has been the only participant for `alone_seconds`, or when the
+    # silence tracker has heard nothing for `silence_seconds`. Without a browser only the
+    # audio is used; when detection is disabled only the duration limit applies.
+
+    def __init__(self, browser=None, silence=None, alone_seconds=ALONE_TIMEOUT_SECONDS,
+                 silence_seconds=SILENCE_TIMEOUT_SECONDS, check_seconds=MEETING_END_CHECK_SECONDS,
+                 enabled=MEETING_END_DETECTION):
+        self.browser = browser if enabled else None
+        self.silence = silence if enabled and silence_seconds else None
+        self.alone_seconds = alone_seconds
+        self.silence_seconds = silence_seconds
+        self.check_seconds = check_seconds
+        self.alone_since = None
+
+    async def check(self):
+        # Why the meeting is over, or None while it is still going on
+        if self.silence is not None and self.silence.silent_for >= self.silence_seconds:
+            return f"no sound for {self.silence.silent_for:.0f}s"
+        if self.browser is None:
+            return None
+        try:
+            state = await self.browser.execute_script(MEETING_STATE_SCRIPT, list(ENDED_PHRASES), list(ALONE_PHRASES))
+        except Exception as e:
+            logger.warning(f"Could not check the meeting page: {str(e)}")
+            return None
+        if state["ended"]:
+            return f"meeting page shows \"{state['ended']}\""
+        if self.alone_seconds and (state["alone"] or state["participants"] == 1):
+            now = time.monotonic()
+            if self.alone_since is None:
+                self.alone_since = now
+                logger.info("The bot is alone in the meeting")
+            if now - self.alone_since >= self.alone_seconds:
+                return f"alone in the meeting for {now - self.alone_since:.0f}s"
+        else:
+            self.alone_since = None
+        return None
+
+    async def wait(self, duration):
+        # Wait until the meeting is over, or `duration` seconds at most; returns why it stopped
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return f"duration limit of {duration / 60:.0f} minutes reached"
+            await asyncio.sleep(min(self.check_seconds, remaining))
+            if self.browser is None and self.silence is None:
+                continue
+            reason = await self.check()
+            if reason:
+                return reason
+
+    async def wait_or_finish(self, task, duration):
+        # Wait until the meeting is over or `task` finishes on its own; returns why the
+        # meeting is over, or None if the task finished first
+        waiter = asyncio.create_task(self.wait(duration))
+        try:
+            done, _ = await asyncio.wait((task, waiter), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        return None if task in done else waiter.result()
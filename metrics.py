@@ -0,0 +1,155 @@
+import bisect
+import collections
+import logging
+import os
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Metrics are served in the Prometheus text format when METRICS_PORT is set
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_PATH = "/metrics"
+
+# Histogram bucket upper bounds, in seconds
+SEND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+ROUND_TRIP_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRANSCRIPT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0)
+
+
+class Histogram:
+    # Fixed-bucket histogram; observing a value is a bisect and three additions
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class LiveMetrics:
+    # Metrics of one live transcription session.
+    # Everything is a plain attribute updated in place from the event loop thread, so the
+    # hot path pays no locking or formatting; text is only produced when scraped.
+
+    def __init__(self):
+        self.audio_bytes_sent = 0
+        self.audio_chunks_sent = 0
+        self.send_seconds = Histogram(SEND_BUCKETS)
+        self.capture_lag_seconds = 0.0
+        self.ack_round_trip_seconds = Histogram(ROUND_TRIP_BUCKETS)
+        self.partial_to_final_seconds = Histogram(TRANSCRIPT_BUCKETS)
+        self.messages = collections.Counter()
+        self.ffmpeg_restarts = 0
+        self.reconnects = 0
+
+
+# (name, type, help, attribute of LiveMetrics)
+METRICS = (
+    ("gmeet_audio_bytes_sent_total", "counter", "Audio bytes sent to Gladia", "audio_bytes_sent"),
+    ("gmeet_audio_chunks_sent_total", "counter", "Audio chunks sent to Gladia", "audio_chunks_sent"),
+    ("gmeet_audio_send_seconds", "histogram", "Time taken to hand one audio chunk to the websocket", "send_seconds"),
+    ("gmeet_audio_capture_lag_seconds", "gauge", "Time between a chunk being captured and sent", "capture_lag_seconds"),
+    ("gmeet_websocket_ack_round_trip_seconds", "histogram",
+     "Time between sending audio and Gladia acknowledging it", "ack_round_trip_seconds"),
+    ("gmeet_transcript_partial_to_final_seconds", "histogram",
+     "Time between the first partial and the final transcript of an utterance", "partial_to_final_seconds"),
+    ("gmeet_messages_total", "counter", "Live messages handled, by type", "messages"),
+    ("gmeet_ffmpeg_restarts_total", "counter", "Audio capture restarts", "ffmpeg_restarts"),
+    ("gmeet_websocket_reconnects_total", "counter", "Live websocket reconnections", "reconnects"),
+)
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    # Metrics of every live session in this process, keyed by session name
+    def __init__(self):
+        self.sessions = {}
+
+    def session(self, name):
+        # Metrics for a session, created on first use
+        if name not in self.sessions:
+            self.sessions[name] = LiveMetrics()
+        return self.sessions[name]
+
+    def close_session(self, name):
+        # Stop exposing a session that has ended, so finished sessions do not pile up
+        self.sessions.pop(name, None)
+
+    def render(self):
+        # All metrics in the Prometheus text exposition format
+        lines = []
+        for name, kind, help_text, attribute in METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for session, metrics in self.sessions.items():
+                value = getattr(metrics, attribute)
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(session=session, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(session=session)} {value.sum}")
+                    lines.append(f"{name}_count{_labels(session=session)} {value.count}")
+                elif isinstance(value, collections.Counter):
+                    for label, count in sorted(value.items()):
+                        lines.append(f"{name}{_labels(session=session, type=label)} {count}")
+                else:
+                    lines.append(f"{name}{_labels(session=session)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def session_metrics(name):
+    # Metrics to record for a live session, or None when metrics are not served
+    return registry.session(name) if METRICS_PORT else None
+
+
+def close_session_metrics(name):
+    registry.close_session(name)
+
+
+class MetricsServer:
+    # HTTP endpoint serving the registry for Prometheus to scrape
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT, path=METRICS_PATH):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(self.path, self._handle_scrape)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_scrape(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server():
+    # Start serving metrics when METRICS_PORT is set; returns the server to stop, or None
+    if not METRICS_PORT:
+        return None
+    server = MetricsServer(registry)
+    await server.start()
+    return server
@@ -0,0 +1,117 @@
+import csv
+import os
+
+# Where the bot's audio ends up and what the recording reads from by default
+PULSE_AUDIO_SOURCE = "MicOutput.monitor"
+PULSE_AUDIO_INPUT = f"-f pulse -i {PULSE_AUDIO_SOURCE}"
+X11_VIDEO_INPUT = "-video_size 1920x1080 -framerate {fps} -f x11grab -i :99"
+
+# Speech is transcribed at 16 kHz mono, anything above that is only upload weight
+SPEECH_SAMPLE_RATE = 16000
+
+# Supported recording modes:
+#   audio: speech codec only, the default since transcription only needs the audio
+#   video: audio plus low frame rate, downscaled video for reference
+#   full:  1080p30 H.264 video with AAC audio, as originally recorded
+RECORDING_MODES = ("audio", "video", "full")
+
+# Audio codec: (ffmpeg arguments, file extension, content type)
+AUDIO_CODECS = {
+    "opus": (f"-c:a libopus -b:a 24k -application voip -ac 1 -ar {SPEECH_SAMPLE_RATE}", "ogg", "audio/ogg"),
+    "flac": (f"-c:a flac -ac 1 -ar {SPEECH_SAMPLE_RATE}", "flac", "audio/flac"),
+}
+
+# Written by ffmpeg next to segmented recordings, one "name,start,end" line per finished segment
+SEGMENT_LIST_NAME = "segments.csv"
+
+
+def build_record_command(mode, duration, output_dir="recordings", audio_codec="opus", video_fps=5,
+                         audio_input=PULSE_AUDIO_INPUT, video_input=X11_VIDEO_INPUT, segment_seconds=None):
+    # Build the ffmpeg command for a recording mode.
+    # Returns the command, the path it records to and the content type of that file.
+    # With segment_seconds the recording is split into numbered segments instead, the
+    # returned path is the segment list (see read_segment_list) and ffmpeg appends a line
+    # to it each time a segment is complete.
+    if mode == "audio":
+        if audio_codec not in AUDIO_CODECS:
+            raise ValueError(f"Unknown audio codec: {audio_codec} (expected one of {', '.join(AUDIO_CODECS)})")
+        codec_args, extension, content_type = AUDIO_CODECS[audio_codec]
+        command = f"ffmpeg -y {audio_input} -t {duration} -vn {codec_args}"
+    elif mode == "video":
+        extension = "mp4"
+        content_type = "video/mp4"
+        command = (
+            f"ffmpeg -y {video_input.format(fps=video_fps)} {audio_input} -t {duration} "
+            f"-vf scale=-2:720 -c:v libx264 -preset veryfast -tune stillimage -pix_fmt yuv420p "
+            f"-c:a aac -b:a 48k -ac 1 -ar {SPEECH_SAMPLE_RATE}"
+        )
+    elif mode == "full":
+        extension = "mp4"
+        content_type = "video/mp4"
+        command = (
+            f"ffmpeg -y {video_input.format(fps=30)} {audio_input} -t {duration} "
+            f"-c:v libx264 -pix_fmt yuv420p -c:a aac -strict experimental"
+        )
+    else:
+        raise ValueError(f"Unknown recording mode: {mode} (expected one of {', '.join(RECORDING_MODES)})")
+
+    if not segment_seconds:
+        output_path = os.path.join(output_dir, f"output.{extension}")
+        return f"{command} {output_path}", output_path, content_type
+
+    output_path = os.path.join(output_dir, SEGMENT_LIST_NAME)
+    if extension == "mp4":
+        # Video can only be cut on a keyframe, so force one at every segment boundary
+        command += f" -force_key_frames 'expr:gte(t,n_forced*{segment_seconds})'"
+    command += (
+        f" -f segment -segment_time {segment_seconds} -reset_timestamps 1"
+        f" -segment_list {output_path} -segment_list_type csv"
+        f" {os.path.join(output_dir, f'segment-%03d.{extension}')}"
+    )
+    return command, output_path, content_type
+
+
+def read_segment_list(list_path):
+    # Segments ffmpeg has finished writing, as (path, start, end) with times in seconds
+    # from the start of the recording. A line still being written is left for next time.
+    try:
+        with open(list_path) as f:
+            lines = f.read().split("\n")[:-1]
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name, start, end in csv.reader(lines):
+        segments.append((os.path.join(os.path.dirname(list_path), name), float(start), float(end)))
+    return segments
+
+
+def audio_recording_output(audio_codec, output_dir="recordings"):
+    # Path and content type of an audio-only recording with the given codec
+    if audio_codec not in AUDIO_CODECS:
+        raise ValueError(f"Unknown audio codec: {audio_codec} (expected one of {', '.join(AUDIO_CODECS)})")
+    _, extension, content_type = AUDIO_CODECS[audio_codec]
+    return os.path.join(output_dir, f"output.{extension}"), content_type
+
+
+def recording_part_path(path, part):
+    # Path of a later part of a recording whose capture was restarted: output.ogg, output.part1.ogg, ...
+    if part == 0:
+        return path
+    base, extension = os.path.splitext(path)
+    return f"{base}.part{part}{extension}"
+
+
+def build_live_capture_command(source, sample_rate, record_path=None, audio_codec="opus"):
+    # ffmpeg command writing mono s16le PCM to stdout for live streaming.
+    # With record_path the audio is decoded and resampled once, then split between the
+    # live stream and a compact recording on disk.
+    pcm_output = "-f s16le -acodec pcm_s16le -"
+    if record_path is None:
+        return f"ffmpeg -y -f pulse -i {source} -ac 1 -ar {sample_rate} {pcm_output}"
+    codec_args = AUDIO_CODECS[audio_codec][0]
+    return (
+        f"ffmpeg -y -f pulse -i {source} "
+        f"-filter_complex '[0:a]aformat=sample_fmts=s16:sample_rates={sample_rate}:channel_layouts=mono,asplit=2[live][rec]' "
+        f"-map '[live]' {pcm_output} "
+        f"-map '[rec]' {codec_args} {record_path}"
+    )
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+
+from jobs import DONE, FAILED
+
+logger = logging.getLogger(__name__)
+
+# Name this node claims jobs under
+NODE_NAME = os.getenv("NODE_NAME", socket.gethostname())
+# Meetings run at once on this node, counting those still in the lobby
+NODE_CAPACITY = int(os.getenv("NODE_CAPACITY", os.getenv("MAX_CONCURRENT_SESSIONS", 4)))
+# Sessions (tab, audio sink) kept ready ahead of the next jobs
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", 1))
+# How long before a meeting's start the bot starts joining it, to be in the lobby at start time
+JOIN_LEAD_SECONDS = float(os.getenv("JOIN_LEAD_SECONDS", 45))
+# How often the queue is checked for due jobs
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", 2))
+# Running jobs' claims are renewed every poll; one not renewed for this long is taken back by any node
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+
+
+class WarmPool:
+    # Sessions prepared ahead of time, so a job only has to open its meeting.
+    #
+    # prepare() is a coroutine creating one session and release(session) one disposing of it.
+    # refill(limit) tops the pool up to `size` ready sessions in the background, never holding
+    # more than `limit` (the free capacity) ready or being prepared. take() hands out a ready
+    # session, or prepares one on the spot when the pool is empty (a cold start).
+
+    def __init__(self, prepare, release, size=WARM_POOL_SIZE):
+        self.prepare = prepare
+        self.release = release
+        self.size = size
+        self.ready = []
+        self.preparing = set()
+        self.warm_takes = 0
+        self.cold_takes = 0
+
+    def refill(self, limit):
+        while len(self.ready) + len(self.preparing) < min(self.size, limit):
+            task = asyncio.create_task(self._prepare_one())
+            self.preparing.add(task)
+            task.add_done_callback(self.preparing.discard)
+
+    async def _prepare_one(self):
+        try:
+            self.ready.append(await self.prepare())
+        except Exception as e:
+            logger.error(f"Failed to prepare a warm session: {str(e)}")
+
+    async def take(self):
+        if self.ready:
+            self.warm_takes += 1
+            return self.ready.pop(0)
+        self.cold_takes += 1
+        return await self.prepare()
+
+    async def close(self):
+        for task in list(self.preparing):
+            task.cancel()
+        await asyncio.gather(*self.preparing, return_exceptions=True)
+        for session in self.ready:
+            await self.release(session)
+        self.ready = []
+
+
+class Scheduler:
+    # Runs meeting jobs from a JobQueue on this node.
+    #
+    # Every poll, jobs starting within `lead_seconds` are claimed while fewer than `capacity`
+    # run here, and each is handed a session from the warm pool and run with
+    # run_job(job, session, in_lobby): it should join the meeting, await in_lobby() once it has
+    # asked to join, transcribe, and release the session. The pool is kept topped up with the
+    # capacity left. `clock` gives Unix time, replaceable to run the scheduler on simulated time.
+    #
+    # Each poll also renews the claims on the jobs running here, stops any job whose claim
+    # another node has taken back meanwhile, and takes back jobs whose node has not renewed
+    # its claim for `lease_seconds`. On startup, jobs this node was running before a
+    # crash or restart are taken back right away.
+
+    def __init__(self, queue, pool, run_job, capacity=NODE_CAPACITY, lead_seconds=JOIN_LEAD_SECONDS,
+                 poll_seconds=SCHEDULER_POLL_SECONDS, node=NODE_NAME, clock=time.time,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.queue = queue
+        self.pool = pool
+        self.run_job = run_job
+        self.capacity = capacity
+        self.lead_seconds = lead_seconds
+        self.poll_seconds = poll_seconds
+        self.node = node
+        self.clock = clock
+        self.lease_seconds = lease_seconds
+        # Tasks of the jobs running here, by job id
+        self.running = {}
+
+    async def run(self, until=None):
+        # Schedule jobs until cancelled, or until `until` (Unix time) once nothing runs
+        requeued, failed = await asyncio.to_thread(self.queue.reclaim, None, self.clock(), self.node)
+        if requeued or failed:
+            logger.warning(f"Took back {requeued + failed} jobs left running by this node ({failed} too late to rerun)")
+        try:
+            while until is None or self.clock() < until or self.running:
+                await self.poll()
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+            await self.pool.close()
+
+    async def poll(self):
+        now = self.clock()
+        if self.running:
+            held = await asyncio.to_thread(self.queue.heartbeat, list(self.running), self.node, now)
+            for job_id in set(self.running) - held:
+                logger.error(f"Job {job_id} was taken back from this node, stopping it")
+                self.running[job_id].cancel()
+        requeued, failed = await asyncio.to_thread(self.queue.reclaim, now - self.lease_seconds, now)
+        if requeued or failed:
+            logger.warning(f"Took back {requeued + failed} jobs from unresponsive nodes ({failed} too late to rerun)")
+        missed = await asyncio.to_thread(self.queue.expire, now)
+        if missed:
+            logger.warning(f"{missed} meetings ended before a node could take them")
+        free = self.capacity - len(self.running)
+        if free > 0:
+            for job in await asyncio.to_thread(self.queue.due, now + self.lead_seconds, free):
+                if await asyncio.to_thread(self.queue.claim, job["id"], self.node, now):
+                    task = asyncio.create_task(self._run(job))
+                    self.running[job["id"]] = task
+                    task.add_done_callback(lambda _, job_id=job["id"]: self.running.pop(job_id, None))
+        self.pool.refill(self.capacity - len(self.running))
+
+    async def _run(self, job):
+        logger.info(f"Starting job {job['id']} for {job['meet_link']} ({job['start_at'] - self.clock():.0f}s before it starts)")
+
+        async def in_lobby():
+            lobby_at = self.clock()
+            await asyncio.to_thread(self.queue.in_lobby, job["id"], lobby_at)
+            logger.info(f"Job {job['id']} in the lobby {lobby_at - job['start_at']:+.0f}s from its start")
+
+        try:
+            session = await self.pool.take()
+            await self.run_job(job, session, in_lobby)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            status, error = FAILED, str(e)
+        else:
+            status, error = DONE, None
+        # No longer renewed, so the job leaving the running state is not taken for a lost claim
+        self.running.pop(job["id"], None)
+        await asyncio.to_thread(self.queue.finish, job["id"], status, error, self.clock(), self.node)
@@ -0,0 +1,371 @@
+import asyncio
+import base64
+import json
+import logging
+import random
+import time
+from collections import deque
+
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from message_router import loads
+
+logger = logging.getLogger(__name__)
+
+# Raw PCM coming out of the capture is signed 16-bit little endian, mono
+BYTES_PER_SAMPLE = 2
+
+# How often the streamer logs its queue depth and lag
+STATS_INTERVAL_SECONDS = 60
+
+# Backoff between reconnection attempts to the live websocket
+RECONNECT_INITIAL_DELAY = 0.5
+RECONNECT_MAX_DELAY = 15
+
+
+def chunk_size_for(sample_rate, chunk_duration_ms):
+    # Number of bytes in one chunk of mono s16le audio
+    return int(sample_rate * chunk_duration_ms / 1000) * BYTES_PER_SAMPLE
+
+
+# Supported ways of sending audio over the live websocket
+TRANSPORT_BINARY = "binary"
+TRANSPORT_JSON = "json"
+TRANSPORTS = (TRANSPORT_BINARY, TRANSPORT_JSON)
+
+
+def encode_audio_chunk(chunk):
+    # Wrap a raw PCM chunk in the JSON message expected by Gladia
+    data = base64.b64encode(chunk).decode("utf-8")
+    return json.dumps({"type": "audio_chunk", "data": {"chunk": data}})
+
+
+def encode_binary_chunk(chunk):
+    # Raw PCM goes out unchanged as a binary frame, no copy and no encoding
+    return chunk
+
+
+def audio_encoder_for(transport):
+    # Pick the frame encoder for the configured transport
+    if transport == TRANSPORT_BINARY:
+        return encode_binary_chunk
+    if transport == TRANSPORT_JSON:
+        return encode_audio_chunk
+    raise ValueError(f"Unknown audio transport: {transport} (expected one of {', '.join(TRANSPORTS)})")
+
+
+class AudioStreamer:
+    # Streams raw PCM from a capture pipe to a websocket, paced against a monotonic clock.
+    #
+    # Reading and sending run as separate tasks so the capture pipe is always drained.
+    # Each chunk is sent when its slot on the audio clock is due; when the sender falls
+    # behind real time it sends the backlog back to back until it has caught up.
+    # The queue between the two is bounded, so a sender that cannot keep up at all
+    # eventually pushes back on the capture instead of growing memory without limit.
+    #
+    # With the binary transport the bytes read from the pipe are handed to the websocket
+    # as they are; the JSON transport base64-encodes them into a text message instead.
+    # An optional gate (see vad.SpeechGate) decides which captured chunks are sent at all,
+    # optional metrics (see metrics.LiveMetrics) record what was sent and how fast, and an
+    # optional silence tracker (see meeting_end.SilenceTracker) sees every captured chunk.
+
+    def __init__(self, websocket, sample_rate, chunk_duration_ms=100, max_queue_seconds=60,
+                 transport=TRANSPORT_BINARY, gate=None, metrics=None, silence=None):
+        self.websocket = websocket
+        # A LiveConnection also wants the raw chunk, to keep it for replay after a reconnect
+        self._send_audio = getattr(websocket, "send_audio", None)
+        self.transport = transport
+        self.encode = audio_encoder_for(transport)
+        self.gate = gate
+        self.metrics = metrics
+        self.silence = silence
+        self.chunk_duration = chunk_duration_ms / 1000
+        self.chunk_size = chunk_size_for(sample_rate, chunk_duration_ms)
+        self.queue = asyncio.Queue(maxsize=max(1, int(max_queue_seconds / self.chunk_duration)))
+        self.started_at = None
+        # Captured chunks taken off the queue, which drive the audio clock
+        self.chunks_handled = 0
+        self.chunks_sent = 0
+        self.bytes_sent = 0
+        self.capture_lag = 0.0
+        self._last_stats_at = 0.0
+
+    @property
+    def queue_depth(self):
+        # Number of captured chunks waiting to be sent
+        return self.queue.qsize()
+
+    @property
+    def lag(self):
+        # How far the sender is behind real time, in seconds of audio
+        if self.started_at is None:
+            return 0.0
+        audio_time = self.chunks_handled * self.chunk_duration
+        return max(0.0, time.monotonic() - self.started_at - audio_time)
+
+    async def read_from(self, stream):
+        # Read fixed-size chunks from the capture stream into the send queue
+        try:
+            while True:
+                try:
+                    chunk = await stream.readexactly(self.chunk_size)
+                except asyncio.IncompleteReadError as e:
+                    chunk = e.partial
+                if not chunk:
+                    break
+                await self.queue.put((time.monotonic(), chunk))
+                if len(chunk) < self.chunk_size:
+                    break
+        except Exception as e:
+            logger.error(f"Error reading audio capture: {str(e)}")
+        await self.queue.put(None)
+
+    async def send_loop(self):
+        # Send queued chunks, sleeping only when ahead of the audio clock
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            captured_at, chunk = item
+
+            now = time.monotonic()
+            if self.started_at is None:
+                self.started_at = now
+            due = self.started_at + self.chunks_handled * self.chunk_duration
+            if due > now:
+                await asyncio.sleep(due - now)
+
+            if self.silence is not None:
+                self.silence.observe(chunk)
+            for outgoing in (self.gate.process(chunk) if self.gate else (chunk,)):
+                await self.send_chunk(outgoing)
+            self.chunks_handled += 1
+            self.capture_lag = time.monotonic() - captured_at
+            if self.metrics is not None:
+                self.metrics.capture_lag_seconds = self.capture_lag
+            self._log_stats()
+
+    async def send_chunk(self, chunk):
+        # Encode one chunk for the configured transport and send it
+        started_at = time.monotonic()
+        if self._send_audio is not None:
+            await self._send_audio(chunk, self.encode(chunk))
+        else:
+            await self.websocket.send(self.encode(chunk))
+        self.chunks_sent += 1
+        self.bytes_sent += len(chunk)
+        if self.metrics is not None:
+            self.metrics.send_seconds.observe(time.monotonic() - started_at)
+            self.metrics.audio_chunks_sent += 1
+            self.metrics.audio_bytes_sent += len(chunk)
+
+    async def run(self, stream):
+        # Stream until the capture ends or the task is cancelled
+        reader = asyncio.create_task(self.read_from(stream))
+        try:
+            await self.send_loop()
+        finally:
+            reader.cancel()
+
+    def _log_stats(self):
+        now = time.monotonic()
+        if now - self._last_stats_at < STATS_INTERVAL_SECONDS:
+            return
+        self._last_stats_at = now
+        logger.info(
+            f"Audio streaming: {self.chunks_sent} chunks sent, queue depth {self.queue_depth}, "
+            f"lag {self.lag:.2f}s, capture-to-send {self.capture_lag * 1000:.0f}ms"
+        )
+
+
+class ReplayBuffer:
+    # Bounded buffer of sent audio frames, kept until Gladia acknowledges them.
+    #
+    # Frames are indexed by the byte offset of their audio in the stream, which is what
+    # Gladia's acknowledgments report. Acknowledged frames are released right away; if
+    # acknowledgments stop coming (e.g. during an outage) the oldest frames are dropped
+    # once `max_bytes` is reached, so memory stays capped however long the outage lasts.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.frames = deque()  # (audio offset, audio length, frame)
+        self.size = 0
+        self.end_offset = 0
+        self.acknowledged_offset = 0
+        self.dropped_bytes = 0
+
+    def append(self, audio_length, frame):
+        self.frames.append((self.end_offset, audio_length, frame))
+        self.end_offset += audio_length
+        self.size += len(frame)
+        while self.size > self.max_bytes and len(self.frames) > 1:
+            offset, length, dropped = self.frames.popleft()
+            self.size -= len(dropped)
+            self.dropped_bytes += max(0, offset + length - max(offset, self.acknowledged_offset))
+
+    def acknowledge(self, offset):
+        # Release every frame whose audio ends at or before `offset`
+        self.acknowledged_offset = max(self.acknowledged_offset, offset)
+        while self.frames and self.frames[0][0] + self.frames[0][1] <= self.acknowledged_offset:
+            self.size -= len(self.frames.popleft()[2])
+
+    def frames_after(self, offset):
+        # Frames holding audio past `offset`, oldest first
+        return [frame for frame in self.frames if frame[0] + frame[1] > offset]
+
+
+class LiveConnection:
+    # Websocket to a Gladia live session that survives dropped connections.
+    #
+    # Audio sent through send_audio() is kept in a ReplayBuffer until acknowledged. When the
+    # connection drops, audio keeps being buffered while a background task reconnects with
+    # backoff: first to the same session URL, and through `open_session` (a coroutine
+    # returning a fresh session URL) when that session is gone. Once connected again the
+    # unacknowledged audio is replayed before live audio resumes. Iterating over the
+    # connection yields incoming messages across reconnections.
+    # With metrics, acknowledgments are timed against when the audio they cover was sent.
+
+    def __init__(self, open_session, replay_buffer, bytes_per_second, metrics=None):
+        self.open_session = open_session
+        self.buffer = replay_buffer
+        self.bytes_per_second = bytes_per_second
+        self.metrics = metrics
+        # (audio end offset, send time) of frames not yet acknowledged, when timing them
+        self._send_times = deque()
+        self.url = None
+        self.reconnects = 0
+        # Audio offset at which the current Gladia session started, when it is not the first one
+        self.session_base_offset = 0
+        self._websocket = None
+        self._connected = asyncio.Event()
+        self._reconnect_task = None
+        self._stopping = False
+        self._closed = False
+
+    @property
+    def session_time_offset(self):
+        # Seconds to add to the current session's timestamps to get meeting time
+        return self.session_base_offset / self.bytes_per_second
+
+    async def connect(self):
+        # Open the first session and connect to it
+        self.url = await self.open_session()
+        await self._establish(new_session=True)
+
+    async def send_audio(self, chunk, frame):
+        self.buffer.append(len(chunk), frame)
+        if self.metrics is not None:
+            self._send_times.append((self.buffer.end_offset, time.monotonic()))
+        websocket = self._websocket if self._connected.is_set() else None
+        if websocket is None:
+            return
+        try:
+            await websocket.send(frame)
+        except ConnectionClosed:
+            self._connection_lost(websocket)
+
+    async def send(self, message):
+        # Send a control message, waiting for the connection if it is down
+        await self._connected.wait()
+        await self._websocket.send(message)
+
+    async def stop(self):
+        # Ask Gladia to finish the session; the closing that follows is not a drop
+        self._stopping = True
+        await self.send(json.dumps({"type": "stop_recording"}))
+
+    async def close(self):
+        self._closed = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._websocket is not None:
+            await self._websocket.close()
+        self._connected.set()
+
+    async def __aiter__(self):
+        while True:
+            await self._connected.wait()
+            websocket = self._websocket
+            if self._closed or websocket is None:
+                return
+            try:
+                async for message in websocket:
+                    if isinstance(message, str) and '"audio_chunk"' in message:
+                        self._handle_acknowledgment(message)
+                    yield message
+            except ConnectionClosed:
+                pass
+            if self._stopping or self._closed:
+                return
+            self._connection_lost(websocket)
+
+    def _handle_acknowledgment(self, message):
+        # Decoded in full: with orjson that takes less time than reading the type, "acknowledged"
+        # and "byte_range" out of the raw message in Python (see benchmarks/message_dispatch.py)
+        content = loads(message)
+        if content.get("type") == "audio_chunk" and content.get("acknowledged"):
+            byte_range = content.get("data", {}).get("byte_range")
+            if byte_range:
+                offset = self.session_base_offset + byte_range[1]
+                self.buffer.acknowledge(offset)
+                if self.metrics is not None:
+                    self._observe_round_trip(offset)
+
+    def _observe_round_trip(self, offset):
+        sent_at = None
+        while self._send_times and self._send_times[0][0] <= offset:
+            sent_at = self._send_times.popleft()[1]
+        if sent_at is not None:
+            self.metrics.ack_round_trip_seconds.observe(time.monotonic() - sent_at)
+
+    def _connection_lost(self, websocket):
+        if websocket is not self._websocket or self._closed:
+            return
+        logger.warning("Live transcription connection lost, reconnecting")
+        self._connected.clear()
+        self._websocket = None
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = RECONNECT_INITIAL_DELAY
+        new_session = False
+        while not self._closed:
+            try:
+                if new_session:
+                    self.url = await self.open_session()
+                await self._establish(new_session)
+                self.reconnects += 1
+                if self.metrics is not None:
+                    self.metrics.reconnects += 1
+                logger.info(
+                    f"Live transcription reconnected ({'new' if new_session else 'same'} session), "
+                    f"{self.buffer.dropped_bytes / self.bytes_per_second:.1f}s of audio lost so far"
+                )
+                return
+            except InvalidHandshake as e:
+                # The session URL is no longer accepted, start a new session
+                logger.warning(f"Live session rejected reconnection ({str(e)}), opening a new one")
+                new_session = True
+            except Exception as e:
+                logger.warning(f"Reconnection failed: {str(e)}")
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _establish(self, new_session):
+        # Connect, replay unacknowledged audio, then let live audio through
+        websocket = await websockets.connect(self.url)
+        offset = self.buffer.acknowledged_offset
+        if new_session:
+            pending = self.buffer.frames_after(offset)
+            self.session_base_offset = pending[0][0] if pending else self.buffer.end_offset
+        while True:
+            pending = self.buffer.frames_after(offset)
+            if not pending:
+                break
+            for frame_offset, length, frame in pending:
+                await websocket.send(frame)
+                offset = frame_offset + length
+        self._websocket = websocket
+        self._connected.set()
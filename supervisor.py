@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import random
+import subprocess
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Keep only warnings and errors on stderr, and replace the carriage-return stats line with
+# key=value progress blocks
+SUPERVISED_ARGS = "-hide_banner -loglevel warning -nostats -progress pipe:2"
+
+# A supervised ffmpeg producing no output for this long is considered hung
+STALL_SECONDS = float(os.getenv("FFMPEG_STALL_SECONDS", 5))
+
+# Backoff between restarts of a capture that keeps failing; the first restart is immediate
+RESTART_MAX_DELAY = 10
+# Restarts this far apart are not counted as a crash loop
+RESTART_RESET_SECONDS = 60
+
+# Silence inserted for the time a capture was down is capped at this many seconds
+MAX_GAP_FILL_SECONDS = 30
+
+STDOUT_READ_SIZE = 64 * 1024
+
+
+def supervised_command(command):
+    # Add the logging and progress options to an ffmpeg command line, and have the shell
+    # exec it so signals reach ffmpeg itself rather than the shell
+    if command.startswith("ffmpeg "):
+        command = f"ffmpeg {SUPERVISED_ARGS} {command[len('ffmpeg '):]}"
+    return f"exec {command}"
+
+
+class FfmpegHealth:
+    # What is known about a supervised ffmpeg, updated as its output and stderr are read
+    def __init__(self):
+        self.progress = {}  # last complete -progress block: out_time_us, total_size, speed, ...
+        self.progress_at = None
+        self.last_output_at = None
+        self.bytes_out = 0
+        self.restarts = 0
+        self.stalls = 0
+        self.exit_codes = []
+        self.messages = deque(maxlen=20)  # recent warnings and errors from stderr
+
+    def note_progress(self, block, now):
+        # Progress counts as output when the encoded position has moved on
+        if block.get("out_time_us") != self.progress.get("out_time_us") or block.get("total_size") != self.progress.get("total_size"):
+            self.last_output_at = now
+        self.progress = block
+        self.progress_at = now
+
+    def summary(self):
+        # One line such as "speed 1x, 00:01:00.000000 encoded, 1.9 MB out, 0 restarts, 0 stalls"
+        parts = []
+        if self.progress:
+            parts.append(f"speed {self.progress.get('speed', '?').strip()}")
+            parts.append(f"{self.progress.get('out_time', '?')} encoded")
+        parts.append(f"{self.bytes_out / 1e6:.1f} MB out")
+        parts.append(f"{self.restarts} restarts, {self.stalls} stalls")
+        if self.messages:
+            parts.append(f"last message: {self.messages[-1]}")
+        return ", ".join(parts)
+
+
+class FfmpegSupervisor:
+    # Runs an ffmpeg command and keeps an eye on it.
+    #
+    # stderr is drained continuously, so a chatty ffmpeg can never fill the pipe and block,
+    # and its -progress output is parsed into `health`. A watchdog kills the process when
+    # no output has been seen for `stall_seconds`: stdout bytes when `stdout` is set,
+    # otherwise progress of the encoded position.
+    #
+    # With `restart`, a capture that stalls or exits is started again right away (backing
+    # off if it keeps failing) using `command_for(attempt)`, and its stdout is spliced into
+    # one continuous `output` stream. The time it was down is filled with silence, so
+    # positions in the stream stay in meeting time, and the stream is kept aligned to
+    # `frame_bytes` so a sample is never split across restarts.
+
+    def __init__(self, command_for, name="ffmpeg", stdout=False, restart=False, stall_seconds=STALL_SECONDS,
+                 bytes_per_second=0, frame_bytes=1, on_start=None, on_restart=None):
+        self.command_for = command_for
+        self.name = name
+        self.restart = restart
+        self.stall_seconds = stall_seconds
+        self.bytes_per_second = bytes_per_second
+        self.frame_bytes = frame_bytes
+        self.on_start = on_start
+        self.on_restart = on_restart
+        self.output = asyncio.StreamReader() if stdout else None
+        self.health = FfmpegHealth()
+        self.process = None
+        self._stopping = False
+        self._first_started_at = None
+        self._down_since = None
+        self._attempt_bytes = 0
+
+    async def run(self):
+        # Run until the command ends (or, with restart, until stop() is called)
+        delay = 0.0
+        attempt = 0
+        try:
+            while True:
+                started_at = time.monotonic()
+                if self._first_started_at is None:
+                    self._first_started_at = started_at
+                stalled = await self._run_once(attempt, started_at)
+                if self._stopping or not self.restart:
+                    return self.health
+                # The capture died or hung mid-meeting: start it again
+                self.health.restarts += 1
+                if self.on_restart:
+                    self.on_restart()
+                reason = "stalled" if stalled else f"exited with code {self.process.returncode}"
+                if time.monotonic() - started_at > RESTART_RESET_SECONDS:
+                    delay = 0.0
+                logger.warning(f"{self.name} {reason}, restarting in {delay:.1f}s ({self.health.summary()})")
+                if delay:
+                    await asyncio.sleep(random.uniform(delay / 2, delay))
+                delay = min(max(delay * 2, 0.5), RESTART_MAX_DELAY)
+                attempt += 1
+        finally:
+            if self.output is not None:
+                self.output.feed_eof()
+
+    async def stop(self):
+        # Stop the process for good, letting ffmpeg finish its output files if it can
+        self._stopping = True
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def _run_once(self, attempt, started_at):
+        # Run one ffmpeg process to its end; returns whether it was killed for stalling
+        self.health.last_output_at = None
+        self._attempt_bytes = 0
+        self.process = await asyncio.create_subprocess_shell(
+            supervised_command(self.command_for(attempt)),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE if self.output is not None else subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        if self.on_start:
+            self.on_start(attempt, started_at - self._first_started_at)
+        readers = [asyncio.create_task(self._drain_stderr(self.process.stderr))]
+        if self.output is not None:
+            readers.append(asyncio.create_task(self._pump(self.process.stdout)))
+        watchdog = asyncio.create_task(self._watch(self.process, started_at))
+        try:
+            await asyncio.gather(*readers)
+            await self.process.wait()
+        finally:
+            watchdog.cancel()
+            for reader in readers:
+                reader.cancel()
+        self.health.exit_codes.append(self.process.returncode)
+        # Audio has been missing since the last output, not just since the process ended
+        self._down_since = self.health.last_output_at or time.monotonic()
+        if self.output is not None and self._attempt_bytes % self.frame_bytes:
+            # Complete the last partial sample so the next process starts on a boundary
+            self.output.feed_data(b"\0" * (self.frame_bytes - self._attempt_bytes % self.frame_bytes))
+        return watchdog.done() and not watchdog.cancelled() and watchdog.result()
+
+    async def _drain_stderr(self, stderr):
+        block = {}
+        while True:
+            line = await stderr.readline()
+            if not line:
+                return
+            text = line.decode("utf-8", errors="replace").strip()
+            key, sep, value = text.partition("=")
+            if sep and key and " " not in key:
+                block[key] = value
+                if key == "progress":
+                    self.health.note_progress(block, time.monotonic())
+                    block = {}
+            elif text:
+                self.health.messages.append(text)
+                logger.warning(f"{self.name}: {text}")
+
+    async def _pump(self, stdout):
+        while True:
+            data = await stdout.read(STDOUT_READ_SIZE)
+            if not data:
+                return
+            now = time.monotonic()
+            if self._down_since is not None:
+                self._fill_gap(now - self._down_since)
+                self._down_since = None
+            self.health.last_output_at = now
+            self.health.bytes_out += len(data)
+            self._attempt_bytes += len(data)
+            self.output.feed_data(data)
+
+    def _fill_gap(self, seconds):
+        if not self.bytes_per_second:
+            return
+        seconds = min(seconds, MAX_GAP_FILL_SECONDS)
+        frames = int(seconds * self.bytes_per_second) // self.frame_bytes
+        if frames:
+            logger.info(f"{self.name}: filling {seconds:.2f}s capture gap with silence")
+            self.output.feed_data(bytes(frames * self.frame_bytes))
+
+    async def _watch(self, process, started_at):
+        # Kill the process once it has produced nothing for stall_seconds
+        while process.returncode is None:
+            await asyncio.sleep(min(1.0, self.stall_seconds / 2))
+            idle = time.monotonic() - (self.health.last_output_at or started_at)
+            if idle > self.stall_seconds and process.returncode is None:
+                self.health.stalls += 1
+                logger.error(f"{self.name} produced no output for {idle:.1f}s, killing it")
+                process.kill()
+                return True
+        return False
@@ -0,0 +1,41 @@
+import asyncio
+
+import aiohttp
+
+import backlog
+import gladia
+
+DONE = {"status": "done", "result": {"transcription": {"full_transcript": "hello", "utterances": []}}}
+
+
+def rate_limited():
+    return aiohttp.ClientResponseError(None, (), status=429, headers={"Retry-After": "0"})
+
+
+def test_rate_limit_resumes_the_step_that_got_it(tmp_path, monkeypatch):
+    recordings = tmp_path / "recordings"
+    recordings.mkdir()
+    (recordings / "standup.ogg").write_bytes(b"OggS")
+    calls = []
+    refusals = {"POST": 1, "GET": 1}
+
+    async def upload_file(headers, file_path, content_type, progress=None):
+        calls.append("upload")
+        return {"audio_url": "https://example.com/audio"}
+
+    async def make_request(url, headers, method="GET", data=None, timeout=None):
+        calls.append(method)
+        if refusals[method]:
+            refusals[method] -= 1
+            raise rate_limited()
+        return {"id": "job-1", "result_url": "https://example.com/job-1"} if method == "POST" else DONE
+
+    monkeypatch.setattr(gladia, "upload_file", upload_file)
+    monkeypatch.setattr(gladia, "make_request", make_request)
+    monkeypatch.setattr(backlog, "TRANSCRIPT_STORE", "")
+    stats = asyncio.run(backlog.transcribe_backlog("key", str(recordings), str(tmp_path / "out"), 1, 0))
+
+    assert (stats.done, stats.failed) == (1, 0)
+    # One upload and one job; only the refused submission and poll were repeated
+    assert calls == ["upload", "POST", "POST", "GET", "GET"]
+    assert (tmp_path / "out" / "standup" / "transcript.json").exists()
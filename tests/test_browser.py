@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from browser import google_session_valid, on_google_account_page, turn_off_media_controls
+
+SIGN_IN_REDIRECT = (
+    "https://accounts.google.com/v3/signin/identifier?continue=https%3A%2F%2Fmyaccount.google.com%2F"
+    "&followup=https%3A%2F%2Fmyaccount.google.com%2F&service=accountsettings"
+)
+
+
+class RedirectingBrowser:
+    # Lands on `landing` whatever page is asked for, like Google redirecting a visitor
+    def __init__(self, landing):
+        self.landing = landing
+
+    async def get(self, url):
+        pass
+
+    async def current_url(self):
+        return self.landing
+
+
+def test_sign_in_redirect_is_not_a_session():
+    assert not on_google_account_page(SIGN_IN_REDIRECT)
+    assert not asyncio.run(google_session_valid(RedirectingBrowser(SIGN_IN_REDIRECT)))
+    assert asyncio.run(google_session_valid(RedirectingBrowser("https://myaccount.google.com/?pli=1")))
+
+
+class PreJoinScreen:
+    # Answers MEDIA_CONTROLS_SCRIPT with the given states, one run after the other
+    def __init__(self, *runs):
+        self.runs = list(runs)
+
+    async def execute_script(self, script, *args):
+        return self.runs.pop(0) if len(self.runs) > 1 else self.runs[0]
+
+
+def test_media_controls_already_off_cost_no_wait():
+    started = time.monotonic()
+    states = asyncio.run(turn_off_media_controls(PreJoinScreen({"microphone": "already off", "camera": "already off"}), 3))
+    assert states == {"microphone": "already off", "camera": "already off"}
+    assert time.monotonic() - started < 0.1
+
+
+def test_media_controls_late_to_show_are_waited_for():
+    screen = PreJoinScreen(
+        {"microphone": "turned off", "camera": "missing"},
+        {"microphone": "already off", "camera": "turned off"},
+    )
+    assert asyncio.run(turn_off_media_controls(screen, 3)) == {"microphone": "turned off", "camera": "turned off"}
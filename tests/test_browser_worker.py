@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from browser import BrowserWorker
+
+# Each fake WebDriver command blocks its thread this long, like a slow chromedriver round trip
+COMMAND_SECONDS = 0.2
+# How often the lag monitor wakes up, and the most it may wake up late while the browser is busy
+MONITOR_INTERVAL = 0.01
+MAX_LAG_SECONDS = 0.05
+
+
+class BlockingElement:
+    def click(self):
+        time.sleep(COMMAND_SECONDS)
+
+    def send_keys(self, keys):
+        time.sleep(COMMAND_SECONDS)
+
+
+class BlockingDriver:
+    # WebDriver stand-in whose every command blocks the calling thread
+    def __init__(self):
+        self.commands = 0
+
+    def get(self, url):
+        self.commands += 1
+        time.sleep(COMMAND_SECONDS)
+
+    def find_element(self, by, value):
+        self.commands += 1
+        time.sleep(COMMAND_SECONDS)
+        return BlockingElement()
+
+    def save_screenshot(self, path):
+        self.commands += 1
+        time.sleep(COMMAND_SECONDS)
+        return True
+
+    def quit(self):
+        pass
+
+
+async def max_loop_lag(actions):
+    # Run actions() while a monitor sleeps in short steps; returns how late the monitor woke up at worst
+    lags = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            started_at = time.monotonic()
+            await asyncio.sleep(MONITOR_INTERVAL)
+            lags.append(time.monotonic() - started_at - MONITOR_INTERVAL)
+
+    monitor_task = asyncio.create_task(monitor())
+    try:
+        await actions()
+    finally:
+        done.set()
+        await monitor_task
+    return max(lags)
+
+
+def test_event_loop_lag_stays_bounded_while_browser_is_busy():
+    driver = BlockingDriver()
+
+    async def main():
+        browser = BrowserWorker()
+        await browser.start(lambda: driver)
+
+        async def actions():
+            for _ in range(3):
+                await browser.get("https://meet.google.com")
+                await browser.click("xpath", "//span")
+                await browser.send_keys("xpath", "//input", "hello")
+                await browser.save_screenshot("screenshot.png")
+
+        try:
+            return await max_loop_lag(actions)
+        finally:
+            await browser.quit()
+
+    lag = asyncio.run(main())
+    assert driver.commands == 12
+    assert lag < MAX_LAG_SECONDS
+
+
+def test_blocking_calls_on_the_loop_are_detected():
+    # The same calls made from a coroutine stall the loop, so the monitor above can tell
+    driver = BlockingDriver()
+
+    async def actions():
+        for _ in range(3):
+            driver.get("https://meet.google.com")
+            await asyncio.sleep(0)
+
+    lag = asyncio.run(max_loop_lag(actions))
+    assert lag >= COMMAND_SECONDS * 0.9
@@ -0,0 +1,40 @@
+import asyncio
+
+from captions import FINAL, PARTIAL, Subscriber
+
+
+def queued(subscriber):
+    return [(kind, key, encoded) for kind, key, encoded in subscriber.queue]
+
+
+def test_partials_give_way_and_finals_are_kept():
+    subscriber = Subscriber(max_queue=3)
+    subscriber.offer(PARTIAL, "u1", "u1 draft")
+    subscriber.offer(PARTIAL, "u1", "u1 longer draft")
+    subscriber.offer(PARTIAL, "u2", "u2 draft")
+    # The latest partial of an utterance replaces the one queued, in its place
+    assert queued(subscriber) == [(PARTIAL, "u1", "u1 longer draft"), (PARTIAL, "u2", "u2 draft")]
+    # Its final supersedes it
+    subscriber.offer(FINAL, "u1", "u1 final")
+    assert queued(subscriber) == [(PARTIAL, "u2", "u2 draft"), (FINAL, "u1", "u1 final")]
+    assert subscriber.dropped_partials == 2
+
+    # When full, the oldest partial makes room, for a partial or a final
+    subscriber.offer(FINAL, "u0", "u0 final")
+    subscriber.offer(FINAL, "u3", "u3 final")
+    assert queued(subscriber) == [(FINAL, "u1", "u1 final"), (FINAL, "u0", "u0 final"), (FINAL, "u3", "u3 final")]
+    # Full of finals, a partial is dropped, and a final means the subscriber cannot keep up
+    subscriber.offer(PARTIAL, "u4", "u4 draft")
+    assert not subscriber.overflowed and len(subscriber.queue) == 3
+    subscriber.offer(FINAL, "u4", "u4 final")
+    assert subscriber.overflowed
+    assert subscriber.dropped_partials == 4
+    assert asyncio.run(subscriber.next_batch()) == []
+
+
+def test_next_batch_takes_everything_queued():
+    subscriber = Subscriber(max_queue=3)
+    subscriber.offer(PARTIAL, "u1", "u1 draft")
+    subscriber.offer(FINAL, "u2", "u2 final")
+    assert asyncio.run(subscriber.next_batch()) == ["u1 draft", "u2 final"]
+    assert not subscriber.queue
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from capture import PortAudioCapture, check_capture_backend
+
+
+class RecordingStream:
+    # sounddevice.RawInputStream stand-in recording the PULSE_SOURCE it was started with, slowly,
+    # so concurrent opens overlap
+    started_with = []
+    lock = threading.Lock()
+
+    def __init__(self, **kwargs):
+        self.latency = 0.02
+
+    def start(self):
+        source = os.environ.get("PULSE_SOURCE")
+        time.sleep(0.05)
+        with self.lock:
+            self.started_with.append((source, os.environ.get("PULSE_SOURCE")))
+
+    def abort(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_concurrent_opens_each_start_on_their_own_source(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sounddevice", types.SimpleNamespace(RawInputStream=RecordingStream))
+    monkeypatch.delenv("PULSE_SOURCE", raising=False)
+    RecordingStream.started_with = []
+
+    async def main():
+        captures = [PortAudioCapture(f"MicOutput_{i}.monitor", 16000) for i in range(4)]
+        await asyncio.gather(*(capture.start() for capture in captures))
+        await asyncio.gather(*(capture.stop() for capture in captures))
+
+    asyncio.run(main())
+    # The source never changed while a stream was starting, every sink was opened once,
+    # and the process environment is left as it was
+    assert all(before == after for before, after in RecordingStream.started_with)
+    assert sorted(before for before, _ in RecordingStream.started_with) == [f"MicOutput_{i}.monitor" for i in range(4)]
+    assert "PULSE_SOURCE" not in os.environ
+
+
+def test_portaudio_is_refused_for_several_sessions():
+    check_capture_backend("portaudio", 1)
+    check_capture_backend("ffmpeg", 8)
+    with pytest.raises(ValueError):
+        check_capture_backend("portaudio", 2)
@@ -0,0 +1,48 @@
+import asyncio
+
+import aiohttp
+
+import gladia
+from gladia import CallbackReceiver
+
+
+def test_callbacks_need_the_token_and_unclaimed_ones_are_bounded(monkeypatch):
+    monkeypatch.setattr(gladia, "CALLBACK_MAX_UNCLAIMED", 2)
+
+    async def scenario():
+        receiver = CallbackReceiver("127.0.0.1", 0)
+        await receiver.start()
+        host, port = receiver._runner.addresses[0][:2]
+        url = f"http://{host}:{port}{receiver.path}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def post(callback_url, job_id):
+                    async with session.post(callback_url, json={"id": job_id}) as response:
+                        return response.status
+
+                assert await post(url, "job-0") == 403
+                assert await post(f"{url}?token=guess", "job-0") == 403
+                for job_id in ("job-1", "job-2", "job-3"):
+                    assert await post(receiver.url(url), job_id) == 200
+            assert list(receiver._received) == ["job-2", "job-3"]
+            assert await receiver.wait_for("job-3", 1) == {"id": "job-3"}
+        finally:
+            await receiver.stop()
+
+    asyncio.run(scenario())
+
+
+def test_segments_are_merged_in_meeting_time():
+    def segment(text, start):
+        word = {"word": text, "start": start, "end": start + 0.5}
+        return {"status": "done", "result": {"transcription": {
+            "full_transcript": text, "utterances": [{"text": text, "start": start, "end": start + 1, "words": [word]}]
+        }}}
+
+    merged = gladia.merge_transcriptions([(0, segment("one", 2)), (600, None), (1200, segment("three", 1))])
+    assert merged["status"] == "partial"
+    assert merged["failed_segments"] == [1]
+    transcription = merged["result"]["transcription"]
+    assert transcription["full_transcript"] == "one\nthree"
+    assert [(u["segment"], u["start"], u["end"]) for u in transcription["utterances"]] == [(0, 2, 3), (2, 1201, 1202)]
+    assert transcription["utterances"][1]["words"][0]["start"] == 1201
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from jobs import DONE, FAILED, PENDING, RUNNING, JobQueue
+from scheduler import Scheduler, WarmPool
+
+START = 1_800_000_000.0
+
+
+def test_lapsed_claims_are_taken_back(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    ongoing = queue.add("https://meet.google.com/aaa", START, 60)
+    over = queue.add("https://meet.google.com/bbb", START - 3600, 30)
+    renewed = queue.add("https://meet.google.com/ccc", START, 60)
+    for job_id in (ongoing, over, renewed):
+        assert queue.claim(job_id, "node-a", START - 60)
+    assert queue.heartbeat([renewed], "node-a", START + 100) == {renewed}
+
+    assert queue.reclaim(START + 60, START + 120) == (1, 1)
+    jobs = {job["id"]: job for job in queue.jobs()}
+    assert jobs[ongoing]["status"] == PENDING and jobs[ongoing]["node"] is None
+    assert jobs[over]["status"] == FAILED and "node-a" in jobs[over]["error"]
+    assert jobs[renewed]["status"] == RUNNING
+
+    # node-a no longer holds the requeued job: it can't renew it or finish it over another node's run
+    assert queue.claim(ongoing, "node-b", START + 120)
+    assert queue.heartbeat([ongoing, renewed], "node-a", START + 130) == {renewed}
+    queue.finish(ongoing, FAILED, "stale", START + 140, node="node-a")
+    assert {job["id"]: job for job in queue.jobs()}[ongoing]["status"] == RUNNING
+    queue.close()
+
+
+def test_restarted_node_takes_back_its_jobs_and_runs_them(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.add("https://meet.google.com/aaa", START, 60)
+    # Claimed, then the node crashed before finishing it
+    assert queue.claim(job_id, "node-a", START - 30)
+    ran = []
+
+    async def prepare():
+        return "session"
+
+    async def release(session):
+        pass
+
+    async def run_job(job, session, in_lobby):
+        await in_lobby()
+        ran.append(job["id"])
+
+    started_at = time.monotonic()
+    scheduler = Scheduler(
+        queue, WarmPool(prepare, release, 0), run_job, capacity=1, lead_seconds=60, poll_seconds=0.01,
+        node="node-a", clock=lambda: START + time.monotonic() - started_at
+    )
+    asyncio.run(scheduler.run(until=START + 0.2))
+    assert ran == [job_id]
+    assert queue.jobs()[0]["status"] == DONE
+    queue.close()
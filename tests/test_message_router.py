@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from message_router import MessageRouter, peek_type
+
+ACKNOWLEDGMENT = json.dumps({
+    "session_id": "s", "created_at": "2026-01-01T00:00:00Z", "type": "audio_chunk", "acknowledged": True,
+    "data": {"byte_range": [0, 3200]}
+})
+TRANSCRIPT = json.dumps({
+    "session_id": "s", "created_at": "2026-01-01T00:00:00Z", "type": "transcript",
+    "data": {"id": "00-00000001", "is_final": True, "utterance": {"text": 'a "type": "audio_chunk" in text'}}
+})
+
+
+def test_peek_type_reads_the_top_level_type():
+    assert peek_type(ACKNOWLEDGMENT) == "audio_chunk"
+    assert peek_type(TRANSCRIPT) == "transcript"
+    assert peek_type('{"data": {"type": "nested"}, "type": "end_session"}') == "end_session"
+    assert peek_type('{"data": {"type": "nested"}}') is None
+
+
+@pytest.mark.parametrize("peek", [False, True])
+def test_dispatch_routes_handled_types_and_counts_the_rest(peek):
+    router = MessageRouter(peek=peek)
+    received = []
+    router.on("transcript", lambda content: received.append(content["data"]["id"]))
+    router.on("post_processing_result", lambda content: True)
+
+    assert router.dispatch(ACKNOWLEDGMENT) == ("audio_chunk", False)
+    assert router.dispatch(TRANSCRIPT) == ("transcript", False)
+    assert router.dispatch('{"type": "post_processing_result"}') == ("post_processing_result", True)
+    assert received == ["00-00000001"]
+    assert router.skipped == {"audio_chunk": 1}
@@ -0,0 +1,15 @@
+from metrics import MetricsRegistry
+
+
+def test_closed_sessions_are_no_longer_exposed():
+    registry = MetricsRegistry()
+    registry.session("job-1").audio_chunks_sent += 3
+    registry.session("job-2").audio_chunks_sent += 5
+
+    registry.close_session("job-1")
+    registry.close_session("job-1")
+
+    text = registry.render()
+    assert list(registry.sessions) == ["job-2"]
+    assert 'session="job-1"' not in text
+    assert 'gmeet_audio_chunks_sent_total{session="job-2"} 5' in text
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+
+import streaming
+from streaming import AudioStreamer, LiveConnection, ReplayBuffer, chunk_size_for
+
+SAMPLE_RATE = 16000
+
+
+class RecordingWebsocket:
+    # Notes when each frame was sent
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append((time.monotonic(), frame))
+
+
+def test_audio_is_paced_to_real_time_and_catches_up_when_late():
+    websocket = RecordingWebsocket()
+    streamer = AudioStreamer(websocket, SAMPLE_RATE, chunk_duration_ms=20)
+    size = chunk_size_for(SAMPLE_RATE, 20)
+
+    async def scenario():
+        stream = asyncio.StreamReader()
+        # A capture delivering 10 chunks at once, then 5 more after a 150 ms stall
+        stream.feed_data(b"\x01" * size * 10)
+        sender = asyncio.create_task(streamer.run(stream))
+        await asyncio.sleep(0.35)
+        stream.feed_data(b"\x02" * size * 5)
+        stream.feed_eof()
+        await sender
+
+    asyncio.run(scenario())
+    times = [sent_at - websocket.sent[0][0] for sent_at, _ in websocket.sent]
+    assert len(times) == 15
+    # Ahead of the audio clock: one chunk per 20 ms, never early
+    for i in range(10):
+        assert times[i] >= i * 0.02 - 0.002
+    assert times[9] < 0.25
+    # Behind it after the stall: the late chunks go out back to back
+    assert times[14] - times[10] < 0.02
+    assert streamer.chunks_handled == 15
+    assert streamer.bytes_sent == 15 * size
+
+
+def acknowledgment(start, end):
+    return json.dumps({"type": "audio_chunk", "acknowledged": True, "data": {"byte_range": [start, end]}})
+
+
+def test_replay_buffer_keeps_what_is_not_acknowledged():
+    buffer = ReplayBuffer(max_bytes=1000)
+    for _ in range(3):
+        buffer.append(100, b"f" * 100)
+    # The ack ends inside the second frame: only the first is released
+    buffer.acknowledge(150)
+    assert [offset for offset, _, _ in buffer.frames_after(buffer.acknowledged_offset)] == [100, 200]
+    assert buffer.size == 200
+    buffer.acknowledge(120)
+    assert buffer.acknowledged_offset == 150
+
+
+def test_replay_buffer_overflow_drops_the_oldest_and_counts_the_lost_audio():
+    buffer = ReplayBuffer(max_bytes=250)
+    buffer.append(100, b"f" * 100)
+    buffer.acknowledge(40)
+    buffer.append(100, b"f" * 100)
+    buffer.append(100, b"f" * 100)
+    assert [offset for offset, _, _ in buffer.frames] == [100, 200]
+    # 60 of the dropped frame's 100 bytes of audio had not been acknowledged
+    assert (buffer.size, buffer.dropped_bytes) == (200, 60)
+    buffer.append(100, b"f" * 300)
+    # However far past the limit, the newest frame is kept
+    assert [offset for offset, _, _ in buffer.frames] == [300]
+
+
+class FakeWebsocket:
+    def __init__(self, url):
+        self.url = url
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+    async def close(self):
+        pass
+
+
+def test_reconnection_replays_audio_after_a_partial_acknowledgment(monkeypatch):
+    websockets = []
+
+    async def connect(url):
+        websockets.append(FakeWebsocket(url))
+        return websockets[-1]
+
+    async def open_session():
+        return f"wss://live/{len(websockets)}"
+
+    monkeypatch.setattr(streaming.websockets, "connect", connect)
+
+    async def scenario():
+        connection = LiveConnection(open_session, ReplayBuffer(10_000), 32000)
+        await connection.connect()
+        for frame in (b"a" * 100, b"b" * 100, b"c" * 100):
+            await connection.send_audio(frame, frame)
+        connection._handle_acknowledgment(acknowledgment(0, 150))
+        connection._connection_lost(websockets[0])
+        # Audio sent while reconnecting is buffered, then replayed in order
+        await connection.send_audio(b"d" * 100, b"d" * 100)
+        await connection._reconnect_task
+
+        assert websockets[1].url == websockets[0].url
+        assert websockets[1].sent == [b"b" * 100, b"c" * 100, b"d" * 100]
+        assert connection.reconnects == 1
+
+        # A new session starts at the first unacknowledged audio, and its offsets count from there
+        await connection._establish(new_session=True)
+        assert connection.session_base_offset == 100
+        assert connection.session_time_offset == 100 / 32000
+        connection._handle_acknowledgment(acknowledgment(0, 200))
+        assert connection.buffer.acknowledged_offset == 300
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from click.testing import CliRunner
+
+import transcript_store
+from transcript_store import LIVE, MeetingIngest, TranscriptStore, cli, load_output_directory, store_transcription
+
+RESULT = {"transcription": {"utterances": [
+    {"start": 1.0, "end": 2.5, "speaker": 0, "language": "en", "confidence": 0.9, "text": "budget review"},
+]}}
+
+
+def write_transcript(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "transcript.json").write_text(json.dumps({"status": "done", "result": RESULT}))
+
+
+def test_ingest_skips_what_the_bots_stored(tmp_path, monkeypatch):
+    db = str(tmp_path / "transcripts.db")
+    monkeypatch.setattr(transcript_store, "TRANSCRIPT_STORE", db)
+    live_dir, batch_dir, old_dir = tmp_path / "session-1", tmp_path / "batch", tmp_path / "old"
+
+    async def live_meeting():
+        ingest = await MeetingIngest.open(LIVE, "https://meet.google.com/aaa", str(live_dir))
+        ingest.add_result(RESULT, LIVE)
+        await ingest.close()
+
+    try:
+        asyncio.run(live_meeting())
+        assert store_transcription(RESULT, output_dir=str(batch_dir)) is not None
+    finally:
+        transcript_store.close_transcript_store()
+    # The files the bots leave next to what they stored, and a directory from before the store
+    for directory in (live_dir, batch_dir, old_dir):
+        write_transcript(directory)
+
+    for expected in ("Ingested 1 meetings, 2 already stored", "Ingested 0 meetings, 3 already stored"):
+        outcome = CliRunner().invoke(cli, ["--db", db, "ingest", str(tmp_path)])
+        assert outcome.exit_code == 0, outcome.output
+        assert expected in outcome.output
+
+    store = TranscriptStore(db)
+    assert len(store.meetings()) == 3
+    assert len(store.search("budget")) == 3
+    store.close()
+
+
+def test_live_events_cut_short_are_loaded(tmp_path):
+    utterance = {"type": "utterance", "start": 0.5, "end": 1.5, "speaker": None, "language": "en", "text": "hello"}
+    (tmp_path / "live_events.jsonl").write_text(json.dumps(utterance) + '\n{"type": "utter')
+    source, result = load_output_directory(str(tmp_path))
+    assert source == LIVE
+    assert [u["text"] for u in result["transcription"]["utterances"]] == ["hello"]
+
+
+def test_forced_ingest_keeps_a_meeting_it_cannot_reload(tmp_path):
+    db = str(tmp_path / "transcripts.db")
+    directory = tmp_path / "meeting"
+    write_transcript(directory)
+    for args in (["ingest"], ["ingest", "--force"]):
+        outcome = CliRunner().invoke(cli, ["--db", db, *args, str(directory)])
+        assert "Ingested 1 meetings, 0 already stored" in outcome.output
+    (directory / "transcript.json").write_text('{"status": "do')
+    outcome = CliRunner().invoke(cli, ["--db", db, "ingest", "--force", str(directory)])
+    assert "Ingested 0 meetings, 0 already stored" in outcome.output
+
+    store = TranscriptStore(db)
+    assert [meeting["utterances"] for meeting in store.meetings()] == [1]
+    store.close()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from vad import SpeechGate
+
+SAMPLE_RATE = 16000
+CHUNK_MS = 100
+CHUNK_BYTES = SAMPLE_RATE * 2 * CHUNK_MS // 1000
+CHUNK_SECONDS = CHUNK_MS / 1000
+
+
+def chunk(index, speech=False):
+    # A chunk whose samples all hold its index, so sent chunks can be told apart; silent ones stay
+    # around -60 dBFS, under the gate's threshold
+    return np.full(CHUNK_BYTES // 2, index + (10000 if speech else 0), dtype="<i2").tobytes()
+
+
+def chunk_index(data):
+    return int(np.frombuffer(data, dtype="<i2")[0]) % 10000
+
+
+def test_speech_after_keepalive_within_preroll_is_sent_in_order():
+    # Keepalive every 10 chunks, 3 chunks of preroll
+    gate = SpeechGate(SAMPLE_RATE, CHUNK_MS, threshold_dbfs=-50, hangover_ms=0, preroll_ms=300, keepalive_seconds=1)
+    sent = []
+    for index in range(10):
+        sent += gate.process(chunk(index))
+    assert [chunk_index(data) for data in sent] == [9]
+
+    # Speech starts one chunk after the keepalive, well within the preroll window
+    sent += gate.process(chunk(10))
+    sent += gate.process(chunk(11, speech=True))
+
+    indices = [chunk_index(data) for data in sent]
+    assert indices == [9, 10, 11]
+    assert indices == sorted(indices)
+
+    # Sent audio is contiguous from the keepalive on, so each sent position maps to its captured chunk
+    for position, index in enumerate(indices):
+        assert gate.timeline.meeting_time(position * CHUNK_SECONDS) == pytest.approx(index * CHUNK_SECONDS)
+        assert gate.timeline.meeting_time((position + 0.5) * CHUNK_SECONDS) == pytest.approx((index + 0.5) * CHUNK_SECONDS)
+
+
+def test_preroll_is_flushed_before_speech():
+    gate = SpeechGate(SAMPLE_RATE, CHUNK_MS, threshold_dbfs=-50, hangover_ms=0, preroll_ms=300, keepalive_seconds=0)
+    sent = []
+    for index in range(5):
+        sent += gate.process(chunk(index))
+    sent += gate.process(chunk(5, speech=True))
+
+    assert [chunk_index(data) for data in sent] == [2, 3, 4, 5]
+    assert gate.timeline.meeting_time(0) == pytest.approx(2 * CHUNK_SECONDS)
+    assert gate.timeline.meeting_time(3.5 * CHUNK_SECONDS) == pytest.approx(5.5 * CHUNK_SECONDS)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Buffered transcript output is written at least this often, or sooner once this much is waiting
+FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", 1.0))
+FLUSH_BYTES = int(os.getenv("TRANSCRIPT_FLUSH_BYTES", 64 * 1024))
+
+# When written data is forced to disk:
+#   always: after every flush, at most FLUSH_INTERVAL of transcript is lost on a crash
+#   close:  once when the sink is closed
+#   never:  left to the OS
+FSYNC_POLICIES = ("always", "close", "never")
+FSYNC_POLICY = os.getenv("TRANSCRIPT_FSYNC", "close").lower()
+
+
+class TranscriptSink:
+    # Transcript files written off the event loop.
+    #
+    # Callers only append to in-memory buffers, which never blocks. A background task hands
+    # what has accumulated to a worker thread every `flush_interval` seconds, or as soon as
+    # `flush_bytes` are waiting; the thread serializes, writes and optionally fsyncs, while
+    # the receive loop keeps going. Append files stay open for the whole session.
+
+    def __init__(self, output_dir, flush_interval=FLUSH_INTERVAL, flush_bytes=FLUSH_BYTES, fsync=FSYNC_POLICY):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync} (expected one of {', '.join(FSYNC_POLICIES)})")
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self._appends = {}  # file name -> text lines or JSON records to append
+        self._replacements = {}  # file name -> (content, as JSON) to write whole
+        self._pending_bytes = 0
+        self._files = {}
+        self._wakeup = asyncio.Event()
+        self._writer = None
+        self._closing = False
+
+    async def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._writer = asyncio.create_task(self._write_loop())
+        return self
+
+    def append_line(self, name, line):
+        # Append a line of text to a file
+        self._append(name, line, len(line))
+
+    def append_record(self, name, record, size_hint=256):
+        # Append a JSON record to a JSONL file; it is serialized on the writer thread
+        self._append(name, record, size_hint)
+
+    def write_json(self, name, content, indent=2):
+        # Replace a whole file with a JSON document, serialized on the writer thread
+        self._replacements[name] = (content, indent)
+        self._wakeup.set()
+
+    def write_text(self, name, text):
+        self._replacements[name] = (text, None)
+        self._wakeup.set()
+
+    def _append(self, name, item, size):
+        self._appends.setdefault(name, []).append(item)
+        self._pending_bytes += size
+        if self._pending_bytes >= self.flush_bytes:
+            self._wakeup.set()
+
+    async def close(self):
+        # Write everything still buffered, then close (and fsync, per policy) the files
+        self._closing = True
+        self._wakeup.set()
+        if self._writer is not None:
+            await self._writer
+        await asyncio.to_thread(self._close_files)
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            appends, self._appends = self._appends, {}
+            replacements, self._replacements = self._replacements, {}
+            self._pending_bytes = 0
+            if appends or replacements:
+                try:
+                    await asyncio.to_thread(self._write, appends, replacements)
+                except Exception as e:
+                    logger.error(f"Failed to write transcript files: {str(e)}")
+            if self._closing:
+                return
+
+    def _write(self, appends, replacements):
+        # Runs on a worker thread
+        for name, items in appends.items():
+            f = self._files.get(name)
+            if f is None:
+                f = self._files[name] = open(os.path.join(self.output_dir, name), "a", encoding="utf-8")
+            f.write("".join(
+                item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) + "\n" for item in items
+            ))
+            f.flush()
+            if self.fsync == "always":
+                os.fsync(f.fileno())
+
+        for name, (content, indent) in replacements.items():
+            path = os.path.join(self.output_dir, name)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if indent is None:
+                    f.write(content)
+                else:
+                    json.dump(content, f, indent=indent, ensure_ascii=False)
+                if self.fsync != "never":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+    def _close_files(self):
+        for f in self._files.values():
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+            f.close()
+        self._files = {}
@@ -0,0 +1,639 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import click
+
+from transcript_sink import FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# SQLite file every transcript is also stored in, searchable across meetings ("" to disable)
+TRANSCRIPT_STORE = os.getenv("TRANSCRIPT_STORE", os.path.join("transcriptions", "transcripts.db"))
+
+# One row per meeting, per utterance, and per summary or chapter ("notes"). Utterances and
+# notes have full-text indexes over their text kept in sync by triggers, so the tables stay
+# the single source of truth and an index can be rebuilt from them.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    meet_link TEXT,
+    source TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    location TEXT
+);
+CREATE INDEX IF NOT EXISTS meetings_started ON meetings (started_at);
+
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    speaker TEXT,
+    language TEXT,
+    confidence REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS utterances_meeting ON utterances (meeting_id, start_time);
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    text, content='utterances', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_insert AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_delete AFTER DELETE ON utterances BEGIN
+    INSERT INTO utterances_fts (utterances_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    title TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_meeting ON notes (meeting_id, start_time);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, text, content='notes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS notes_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+"""
+
+# Where a meeting's transcript came from: the live bot's incremental finals, the final result
+# of a live session, or a batch transcription (prerecorded, hybrid and backlog)
+LIVE = "live"
+FINAL = "final"
+BATCH = "batch"
+
+# Search results are ordered by relevance (bm25) among the RANK_CANDIDATES most recently
+# stored matches, or most recently stored first
+ORDERS = ("relevance", "recent")
+RANK_CANDIDATES = int(os.getenv("TRANSCRIPT_SEARCH_CANDIDATES", 2000))
+SNIPPET_WORDS = 16
+
+
+def utterance_row(utterance):
+    # (start, end, speaker, language, confidence, text) of a Gladia utterance, or of a live events record.
+    # Only diarized (batch) utterances have a speaker
+    speaker = utterance.get("speaker")
+    return (
+        utterance.get("start"), utterance.get("end"), None if speaker is None else str(speaker),
+        utterance.get("language"), utterance.get("confidence"), utterance["text"].strip()
+    )
+
+
+def result_rows(result):
+    # Utterance rows and (kind, start, end, title, text) note rows of a transcription result:
+    # the final message of a live session, or the "result" of a batch transcription
+    transcription = result.get("transcription") or {}
+    utterances = [utterance_row(u) for u in transcription.get("utterances") or [] if u.get("text", "").strip()]
+
+    notes = []
+    summary = (result.get("summarization") or {}).get("results")
+    if summary:
+        notes.append(("summary", None, None, None, summary if isinstance(summary, str) else json.dumps(summary)))
+    # Live sessions call them chapters, batch transcriptions chapterization
+    chapters = (result.get("chapters") or result.get("chapterization") or {}).get("results") or []
+    notes.extend(chapter_row(chapter) for chapter in chapters if isinstance(chapter, dict))
+    return utterances, notes
+
+
+def chapter_row(chapter):
+    text = chapter.get("summary") or chapter.get("abstractive_summary") or chapter.get("gist") or ""
+    keywords = chapter.get("keywords")
+    if keywords:
+        text = f"{text}\n{', '.join(str(keyword) for keyword in keywords)}"
+    return ("chapter", chapter.get("start"), chapter.get("end"), chapter.get("headline") or chapter.get("gist"), text)
+
+
+def fts_query(text):
+    # Every word of a plain search as a quoted term, so punctuation is not read as FTS5 syntax
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class TranscriptStore:
+    # Transcripts of every meeting in one SQLite file with full-text search, written
+    # incrementally by the bots and queried through the CLI below.
+    #
+    # Calls are short and synchronous; bots run them on worker threads (see MeetingIngest),
+    # hence one lock per store. WAL lets searches run while a bot writes.
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def add_meeting(self, source, started_at=None, meet_link=None, location=None, key=None):
+        # Returns the new meeting's id
+        return self._execute(
+            "INSERT INTO meetings (key, meet_link, source, started_at, location) VALUES (?, ?, ?, ?, ?)",
+            (key or uuid.uuid4().hex, meet_link, source, time.time() if started_at is None else started_at, location)
+        ).lastrowid
+
+    def meeting_id(self, key):
+        row = self._execute("SELECT id FROM meetings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def write(self, meeting_id, utterances=(), notes=None, replace=False, source=None, ended_at=None):
+        # In one transaction: add utterance rows (replacing the meeting's utterances if
+        # `replace`), replace its notes if given, and update its source and end time if given
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                if replace:
+                    self._db.execute("DELETE FROM utterances WHERE meeting_id = ?", (meeting_id,))
+                if notes is not None:
+                    self._db.execute("DELETE FROM notes WHERE meeting_id = ?", (meeting_id,))
+                self._insert_rows(meeting_id, utterances, notes or ())
+                if source is not None:
+                    self._db.execute("UPDATE meetings SET source = ? WHERE id = ?", (source, meeting_id))
+                if ended_at is not None:
+                    self._db.execute("UPDATE meetings SET ended_at = ? WHERE id = ?", (ended_at, meeting_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def write_result(self, meeting_id, result, source):
+        # Store a transcription result. Its utterances replace those already stored (the
+        # final or batch version supersedes the live one), unless it has none
+        utterances, notes = result_rows(result)
+        self.write(
+            meeting_id, utterances, notes if notes else None, replace=bool(utterances),
+            source=source if utterances else None
+        )
+
+    def store_meeting(self, key, source, result, started_at=None, meet_link=None, location=None, ended_at=None):
+        # In one transaction: store a finished transcription as a meeting, replacing the one
+        # stored under the same key, if any, so a failed write leaves that one in place.
+        # Returns the new meeting's id.
+        utterances, notes = result_rows(result)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                existing = self._db.execute("SELECT id FROM meetings WHERE key = ?", (key,)).fetchone()
+                if existing is not None:
+                    self._delete_meeting(existing[0])
+                meeting_id = self._db.execute(
+                    "INSERT INTO meetings (key, meet_link, source, started_at, ended_at, location) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, meet_link, source, time.time() if started_at is None else started_at, ended_at, location)
+                ).lastrowid
+                self._insert_rows(meeting_id, utterances, notes)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return meeting_id
+
+    def delete_meeting(self, meeting_id):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._delete_meeting(meeting_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _delete_meeting(self, meeting_id):
+        # Within a transaction
+        for table in ("utterances", "notes"):
+            self._db.execute(f"DELETE FROM {table} WHERE meeting_id = ?", (meeting_id,))
+        self._db.execute("DELETE FROM meetings WHERE id = ?", (meeting_id,))
+
+    def _insert_rows(self, meeting_id, utterances, notes):
+        # Within a transaction
+        self._db.executemany(
+            "INSERT INTO utterances (meeting_id, start_time, end_time, speaker, language, confidence, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(meeting_id, *row) for row in utterances]
+        )
+        self._db.executemany(
+            "INSERT INTO notes (meeting_id, kind, start_time, end_time, title, text) VALUES (?, ?, ?, ?, ?, ?)",
+            [(meeting_id, *row) for row in notes]
+        )
+
+    def search(self, query, limit=20, since=None, until=None, speaker=None, meet_link=None, notes=False,
+               order="relevance"):
+        # Utterances (or summaries and chapters) matching an FTS5 query, with their meeting
+        table = "notes" if notes else "utterances"
+        snippet_column = 1 if notes else 0
+        conditions = [f"{table}_fts MATCH ?"]
+        params = [query]
+        for condition, value in (("m.started_at >= ?", since), ("m.started_at < ?", until),
+                                 ("m.meet_link = ?", meet_link)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if speaker is not None and not notes:
+            conditions.append("t.speaker = ?")
+            params.append(str(speaker))
+        # Matches are walked newest first, which the index does without sorting, and only the
+        # first RANK_CANDIDATES are ranked: scoring every match of a word said in most
+        # meetings would take seconds
+        candidates = self._execute(
+            f"SELECT {table}_fts.rowid, rank FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid "
+            f"JOIN meetings m ON m.id = t.meeting_id WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {table}_fts.rowid DESC LIMIT ?",
+            (*params, RANK_CANDIDATES if order == "relevance" else limit)
+        ).fetchall()
+        if order == "relevance":
+            candidates = sorted(candidates, key=lambda row: row["rank"])[:limit]
+        ids = [row["rowid"] for row in candidates]
+        if not ids:
+            return []
+
+        # Snippets only for the results shown
+        columns = "t.kind, t.title" if notes else "t.speaker, t.language"
+        rows = self._execute(
+            f"SELECT t.id, m.id AS meeting_id, m.started_at, m.meet_link, m.source, t.start_time, t.end_time, "
+            f"{columns}, snippet({table}_fts, {snippet_column}, '[', ']', '...', {SNIPPET_WORDS}) AS snippet "
+            f"FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid JOIN meetings m ON m.id = t.meeting_id "
+            f"WHERE {table}_fts MATCH ? AND {table}_fts.rowid IN ({', '.join('?' * len(ids))})",
+            (query, *ids)
+        ).fetchall()
+        by_id = {row["id"]: dict(row) for row in rows}
+        return [by_id[row_id] for row_id in ids if row_id in by_id]
+
+    def meetings(self, since=None, until=None, limit=50):
+        rows = self._execute(
+            "SELECT m.*, (SELECT COUNT(*) FROM utterances u WHERE u.meeting_id = m.id) AS utterances "
+            "FROM meetings m WHERE m.started_at >= ? AND m.started_at < ? ORDER BY m.started_at DESC LIMIT ?",
+            (since or 0, until or float("inf"), limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def transcript(self, meeting_id):
+        # The meeting, its utterances and its notes, in meeting order
+        meeting = self._execute("SELECT * FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+        if meeting is None:
+            return None, [], []
+        utterances = self._execute(
+            "SELECT * FROM utterances WHERE meeting_id = ? ORDER BY start_time, id", (meeting_id,)
+        ).fetchall()
+        notes = self._execute("SELECT * FROM notes WHERE meeting_id = ? ORDER BY start_time, id", (meeting_id,)).fetchall()
+        return dict(meeting), [dict(row) for row in utterances], [dict(row) for row in notes]
+
+    def optimize(self):
+        # Merge the full-text index segments left by many small incremental writes
+        for table in ("utterances_fts", "notes_fts"):
+            self._execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store = None
+
+
+def get_transcript_store():
+    # The store shared by every session of this process, or None when disabled
+    global _store
+    if _store is None and TRANSCRIPT_STORE:
+        directory = os.path.dirname(TRANSCRIPT_STORE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _store = TranscriptStore(TRANSCRIPT_STORE)
+    return _store
+
+
+def close_transcript_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+# Written into a bot's output directory with the key its meeting is stored under, so `ingest`
+# knows the transcript files there are already stored. Output directories are reused from one
+# meeting to the next, and so is this file, which always goes with the files last written there.
+MEETING_KEY_FILE = "meeting_key"
+
+
+def output_directory_key(directory):
+    # Key of the meeting whose transcript files are in an output directory: the one the bot
+    # recorded there, or one derived from its path for directories written before the store
+    try:
+        with open(os.path.join(directory, MEETING_KEY_FILE)) as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        key = ""
+    return key or f"dir:{os.path.realpath(directory)}"
+
+
+def record_meeting_key(directory, key):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, MEETING_KEY_FILE), "w") as f:
+        f.write(f"{key}\n")
+
+
+class MeetingIngest:
+    # One meeting's transcript written to the store as it comes, off the event loop.
+    #
+    # Like TranscriptSink, callers only queue writes; a background task hands what has
+    # accumulated to a worker thread every `flush_interval` seconds, where it is written in one
+    # transaction, so a search finds an utterance about a flush interval after it was said.
+
+    def __init__(self, store, meeting_id, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.meeting_id = meeting_id
+        self.flush_interval = flush_interval
+        self._utterances = []
+        self._results = []
+        self._wakeup = asyncio.Event()
+        self._writer = None
+        self._closing = False
+
+    @classmethod
+    async def open(cls, source=LIVE, meet_link=None, output_dir=None):
+        # Start storing a new meeting, or return None when the store is disabled or unusable.
+        # Its key is recorded in `output_dir`, where its transcript files go.
+        try:
+            store = get_transcript_store()
+            if store is None:
+                return None
+            key = uuid.uuid4().hex
+            meeting_id = await asyncio.to_thread(store.add_meeting, source, None, meet_link, output_dir, key)
+            if output_dir:
+                await asyncio.to_thread(record_meeting_key, output_dir, key)
+        except Exception as e:
+            logger.error(f"Transcript store unavailable, transcripts are only written to files: {str(e)}")
+            return None
+        ingest = cls(store, meeting_id)
+        ingest._writer = asyncio.create_task(ingest._write_loop())
+        return ingest
+
+    def add_utterance(self, utterance):
+        # A final utterance, as a Gladia utterance or a live events record
+        if utterance["text"].strip():
+            self._utterances.append(utterance_row(utterance))
+
+    def add_result(self, result, source):
+        # A final or batch transcription result, written after the utterances queued before it
+        self._results.append((result, source))
+        self._wakeup.set()
+
+    async def close(self):
+        # Write what is still queued and note when the meeting ended
+        self._closing = True
+        self._wakeup.set()
+        if self._writer is not None:
+            await self._writer
+        try:
+            await asyncio.to_thread(self.store.write, self.meeting_id, ended_at=time.time())
+        except Exception as e:
+            logger.error(f"Failed to store the end of meeting {self.meeting_id}: {str(e)}")
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            utterances, self._utterances = self._utterances, []
+            results, self._results = self._results, []
+            if utterances or results:
+                try:
+                    await asyncio.to_thread(self._write, utterances, results)
+                except Exception as e:
+                    logger.error(f"Failed to store transcript of meeting {self.meeting_id}: {str(e)}")
+            if self._closing:
+                return
+
+    def _write(self, utterances, results):
+        # Runs on a worker thread
+        if utterances:
+            self.store.write(self.meeting_id, utterances)
+        for result, source in results:
+            self.store.write_result(self.meeting_id, result, source)
+
+
+def store_transcription(result, source=BATCH, meet_link=None, output_dir=None, started_at=None, key=None):
+    # Store a finished transcription as a meeting of its own, replacing one stored under the
+    # same key, and record its key in `output_dir`, where its transcript files are; returns its
+    # id, or None when the store is disabled or the write failed. Blocking, for worker threads and scripts.
+    try:
+        store = get_transcript_store()
+        if store is None:
+            return None
+        key = key or uuid.uuid4().hex
+        meeting_id = store.store_meeting(key, source, result, started_at, meet_link, output_dir, time.time())
+        if output_dir:
+            record_meeting_key(output_dir, key)
+        return meeting_id
+    except Exception as e:
+        logger.error(f"Failed to store transcript of {meet_link or output_dir}: {str(e)}")
+        return None
+
+
+def load_output_directory(path):
+    # (source, result) of the transcript files a bot left in an output directory, or None.
+    # A batch transcript.json has the best utterances (diarized); otherwise they come from the
+    # live session's final_transcript.json, or its live_events.jsonl when the session was cut short.
+    def read_json(name):
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    batch = read_json("transcript.json")
+    final = read_json("final_transcript.json") or {}
+    result = {key: final[key] for key in ("transcription", "summarization", "chapters") if key in final}
+    source = FINAL
+    if batch and batch.get("status") in ("done", "partial"):
+        result.update({key: value for key, value in batch.get("result", {}).items() if value})
+        source = BATCH
+    elif not (result.get("transcription") or {}).get("utterances"):
+        events_path = os.path.join(path, "live_events.jsonl")
+        if os.path.exists(events_path):
+            records = []
+            with open(events_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash mid-write
+                        continue
+            result.setdefault("transcription", {})["utterances"] = [
+                record for record in records if record.get("type") == "utterance"
+            ]
+            source = LIVE
+    if "summarization" not in result and os.path.exists(os.path.join(path, "summary.txt")):
+        with open(os.path.join(path, "summary.txt"), encoding="utf-8") as f:
+            result["summarization"] = {"results": f.read()}
+    if "chapters" not in result and read_json("chapters.json"):
+        result["chapters"] = {"results": read_json("chapters.json")}
+    if not result:
+        return None
+    return source, result
+
+
+TRANSCRIPT_FILES = ("transcript.json", "final_transcript.json", "live_events.jsonl")
+
+
+def find_output_directories(paths):
+    # Directories holding transcript files under the given paths; segment and part
+    # transcriptions are left out, their stitched transcript is in the directory above
+    found = set()
+    for path in paths:
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in ("segments", "parts")]
+            if any(name in files for name in TRANSCRIPT_FILES):
+                found.add(root)
+    return sorted(found, key=lambda directory: min(
+        os.path.getmtime(os.path.join(directory, name))
+        for name in TRANSCRIPT_FILES if os.path.exists(os.path.join(directory, name))
+    ))
+
+
+def parse_date(value):
+    return datetime.datetime.fromisoformat(value).timestamp() if value else None
+
+
+def format_offset(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60}:{minutes % 60:02d}:{seconds:02d}" if minutes >= 60 else f"{minutes:02d}:{seconds:02d}"
+
+
+@click.group()
+@click.option("--db", default=lambda: TRANSCRIPT_STORE or os.path.join("transcriptions", "transcripts.db"),
+              help="Transcript store file (TRANSCRIPT_STORE)")
+@click.pass_context
+def cli(ctx, db):
+    # Search and manage the transcripts stored by the bots
+    ctx.obj = TranscriptStore(db)
+    ctx.call_on_close(ctx.obj.close)
+
+
+@cli.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option("--limit", default=20, help="Results shown at most")
+@click.option("--since", default=None, help="Meetings started at or after this ISO 8601 date or time")
+@click.option("--until", default=None, help="Meetings started before this ISO 8601 date or time")
+@click.option("--speaker", default=None, help="Only utterances of this speaker (diarization number)")
+@click.option("--meeting", "meet_link", default=None, help="Only meetings of this link")
+@click.option("--notes", is_flag=True, help="Search summaries and chapters instead of utterances")
+@click.option("--order", type=click.Choice(ORDERS), default="relevance",
+              help=f"relevance: most relevant among the {RANK_CANDIDATES} most recently stored matches "
+                   "(all of them when there are fewer; TRANSCRIPT_SEARCH_CANDIDATES); recent: newest first")
+@click.option("--fts", is_flag=True, help="Take the query as FTS5 syntax (phrases, OR, NOT, prefix*) instead of plain words")
+@click.pass_obj
+def search(store, query, limit, since, until, speaker, meet_link, notes, order, fts):
+    query = " ".join(query)
+    started_at = time.perf_counter()
+    try:
+        results = store.search(
+            query if fts else fts_query(query), limit, parse_date(since), parse_date(until), speaker, meet_link,
+            notes, order
+        )
+    except sqlite3.OperationalError as e:
+        raise click.UsageError(f"Invalid search: {str(e)}")
+    for result in results:
+        when = datetime.datetime.fromtimestamp(result["started_at"])
+        who = f"[{result['kind']}] {result['title'] or ''}" if notes else f"speaker {result['speaker']}" if result["speaker"] is not None else ""
+        click.echo(
+            f"#{result['meeting_id']:<6} {when:%Y-%m-%d %H:%M} +{format_offset(result['start_time'])} "
+            f"{who:<12} {' '.join(result['snippet'].split())}"
+        )
+        if result["meet_link"]:
+            click.echo(f"{'':8}{result['meet_link']}")
+    click.echo(f"{len(results)} results in {(time.perf_counter() - started_at) * 1000:.0f} ms", err=True)
+
+
+@cli.command("meetings")
+@click.option("--since", default=None, help="Meetings started at or after this ISO 8601 date or time")
+@click.option("--until", default=None, help="Meetings started before this ISO 8601 date or time")
+@click.option("--limit", default=50)
+@click.pass_obj
+def list_meetings(store, since, until, limit):
+    for meeting in store.meetings(parse_date(since), parse_date(until), limit):
+        length = f"{(meeting['ended_at'] - meeting['started_at']) / 60:.0f}min" if meeting["ended_at"] else "-"
+        click.echo(
+            f"#{meeting['id']:<6} {datetime.datetime.fromtimestamp(meeting['started_at']):%Y-%m-%d %H:%M} "
+            f"{length:>6} {meeting['source']:<6} {meeting['utterances']:>5} utterances "
+            f"{meeting['meet_link'] or meeting['location'] or ''}"
+        )
+
+
+@cli.command()
+@click.argument("meeting_id", type=int)
+@click.pass_obj
+def show(store, meeting_id):
+    # Print a stored meeting's summary, chapters and transcript
+    meeting, utterances, notes = store.transcript(meeting_id)
+    if meeting is None:
+        raise click.UsageError(f"No meeting #{meeting_id}")
+    click.echo(f"#{meeting['id']} {datetime.datetime.fromtimestamp(meeting['started_at']):%Y-%m-%d %H:%M} "
+               f"{meeting['meet_link'] or meeting['location'] or ''}")
+    for note in notes:
+        heading = "Summary" if note["kind"] == "summary" else f"{format_offset(note['start_time'])} {note['title'] or ''}"
+        click.echo(f"\n{heading}\n{note['text']}")
+    click.echo("")
+    for utterance in utterances:
+        speaker = f" [{utterance['speaker']}]" if utterance["speaker"] is not None else ""
+        click.echo(f"{format_offset(utterance['start_time'])}{speaker} {utterance['text']}")
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--force", is_flag=True, help="Ingest directories already stored again, replacing them")
+@click.pass_obj
+def ingest(store, paths, force):
+    # Store the transcripts bots left on disk before the store existed (output directories
+    # with transcript.json, final_transcript.json or live_events.jsonl), oldest first.
+    # Directories already stored, by a bot or an earlier ingest, are skipped, so this can be
+    # rerun on a growing tree.
+    added = skipped = 0
+    for directory in find_output_directories(paths):
+        key = output_directory_key(directory)
+        if not force and store.meeting_id(key) is not None:
+            skipped += 1
+            continue
+        try:
+            loaded = load_output_directory(directory)
+        except ValueError as e:
+            logger.warning(f"Skipping {directory}: {str(e)}")
+            continue
+        if loaded is None:
+            continue
+        source, result = loaded
+        started_at = min(
+            os.path.getmtime(os.path.join(directory, name))
+            for name in TRANSCRIPT_FILES if os.path.exists(os.path.join(directory, name))
+        )
+        store.store_meeting(key, source, result, started_at, location=directory)
+        added += 1
+    store.optimize()
+    click.echo(f"Ingested {added} meetings, {skipped} already stored")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,112 @@
+import bisect
+import logging
+import math
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Energy is measured over 10 ms frames; a chunk is speech if any of its frames is loud enough
+FRAME_DURATION_MS = 10
+
+
+class Timeline:
+    # Maps positions in the audio actually sent to Gladia back to meeting time.
+    #
+    # Each time audio resumes after skipped silence an anchor is recorded pairing the
+    # sent offset with the captured offset, both in bytes. Between anchors the two clocks
+    # run together, so any sent position maps back with a bisect over the anchors.
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.sent_offsets = [0]
+        self.captured_offsets = [0]
+
+    def add_anchor(self, sent_offset, captured_offset):
+        if captured_offset - sent_offset != self.captured_offsets[-1] - self.sent_offsets[-1]:
+            self.sent_offsets.append(sent_offset)
+            self.captured_offsets.append(captured_offset)
+
+    def meeting_time(self, sent_time):
+        # Meeting time, in seconds, of a timestamp Gladia reported on the sent audio
+        sent_offset = sent_time * self.bytes_per_second
+        i = bisect.bisect_right(self.sent_offsets, sent_offset) - 1
+        return (self.captured_offsets[i] + sent_offset - self.sent_offsets[i]) / self.bytes_per_second
+
+
+class SpeechGate:
+    # Energy-based voice activity gate for mono s16le chunks.
+    #
+    # Silent chunks are held back instead of being streamed. When speech starts, the
+    # last `preroll_ms` of held-back audio is sent first so word onsets survive, and
+    # after speech stops audio keeps flowing for `hangover_ms` so word endings survive.
+    # During long silences one chunk is still sent every `keepalive_seconds` so the live
+    # session never sits idle. The Timeline keeps transcript timestamps in meeting time.
+
+    def __init__(self, sample_rate, chunk_duration_ms, threshold_dbfs=-50.0, hangover_ms=500,
+                 preroll_ms=300, keepalive_seconds=10):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * FRAME_DURATION_MS // 1000
+        # Mean square of a full scale signal at the threshold, to compare without a log per frame
+        self.threshold_power = (32768.0 * 10 ** (threshold_dbfs / 20)) ** 2
+        self.hangover_chunks = math.ceil(hangover_ms / chunk_duration_ms)
+        self.keepalive_chunks = math.ceil(keepalive_seconds * 1000 / chunk_duration_ms) if keepalive_seconds else 0
+        self.preroll = deque(maxlen=max(0, math.ceil(preroll_ms / chunk_duration_ms)))
+        self.timeline = Timeline(sample_rate * 2)
+        self.chunks_since_speech = self.hangover_chunks + 1
+        self.silent_chunks_held = 0
+        self.captured_bytes = 0
+        self.sent_bytes = 0
+
+    def is_speech(self, chunk):
+        # Whether any 10 ms frame of the chunk is above the energy threshold
+        samples = np.frombuffer(chunk, dtype="<i2")
+        usable = len(samples) - len(samples) % self.frame_samples
+        if usable == 0:
+            return False
+        frames = samples[:usable].astype(np.float32).reshape(-1, self.frame_samples)
+        return bool((np.mean(frames * frames, axis=1) > self.threshold_power).any())
+
+    def process(self, chunk):
+        # Returns the chunks to send for this captured chunk, possibly none
+        captured_offset = self.captured_bytes
+        self.captured_bytes += len(chunk)
+
+        if self.is_speech(chunk):
+            self.chunks_since_speech = 0
+        else:
+            self.chunks_since_speech += 1
+
+        if self.chunks_since_speech <= self.hangover_chunks:
+            # Speech or hangover: flush the preroll, then this chunk
+            out = [held for _, held in self.preroll] + [chunk]
+            first_offset = self.preroll[0][0] if self.preroll else captured_offset
+            self.preroll.clear()
+            self.silent_chunks_held = 0
+            return self._send(out, first_offset)
+
+        self.silent_chunks_held += 1
+        if self.keepalive_chunks and self.silent_chunks_held % self.keepalive_chunks == 0:
+            # What is held back predates the keepalive, so it can no longer be sent in order
+            self.preroll.clear()
+            return self._send([chunk], captured_offset)
+        if self.preroll.maxlen:
+            self.preroll.append((captured_offset, chunk))
+        return []
+
+    def _send(self, chunks, first_captured_offset):
+        self.timeline.add_anchor(self.sent_bytes, first_captured_offset)
+        self.sent_bytes += sum(len(chunk) for chunk in chunks)
+        return chunks
+
+    def report(self):
+        # Summary of how much audio was kept back from Gladia
+        bytes_per_second = self.sample_rate * 2
+        captured = self.captured_bytes / bytes_per_second
+        sent = self.sent_bytes / bytes_per_second
+        saved = 100 * (1 - sent / captured) if captured else 0.0
+        return (
+            f"streamed {sent:.0f}s of {captured:.0f}s captured audio ({saved:.0f}% billed audio saved, "
+            f"{(self.captured_bytes - self.sent_bytes) / 1e6:.1f} MB of PCM not sent)"
+        )